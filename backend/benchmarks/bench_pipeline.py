@@ -0,0 +1,382 @@
+# bench_pipeline.py
+#
+# Benchmarks the parse → structure pipeline over the bundled fixtures:
+#   pdfsASML/*.pdf              page filter, text backends and extraction (with a deterministic fake LLM)
+#   parsed_json{ASML,AYDEN,ROG} save_to_db and load_from_db
+#
+# Usage (from the backend directory):
+#   python3 benchmarks/bench_pipeline.py                    compare against benchmarks/baseline.json
+#   python3 benchmarks/bench_pipeline.py --update-baseline  record a new baseline
+#   python3 benchmarks/bench_pipeline.py --text-diff out.diff  also write the fitz vs pdfplumber text diff
+
+import argparse
+import difflib
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "scripts"))
+
+PDF_GLOB = os.path.join(BACKEND_DIR, "pdfsASML", "*.pdf")
+CORPUS_DIRS = [os.path.join(BACKEND_DIR, d) for d in ("parsed_jsonASML", "parsed_jsonAYDEN", "parsed_jsonROG")]
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_REPEATS = 5
+LOAD_ITERATIONS = 20  # load_from_db takes milliseconds, so each repeat reads every ticker this many times
+
+# Benchmark name → True when larger values are better.
+HIGHER_IS_BETTER = {
+    "page_filter_pages_per_sec": True,
+    "page_filter_warm_pages_per_sec": True,
+    "text_fitz_pages_per_sec": True,
+    "text_fitz_rows_intact": True,
+    "extraction_seconds_per_filing": False,
+    "save_to_db_rows_per_sec": True,
+    "load_from_db_seconds": False,
+    "page_filter_peak_mb": False,
+    "extraction_peak_mb": False,
+    "save_to_db_peak_mb": False,
+    "load_from_db_peak_mb": False,
+}
+
+STATEMENT_HINTS = [
+    ("Cash Flow Statement", ["cash flow", "operating activities", "investing activities"]),
+    ("Balance Sheet", ["balance sheet", "financial position", "total assets"]),
+    ("Income Statement", ["income statement", "statement of operations", "net sales", "revenue"]),
+]
+
+
+def load_corpus() -> List[Dict]:
+    """
+    Loads every parsed filing (TICKER_YEAR.json) from the parsed_json corpora.
+    """
+    filings = []
+    for directory in CORPUS_DIRS:
+        for path in sorted(glob.glob(os.path.join(directory, "*_[0-9][0-9][0-9][0-9].json"))):
+            with open(path, "r") as f:
+                filing = json.load(f)
+            if "ticker" in filing and "data" in filing:  # skips reference_keys_2024.json
+                filings.append(filing)
+    return filings
+
+
+class FakeLLM:
+    """
+    Deterministic LLM backend for the benchmarks.
+    Classifies the prompt text by statement keywords and answers with that statement from the parsed corpus,
+    so extraction runs through the real client, prompt and JSON parsing code with no network.
+    """
+
+    def __init__(self, corpus: List[Dict]):
+        self.answers = {(f["ticker"].upper(), int(f["year"])): f["data"] for f in corpus}
+        self.calls = 0
+        self.ticker = ""
+        self.year = 0
+
+    def is_retryable(self, error: Exception) -> bool:
+        return False
+
+    def complete(self, model: str, messages: List[Dict], temperature=None, max_tokens=None,
+                 timeout=None, on_token=None, label=None, response_format=None):
+        from llm_client import LLMResponse
+
+        self.calls += 1
+        text = messages[-1]["content"]
+        tokens = len(text) // 4
+        usage = {"prompt_tokens": tokens, "completion_tokens": 0, "total_tokens": tokens}
+        text_lower = text.split("Text:", 1)[-1].lower()
+        for st_type, hints in STATEMENT_HINTS:
+            if any(h in text_lower for h in hints):
+                data = self.answers.get((self.ticker, self.year), {}).get(st_type, {})
+                items = [{"line_item": k, "value": str(v)} for k, v in data.items()]
+                content = json.dumps({"statement_type": st_type, "data": items, "historical_data": []})
+                return LLMResponse(content, usage, model)
+        return LLMResponse(json.dumps({"statement_type": "None", "data": [], "historical_data": []}), usage, model)
+
+
+def measure(fn, repeats: int):
+    """
+    Runs fn `repeats` times and returns (fastest seconds, peak traced bytes, last result).
+    The fastest run is the least disturbed by other load on the machine, as with timeit. Memory is traced
+    in one extra run so tracemalloc overhead does not skew the timings.
+    """
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(durations), peak, result
+
+
+def bench_page_filter(pdfs: List[str], repeats: int, workdir: str) -> Dict:
+    """
+    Page-filter throughput over whole filings, in pages per second: cold (page-text cache cleared before
+    every run, so each page is extracted from the PDF) and warm (every page read from the cache).
+    """
+    import fitz
+    import page_text_cache
+    import parser
+
+    total_pages = 0
+    for pdf in pdfs:
+        with fitz.open(pdf) as doc:
+            total_pages += doc.page_count
+
+    original_dir = page_text_cache.CACHE_DIR
+    page_text_cache.CACHE_DIR = os.path.join(workdir, "text_cache")
+
+    def cold():
+        page_text_cache.clear_open_caches()
+        shutil.rmtree(page_text_cache.CACHE_DIR, ignore_errors=True)
+        return [parser.filter_pages(pdf) for pdf in pdfs]
+
+    try:
+        seconds, peak, _ = measure(cold, repeats)
+        warm_seconds, _, _ = measure(lambda: [parser.filter_pages(pdf) for pdf in pdfs], repeats)
+    finally:
+        page_text_cache.clear_open_caches()
+        page_text_cache.CACHE_DIR = original_dir
+    return {
+        "page_filter_pages_per_sec": total_pages / seconds,
+        "page_filter_warm_pages_per_sec": total_pages / warm_seconds,
+        "page_filter_peak_mb": peak / 1e6,
+    }
+
+
+def text_quality(texts: Dict[int, str], statements: Dict) -> Dict[str, float]:
+    """
+    Scores extracted page text against a filing's known values: the share of values printed anywhere
+    in the text, and the share printed on the same line as (the first word of) their label.
+    """
+    lines = [line for text in texts.values() for line in text.split("\n")]
+    values = [(label, str(value).lstrip("-")) for st_type, data in statements.items() if isinstance(data, dict)
+              for label, value in data.items() if len(str(value).lstrip("-")) >= 4]
+    found = intact = 0
+    for label, value in values:
+        hits = [line for line in lines if value in line]
+        found += bool(hits)
+        intact += any(label.split()[0].lower() in line.lower() for line in hits)
+    return {"values_found": found / max(len(values), 1), "rows_intact": intact / max(len(values), 1)}
+
+
+def bench_text_backends(pdfs: List[str], corpus: List[Dict], repeats: int, workdir: str,
+                        diff_path: Optional[str] = None) -> Dict:
+    """
+    LLM input text extraction on the pages the filter keeps, per text backend: pages per second (uncached)
+    and text quality against the parsed corpus. With diff_path, writes a unified diff of the fitz and
+    pdfplumber text of every page.
+    """
+    import page_text_cache
+    import parser
+    import text_backends
+
+    answers = {(f["ticker"].upper(), int(f["year"])): f["data"] for f in corpus}
+    original_dir = page_text_cache.CACHE_DIR
+    page_text_cache.CACHE_DIR = os.path.join(workdir, "text_cache")
+    try:
+        pages = {pdf: parser.filter_pages(pdf) for pdf in pdfs}
+    finally:
+        page_text_cache.clear_open_caches()
+        page_text_cache.CACHE_DIR = original_dir
+    total_pages = sum(len(p) for p in pages.values()) or 1
+
+    results: Dict = {}
+    outputs = {}
+    for backend in text_backends.TEXT_BACKENDS:
+        try:
+            seconds, _, texts = measure(
+                lambda: {pdf: text_backends.extract_texts(pdf, p, backend) for pdf, p in pages.items()}, repeats
+            )
+        except ImportError:
+            continue
+        outputs[backend] = texts
+        scores = [text_quality(texts[pdf], answers.get((parser.get_pdf_ticker(pdf), parser.get_pdf_year(pdf)), {}))
+                  for pdf in pdfs]
+        results[f"text_{backend}_pages_per_sec"] = total_pages / seconds
+        results[f"text_{backend}_values_found"] = sum(s["values_found"] for s in scores) / len(scores)
+        results[f"text_{backend}_rows_intact"] = sum(s["rows_intact"] for s in scores) / len(scores)
+
+    if diff_path and len(outputs) == 2:
+        with open(diff_path, "w") as f:
+            for pdf in pdfs:
+                for p in pages[pdf]:
+                    f.writelines(difflib.unified_diff(
+                        outputs["pdfplumber"][pdf].get(p, "").splitlines(keepends=True),
+                        outputs["fitz"][pdf].get(p, "").splitlines(keepends=True),
+                        f"{os.path.basename(pdf)} page {p+1} (pdfplumber)", f"{os.path.basename(pdf)} page {p+1} (fitz)",
+                    ))
+    return results
+
+
+def bench_extraction(pdfs: List[str], corpus: List[Dict], repeats: int, workdir: str) -> Dict:
+    """
+    End-to-end parsed_pdf latency per filing with the fake LLM.
+    Layout profiles and page-text caches go to a scratch directory and are cleared between repeats,
+    so every run is a cold parse.
+    """
+    import llm_client
+    import page_text_cache
+    import parser
+
+    fake = FakeLLM(corpus)
+    original_dir, original_cache_dir = parser.PARSED_JSON_DIR, page_text_cache.CACHE_DIR
+    parser.PARSED_JSON_DIR = os.path.join(workdir, "parsed_json")
+    page_text_cache.CACHE_DIR = os.path.join(workdir, "text_cache")
+    llm_client.set_client(llm_client.LLMClient(fake, debug_log=None))
+
+    def run():
+        shutil.rmtree(parser.PARSED_JSON_DIR, ignore_errors=True)
+        page_text_cache.clear_open_caches()
+        shutil.rmtree(page_text_cache.CACHE_DIR, ignore_errors=True)
+        for pdf in sorted(pdfs, reverse=True):
+            fake.ticker, fake.year = parser.get_pdf_ticker(pdf), parser.get_pdf_year(pdf)
+            parser.parsed_pdf(pdf)
+
+    try:
+        seconds, peak, _ = measure(run, repeats)
+    finally:
+        parser.PARSED_JSON_DIR, page_text_cache.CACHE_DIR = original_dir, original_cache_dir
+        page_text_cache.clear_open_caches()
+        llm_client.set_client(None)
+
+    return {
+        "extraction_seconds_per_filing": seconds / len(pdfs),
+        "extraction_llm_calls_per_filing": fake.calls / ((repeats + 1) * len(pdfs)),
+        "extraction_peak_mb": peak / 1e6,
+    }
+
+
+def bench_structure(corpus: List[Dict], repeats: int, workdir: str) -> Dict:
+    """
+    save_to_db throughput (rows per second, into a fresh database each run) and load_from_db latency per ticker.
+    """
+    import sqlite3
+    import structure
+
+    db_path = os.path.join(workdir, "bench.sqlite")
+    original = structure.DB_PATH
+    structure.DB_PATH = db_path
+
+    def save_all():
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        for filing in corpus:
+            structure.save_to_db(filing.get("name") or filing["ticker"], filing)
+
+    tickers = sorted({f["ticker"] for f in corpus})
+
+    try:
+        save_seconds, save_peak, _ = measure(save_all, repeats)
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT COUNT(*) FROM Company").fetchone()[0]
+        conn.close()
+        load_seconds, load_peak, _ = measure(
+            lambda: [structure.load_from_db(t) for _ in range(LOAD_ITERATIONS) for t in tickers], repeats
+        )
+    finally:
+        structure.DB_PATH = original
+
+    return {
+        "save_to_db_rows_per_sec": rows / save_seconds,
+        "save_to_db_peak_mb": save_peak / 1e6,
+        "load_from_db_seconds": load_seconds / (LOAD_ITERATIONS * len(tickers)),
+        "load_from_db_peak_mb": load_peak / 1e6,
+    }
+
+
+def run_benchmarks(repeats: int = DEFAULT_REPEATS, corpus: Optional[List[Dict]] = None,
+                   pdfs: Optional[List[str]] = None, text_diff: Optional[str] = None) -> Dict:
+    """
+    Runs every benchmark whose dependencies are installed.
+    Stages that need PyMuPDF/pdfplumber are reported under "skipped" when those are missing.
+    """
+    corpus = load_corpus() if corpus is None else corpus
+    pdfs = sorted(glob.glob(PDF_GLOB)) if pdfs is None else pdfs
+    results: Dict = {"skipped": {}}
+
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull  # the pipeline prints progress for every page
+        try:
+            results.update(bench_structure(corpus, repeats, workdir))
+            if not pdfs:
+                results["skipped"]["page_filter"] = results["skipped"]["extraction"] = "no PDFs"
+            else:
+                try:
+                    results.update(bench_page_filter(pdfs, repeats, workdir))
+                    results.update(bench_text_backends(pdfs, corpus, repeats, workdir, text_diff))
+                    results.update(bench_extraction(pdfs, corpus, repeats, workdir))
+                except ImportError as e:
+                    results["skipped"]["page_filter"] = results["skipped"]["extraction"] = str(e)
+        finally:
+            sys.stdout = stdout
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Returns a message for every benchmark that is more than `tolerance` worse than its baseline.
+    """
+    regressions = []
+    for name, higher_is_better in HIGHER_IS_BETTER.items():
+        if name not in results or name not in baseline:
+            continue
+        current, reference = results[name], baseline[name]
+        change = (current - reference) / reference if reference else 0.0
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{name}: {current:.4g} vs baseline {reference:.4g} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    """
+    Runs the benchmarks, prints the results and exits non-zero on a regression.
+    """
+    args = argparse.ArgumentParser(description="Benchmark the parse → structure pipeline")
+    args.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    args.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args.add_argument("--baseline", default=BASELINE_PATH)
+    args.add_argument("--update-baseline", action="store_true")
+    args.add_argument("--text-diff", help="write the fitz vs pdfplumber page text diff to this file")
+    opts = args.parse_args()
+
+    results = run_benchmarks(opts.repeats, text_diff=opts.text_diff)
+    print(json.dumps(results, indent=2))
+
+    if opts.update_baseline:
+        # Keep entries for stages that were skipped on this machine
+        baseline = {}
+        if os.path.exists(opts.baseline):
+            with open(opts.baseline, "r") as f:
+                baseline = json.load(f)
+        baseline.update({k: v for k, v in results.items() if k in HIGHER_IS_BETTER})
+        with open(opts.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"[BENCH] Baseline written to {opts.baseline}")
+        return
+
+    if not os.path.exists(opts.baseline):
+        print("[BENCH] No baseline yet, run with --update-baseline")
+        return
+    with open(opts.baseline, "r") as f:
+        regressions = compare(results, json.load(f), opts.tolerance)
+    for message in regressions:
+        print(f"[REGRESSION] {message}")
+    if regressions:
+        sys.exit(1)
+    print("[BENCH] No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# data_version.py
+
+import sqlite3
+import time
+from typing import Optional, Tuple
+
+try:
+    from . import structure
+except ImportError:
+    import structure
+
+
+def ensure_version_table(cursor):
+    """
+    Ensures that the DataVersion table exists.
+    One row per ticker with a counter bumped on every write to its data, used for HTTP ETags.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS DataVersion (
+            ticker TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+
+
+def migrate_version_table(cursor):
+    """
+    Creates the DataVersion table and gives every stored ticker without a version row version 1.
+    Idempotent, so it also fills a table that the Node server's sequelize.sync() created empty.
+    """
+    ensure_version_table(cursor)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Company'")
+    if cursor.fetchone():
+        cursor.execute("""
+            INSERT OR IGNORE INTO DataVersion (ticker, version, updated_at)
+            SELECT ticker, 1, ? FROM Company WHERE ticker IS NOT NULL GROUP BY ticker
+        """, (time.time(),))
+
+
+def migrate(db_path: Optional[str] = None):
+    """
+    Runs the DataVersion migration on the database. Called once at API startup.
+    """
+    conn = sqlite3.connect(db_path or structure.DB_PATH)
+    migrate_version_table(conn.cursor())
+    conn.commit()
+    conn.close()
+
+
+def bump_version(cursor, ticker: str):
+    """
+    Marks a ticker's data as changed. Call it in the same transaction as the write.
+    """
+    ensure_version_table(cursor)
+    cursor.execute("""
+        INSERT INTO DataVersion (ticker, version, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT(ticker) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+    """, (ticker, time.time()))
+
+
+def load_version(ticker: str) -> Optional[Tuple[int, float]]:
+    """
+    Returns (version, updated_at) for a ticker, or None when nothing has been stored for it.
+    """
+    conn = sqlite3.connect(structure.DB_PATH)
+    try:
+        row = conn.execute("SELECT version, updated_at FROM DataVersion WHERE ticker = ?", (ticker,)).fetchone()
+    except sqlite3.OperationalError:
+        row = None  # not migrated yet
+    finally:
+        conn.close()
+    return (row[0], row[1]) if row else None
+
+
+if __name__ == "__main__":
+    migrate()
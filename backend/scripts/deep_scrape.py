@@ -1,19 +1,21 @@
-import os, re, requests, openai
+import os, re, requests
 import sys
 from urllib.parse import urljoin
-from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
 
-#  Load API key
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-# pdf folder
+try:
+    from .llm_client import get_client
+    from .fiscal_years import fiscal_year_window
+    from .job_context import JobContext
+    from .pdf_store import link_known_url, materialize_pdf, revalidation_headers, store_pdf
+except ImportError:
+    from llm_client import get_client
+    from fiscal_years import fiscal_year_window
+    from job_context import JobContext
+    from pdf_store import link_known_url, materialize_pdf, revalidation_headers, store_pdf
+
+# pdf folder, created when a scrape starts
 PDF_FOLDER = os.path.join(os.path.dirname(__file__), "../pdfs")
-os.makedirs(PDF_FOLDER, exist_ok=True)
-
-#  Token tracking
-TOTAL_TOKENS = 0
 
 def estimate_tokens(msg):
     """
@@ -31,27 +33,32 @@ def extract_first_url(text):
     return match.group(0) if match else ""
 
 #  AI prompt
-def ai_prompt(prompt, log_label=""):
+def ai_prompt(prompt, log_label="", task=None, accept=None, job=None):
     """
     Sends a prompt to the OpenAI API and returns the AI's response.
-    Tracks total token usage for API calls.
+    The task picks the model tier; answers rejected by accept are retried on the large model.
+    Tracks token usage on the job.
     """
-    global TOTAL_TOKENS
-    TOTAL_TOKENS += estimate_tokens(prompt)
+    if job is not None:
+        job.add_prompt_tokens(estimate_tokens(prompt))
     print(f"\n[AI PROMPT -- {log_label}]\n{prompt[:500]}...\n")
 
-    res = openai.ChatCompletion.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    response = res.choices[0].message.content.strip() # type: ignore
+    res = get_client().prompt(prompt, label=log_label or None, task=task, accept=accept)
+    response = res.content
 
     print(f"\n[AI RESPONSE -- {log_label}]\n{response}\n{'─'*80}")
     return response
 
+def is_known_link(answer, links):
+    """
+    Checks that an AI link choice is one of the links actually on the page.
+    """
+    url = extract_first_url(answer).rstrip("/")
+    return bool(url) and url in {l.rstrip("/") for l in links}
+
 
 #  AI chooses best next link
-def ai_pick_best_link(current_url, links, full_text, year="2024"):
+def ai_pick_best_link(current_url, links, full_text, year="2024", job=None):
     """
     Uses AI to select the best link from a list to navigate towards an annual report PDF.
     Considers the current URL, available links, and page text.
@@ -70,7 +77,7 @@ Here is the full page content (all headings, buttons, paragraphs):
 
 Which link or element would you click next to get closer to downloading the annual report PDF? Return a single full URL.
 """
-    return ai_prompt(prompt)
+    return ai_prompt(prompt, task="link_choice", accept=lambda answer: is_known_link(answer, links), job=job)
 
 # Load and parse page with Playwright
 def scan_page(url):
@@ -119,55 +126,68 @@ def scan_page(url):
 
 
 #  Download pdf
-def download_pdf(url, year=None, ticker="UNKNOWN", downloaded_pdfs=None):
+def download_pdf(url, year=None, ticker="UNKNOWN", job=None):
     """
-    Downloads a PDF from the given URL and saves it to the PDF_FOLDER.
-    Handles existing files, invalid PDF content, and download errors.
+    Downloads a PDF from the given URL into the job's scratch directory and adds it to the PDF store
+    once it is known to be a PDF, so other jobs never see a partial file.
+    Filings already in the store are linked without the network. A URL downloaded before is revalidated
+    with its ETag (If-None-Match) and linked on 304, or linked without a request when it had no ETag.
+    Handles invalid PDF content and download errors.
+    Emits a "pdf_downloaded" event for every PDF that is available afterwards.
     """
-    if downloaded_pdfs is None:
-        downloaded_pdfs = []
+    if job is None:
+        with JobContext(ticker, pdf_dir=PDF_FOLDER) as job:
+            return download_pdf(url, year, ticker, job)
     ticker = ticker.upper()
     year = str(year) if year else "unknown"
     fname = f"{ticker}_{year}.pdf"
-    fpath = os.path.join(PDF_FOLDER, fname)
+    stored_year = int(year) if year.isdigit() else year
 
-    if os.path.exists(fpath):
+    def already_stored():
         print(f"[SKIP] Already downloaded: {fname}")
-        if fname not in downloaded_pdfs:
-            downloaded_pdfs.append(fname)
+        job.record_download(fname)
+        job.emit("pdf_downloaded", year=int(year) if year.isdigit() else None, file=fname, cached=True)
         return True
 
+    if materialize_pdf(ticker, stored_year, job.pdf_dir):
+        return already_stored()
+    known = revalidation_headers(url, job.pdf_dir)
+    if known == {} and link_known_url(ticker, stored_year, url, job.pdf_dir):
+        return already_stored()
+
     print(f"[ DOWNLOAD] {url}")
     try:
-        r = requests.get(url, timeout=30)
+        r = requests.get(url, headers=known or {}, timeout=30)
+        if r.status_code == 304 and link_known_url(ticker, stored_year, url, job.pdf_dir):
+            return already_stored()
         r.raise_for_status()
-        with open(fpath, "wb") as f:
+        tmp_path = os.path.join(job.scratch_dir, fname)
+        with open(tmp_path, "wb") as f:
             f.write(r.content)
 
-        with open(fpath, "rb") as f:
+        with open(tmp_path, "rb") as f:
             if not f.read(4) == b'%PDF':
                 print(f"[INVALID FILE] Not a real PDF. Removing: {fname}")
-                os.remove(fpath)
+                os.remove(tmp_path)
                 return False
 
+        store_pdf(ticker, stored_year, tmp_path, url, r.headers.get("ETag"), job.pdf_dir)
         print(f"[ SAVED] {fname}")
-        if fname not in downloaded_pdfs:
-            downloaded_pdfs.append(fname)
+        job.record_download(fname)
+        job.emit("pdf_downloaded", year=int(year) if year.isdigit() else None, file=fname, cached=False)
         return True
     except Exception as e:
         print(f"[ DOWNLOAD ERROR] {e}")
         return False
 
 #  Recursively use AI to navigate
-def recursive_ai_nav(start_url, year="2024", ticker="UNKNOWN", depth=0, visited=None, downloaded_pdfs=None):
+def recursive_ai_nav(start_url, year="2024", ticker="UNKNOWN", depth=0, visited=None, job=None):
     """
     Recursively navigates web pages using AI to find and download annual report PDFs.
     Explores links until a PDF is found or max depth is reached.
     """
     if visited is None:
         visited = set()
-    if downloaded_pdfs is None:
-        downloaded_pdfs = []
 
     if depth > 8:
         print("[ ] Max depth reached.")
@@ -184,73 +204,77 @@ def recursive_ai_nav(start_url, year="2024", ticker="UNKNOWN", depth=0, visited=
     )]
     if pdf_links:
         print(f"[ PDF LINK FOUND] {pdf_links[0]}")
-        if download_pdf(pdf_links[0], year, ticker, downloaded_pdfs):
+        if download_pdf(pdf_links[0], year, ticker, job):
             return pdf_links[0], current_url
 
-    next_url = ai_pick_best_link(current_url, links, text, year)
+    next_url = ai_pick_best_link(current_url, links, text, year, job)
     if not next_url or next_url in visited:
         print("[ No better link found.]")
         return None, current_url
     if next_url.endswith(".pdf") or "download" in next_url or "asset" in next_url:
-        if download_pdf(next_url, year, ticker, downloaded_pdfs):
+        if download_pdf(next_url, year, ticker, job):
             return next_url, current_url
         else:
             return None, current_url
-    return recursive_ai_nav(next_url, year, ticker, depth + 1, visited, downloaded_pdfs)
+    return recursive_ai_nav(next_url, year, ticker, depth + 1, visited, job)
 
 # Try previous years using recursive AI fallback
-def try_other_years(from_url, ticker, from_year=2023, downloaded_pdfs=None):
+def try_other_years(from_url, ticker, from_year=2023, years=None, job=None):
     """
     Attempts to find and download annual reports for previous years using recursive AI fallback.
+    Tries the given years, or the fiscal year window up to from_year, newest first.
     """
-    if downloaded_pdfs is None:
-        downloaded_pdfs = []
+    if years is None:
+        years = [y for y in fiscal_year_window() if y <= from_year]
     current_base = from_url
-    for y in range(from_year, 2014, -1):
+    for y in sorted(years, reverse=True):
         print(f"\n[ AI BACKTRACE] Attempting to find report for {y}")
-        result_url, new_base = recursive_ai_nav(current_base, str(y), ticker, downloaded_pdfs=downloaded_pdfs)
+        result_url, new_base = recursive_ai_nav(current_base, str(y), ticker, job=job)
         if result_url:
             current_base = new_base
         else:
             print(f"[ Could not find report for {y}]")
 
 #  Get IR URL using AI
-def find_ir_url_via_ai(ticker):
+def find_ir_url_via_ai(ticker, job=None):
     """
     Uses AI to find the official investor relations (IR) URL for a given company ticker.
     """
     prompt = f"""Find the official investor relations or annual reports page for European company '{ticker}'. Return the best direct URL."""
-    return ai_prompt(prompt)
-
-#  define globally
-downloaded_years = []
+    return ai_prompt(prompt, task="ir_url", accept=lambda answer: bool(extract_first_url(answer)), job=job)
 
 #   Main 
-def scrapeticker(ticker, missed_years):
+def scrapeticker(ticker, missed_years, job=None):
     """
     Main function for deep scraping missed annual reports for a given ticker.
     It attempts to find and download PDFs for specified missed years.
+    Download state, token usage and progress ("ir_url", "pdf_downloaded") live on the job,
+    a new one unless the caller shares its own.
     """
+    if job is None:
+        with JobContext(ticker, pdf_dir=PDF_FOLDER) as job:
+            return scrapeticker(ticker, missed_years, job)
     print(f"\n🔍 Deep scraping missed reports for {ticker}: {missed_years}")
-    ir_url = extract_first_url(ai_prompt(f"Return official annual report or IR page for '{ticker}'"))
-    downloaded_years.clear()
+    os.makedirs(job.pdf_dir, exist_ok=True)
+    ir_url = extract_first_url(ai_prompt(
+        f"Return official annual report or IR page for '{ticker}'",
+        task="ir_url", accept=lambda answer: bool(extract_first_url(answer)), job=job
+    ))
+    job.emit("ir_url", url=ir_url, scraper="deep")
 
     company_name = ticker 
 
     for year in missed_years:
-        recursive_ai_nav(ir_url, year, ticker)
+        recursive_ai_nav(ir_url, str(year), ticker, job=job)
 
-    still_missing = [y for y in missed_years if f"{ticker}_{y}.pdf" not in downloaded_years]
+    found = set(job.downloaded_years())
 
     return {
         "name": company_name,
         "ticker": ticker,
         "ir_url": ir_url,
-        "downloaded_years": sorted([
-            int(f.split("_")[1].replace(".pdf", ""))
-            for f in downloaded_years if f.startswith(ticker)
-        ]),
-        "missed_years": still_missing
+        "downloaded_years": sorted(found & set(missed_years)),
+        "missed_years": [y for y in missed_years if y not in found]
     }
  
 if __name__ == "__main__":
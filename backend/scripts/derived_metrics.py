@@ -0,0 +1,253 @@
+# derived_metrics.py
+
+import json
+import math
+import os
+import re
+import sqlite3
+from array import array
+from typing import Dict, List, Optional
+
+try:
+    from . import structure
+    from .metrics_store import read_series
+except ImportError:
+    import structure
+    from metrics_store import read_series
+
+REFERENCE_METRICS_PATH = os.path.join(os.path.dirname(__file__), "../parsed_json/reference_keys_2024.json")
+
+GROWTH_SUFFIX = " YoY Growth"
+CAGR_WINDOWS = [3, 5]
+
+# Role → accepted labels, most canonical first. Labels are compared case- and punctuation-insensitively.
+METRIC_ROLES = {
+    "revenue": ["Revenue", "Net revenue", "Net revenues", "Total net sales", "Net sales", "Total revenue"],
+    "cost_of_sales": ["Cost of Sales", "Cost of Goods Sold", "Costs of goods sold", "Total cost of sales"],
+    "gross_profit": ["Gross Profit"],
+    "operating_income": ["Operating Income", "Income from operations", "Operating profit"],
+    "net_income": ["Net Income", "Net income for the year", "Net profit"],
+    "total_assets": ["Total Assets"],
+    "current_assets": ["Total Current Assets"],
+    "total_liabilities": ["Total Liabilities"],
+    "current_liabilities": ["Total Current Liabilities"],
+    "equity": ["Total Shareholders' Equity", "Total Equity", "Total shareholders equity"],
+    "operating_cash_flow": ["Net Cash Provided by Operating Activities", "Net cash flows from operating activities"],
+    "capex": ["Purchases of Property, Plant and Equipment", "Purchases of plant and equipment"],
+}
+
+CAGR_ROLES = {"revenue": "Revenue", "net_income": "Net Income", "total_assets": "Total Assets"}
+
+
+def ensure_derived_table(cursor):
+    """
+    Ensures that the DerivedMetric table and its screening index exist.
+    Derived values are keyed like Company rows, one row per (ticker, metric, year).
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS DerivedMetric (
+            ticker TEXT,
+            metric TEXT,
+            year INTEGER,
+            value REAL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (ticker, metric, year)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_derived_metric_year ON DerivedMetric (metric, year)")
+
+
+def _label_key(label: str) -> str:
+    """
+    Normalizes a metric label for role lookup.
+    """
+    return re.sub(r"[^a-z0-9]+", " ", label.lower().replace("’", "'").replace("'", "")).strip()
+
+
+def load_reference_metrics() -> List[str]:
+    """
+    Loads the canonical metric names from reference_keys_2024.json, if present.
+    """
+    if not os.path.exists(REFERENCE_METRICS_PATH):
+        return []
+    try:
+        with open(REFERENCE_METRICS_PATH, "r") as f:
+            reference = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [metric for metrics in reference.values() for metric in metrics]
+
+
+def resolve_roles(available_metrics: List[str], reference_metrics: List[str]) -> Dict[str, str]:
+    """
+    Maps each metric role to the stored metric that plays it.
+    Canonical reference metrics are preferred over other stored labels.
+    """
+    by_key = {}
+    for metric in available_metrics:
+        by_key.setdefault(_label_key(metric), []).append(metric)
+    reference_keys = {_label_key(m) for m in reference_metrics}
+
+    roles = {}
+    for role, labels in METRIC_ROLES.items():
+        keys = [_label_key(label) for label in labels if _label_key(label) in by_key]
+        keys.sort(key=lambda k: k not in reference_keys)
+        if keys:
+            roles[role] = by_key[keys[0]][0]
+    return roles
+
+
+def _divide(numerator: array, denominator: array) -> array:
+    """
+    Element-wise division of two aligned series, NaN where the denominator is zero or missing.
+    """
+    return array("d", (
+        n / d if d == d and d != 0 else math.nan
+        for n, d in zip(numerator, denominator)
+    ))
+
+
+def _subtract(left: array, right: array) -> array:
+    """
+    Element-wise difference of two aligned series.
+    """
+    return array("d", (a - b for a, b in zip(left, right)))
+
+
+def _cagr(values: array, window: int) -> array:
+    """
+    Rolling compound annual growth rate over `window` years, NaN where either end is missing or not positive.
+    """
+    out = array("d", [math.nan]) * len(values)
+    for i in range(window, len(values)):
+        start, end = values[i - window], values[i]
+        if start > 0 and end > 0:
+            out[i] = (end / start) ** (1 / window) - 1
+    return out
+
+
+def compute_ratios(series: Dict, roles: Dict[str, str]) -> Dict[str, array]:
+    """
+    Computes margins, balance-sheet ratios and CAGRs over aligned metric arrays in one pass.
+    Ratios whose inputs are not available for the ticker are skipped.
+    """
+    metrics = series["metrics"]
+    role_values = {role: metrics[metric] for role, metric in roles.items()}
+
+    if "gross_profit" not in role_values and {"revenue", "cost_of_sales"} <= role_values.keys():
+        costs = array("d", (abs(v) for v in role_values["cost_of_sales"]))
+        role_values["gross_profit"] = _subtract(role_values["revenue"], costs)
+    if {"operating_cash_flow", "capex"} <= role_values.keys():
+        capex = array("d", (abs(v) for v in role_values["capex"]))
+        role_values["free_cash_flow"] = _subtract(role_values["operating_cash_flow"], capex)
+
+    ratio_inputs = {
+        "Gross Margin": ("gross_profit", "revenue"),
+        "Operating Margin": ("operating_income", "revenue"),
+        "Net Margin": ("net_income", "revenue"),
+        "Free Cash Flow Margin": ("free_cash_flow", "revenue"),
+        "Current Ratio": ("current_assets", "current_liabilities"),
+        "Liabilities to Equity": ("total_liabilities", "equity"),
+        "Equity Ratio": ("equity", "total_assets"),
+        "Return on Equity": ("net_income", "equity"),
+        "Return on Assets": ("net_income", "total_assets"),
+    }
+
+    derived = {}
+    for name, (numerator, denominator) in ratio_inputs.items():
+        if numerator in role_values and denominator in role_values:
+            derived[name] = _divide(role_values[numerator], role_values[denominator])
+
+    for role, label in CAGR_ROLES.items():
+        if role in role_values:
+            for window in CAGR_WINDOWS:
+                derived[f"{label} {window}Y CAGR"] = _cagr(role_values[role], window)
+
+    return derived
+
+
+def growth_labels(available_metrics: List[str], reference_metrics: List[str]) -> Dict[str, str]:
+    """
+    Maps each canonical metric that gets year-over-year growth to the stored label it is computed from.
+    Role metrics are named by their most canonical label, whatever the issuer calls them; other reference
+    metrics only count when they are stored under their own name. Other raw line items get no growth.
+    """
+    by_key = {}
+    for metric in available_metrics:
+        by_key.setdefault(_label_key(metric), metric)
+
+    labels = {}
+    for metric in reference_metrics:
+        if _label_key(metric) in by_key:
+            labels[metric] = by_key[_label_key(metric)]
+    for role, metric in resolve_roles(available_metrics, reference_metrics).items():
+        labels[METRIC_ROLES[role][0]] = metric
+    return labels
+
+
+def compute_growth(series: Dict, labels: Dict[str, str]) -> Dict[str, array]:
+    """
+    Computes year-over-year growth over aligned metric arrays, named "<canonical metric> YoY Growth".
+    NaN where either year is missing or the previous value is zero.
+    """
+    growth = {}
+    for name, metric in labels.items():
+        values = series["metrics"][metric]
+        out = array("d", [math.nan]) * len(values)
+        for i in range(1, len(values)):
+            prev = values[i - 1]
+            if prev == prev and prev != 0:
+                out[i] = (values[i] - prev) / abs(prev)
+        growth[f"{name}{GROWTH_SUFFIX}"] = out
+    return growth
+
+
+def refresh_derived(cursor, ticker: str):
+    """
+    Recomputes growth rates, margins, balance-sheet ratios and CAGRs for a ticker from its MetricSeries arrays,
+    where values from the newest filing already win.
+    Called by save_to_db after the Company rows and MetricSeries of a filing are written.
+    """
+    ensure_derived_table(cursor)
+    cursor.execute("DELETE FROM DerivedMetric WHERE ticker = ?", (ticker,))
+
+    series = read_series(cursor, ticker)
+    if not series["years"]:
+        return
+    available = list(series["metrics"])
+    reference_metrics = load_reference_metrics()
+    derived = compute_ratios(series, resolve_roles(available, reference_metrics))
+    derived.update(compute_growth(series, growth_labels(available, reference_metrics)))
+
+    cursor.executemany("""
+        INSERT INTO DerivedMetric (ticker, metric, year, value)
+        VALUES (?, ?, ?, ?)
+    """, [
+        (ticker, metric, year, value)
+        for metric, values in derived.items()
+        for year, value in zip(series["years"], values)
+        if not math.isnan(value)
+    ])
+
+
+def load_derived(ticker: str, metrics: Optional[List[str]] = None) -> Dict:
+    """
+    Loads precomputed derived metrics for a ticker as {metric: {year: value}}.
+    """
+    query = "SELECT metric, year, value FROM DerivedMetric WHERE ticker = ?"
+    params: List = [ticker]
+    if metrics:
+        query += f" AND metric IN ({','.join('?' for _ in metrics)})"
+        params += list(metrics)
+    conn = sqlite3.connect(structure.DB_PATH)
+    try:
+        rows = conn.execute(query + " ORDER BY metric, year", params).fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # not migrated yet
+    finally:
+        conn.close()
+
+    derived = {}
+    for metric, year, value in rows:
+        derived.setdefault(metric, {})[year] = value
+    return derived
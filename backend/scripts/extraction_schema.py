@@ -0,0 +1,166 @@
+# extraction_schema.py
+
+import json
+import threading
+from typing import Dict, Optional
+
+STATEMENT_TYPES = ["Income Statement", "Balance Sheet", "Cash Flow Statement"]
+
+# Schema for one extraction call. Values stay strings because reports write them as "1,234" or "(56)";
+# normalize.normalize_values turns them into numbers. Strict mode requires every property and no extras.
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "statement_type": {"type": "string", "enum": STATEMENT_TYPES + ["None"]},
+        "data": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"line_item": {"type": "string"}, "value": {"type": "string"}},
+                "required": ["line_item", "value"],
+                "additionalProperties": False,
+            },
+        },
+        "historical_data": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "line_item": {"type": "string"},
+                    "year": {"type": "integer"},
+                    "value": {"type": "string"},
+                },
+                "required": ["line_item", "year", "value"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["statement_type", "data", "historical_data"],
+    "additionalProperties": False,
+}
+
+EXTRACTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "statement_extraction", "strict": True, "schema": EXTRACTION_SCHEMA},
+}
+
+
+class ExtractionParseError(ValueError):
+    """Raised when an extraction response does not match EXTRACTION_SCHEMA."""
+
+
+class StatementExtraction:
+    """
+    One typed extraction result: the statement on the pages, its current-year line items and
+    the earlier years' values as {line item: {year: value}}.
+    """
+
+    def __init__(self, statement_type: str, data: Optional[Dict[str, str]] = None,
+                 historical: Optional[Dict[str, Dict[str, str]]] = None):
+        """
+        Initializes the result; data and historical default to empty.
+        """
+        self.statement_type = statement_type
+        self.data = data or {}
+        self.historical = historical or {}
+
+    @classmethod
+    def from_json(cls, content: str) -> "StatementExtraction":
+        """
+        Parses and validates a response. Also accepts the older {"Statement Type", "Data", "Historical Data"}
+        shape, so recorded responses from before structured output still replay.
+        Raises ExtractionParseError when the content is not a valid extraction.
+        """
+        if content and not content.lstrip().startswith("{"):  # older responses wrapped in ```json fences
+            content = content[content.find("{"):content.rfind("}") + 1]
+        try:
+            raw = json.loads(content)
+        except (TypeError, ValueError) as e:
+            raise ExtractionParseError(f"Response is not JSON: {e}")
+        if not isinstance(raw, dict):
+            raise ExtractionParseError("Response is not a JSON object")
+
+        if "Statement Type" in raw:
+            return cls._from_legacy(raw)
+
+        statement_type = raw.get("statement_type")
+        if statement_type not in STATEMENT_TYPES + ["None"]:
+            raise ExtractionParseError(f"Unknown statement_type: {statement_type!r}")
+
+        data = {}
+        for item in cls._items(raw, "data"):
+            data[str(item["line_item"])] = str(item["value"])
+
+        historical: Dict[str, Dict[str, str]] = {}
+        for item in cls._items(raw, "historical_data"):
+            try:
+                year = int(item["year"])
+            except (KeyError, TypeError, ValueError):
+                raise ExtractionParseError(f"Historical item without a valid year: {item!r}")
+            historical.setdefault(str(item["line_item"]), {})[str(year)] = str(item["value"])
+
+        return cls(statement_type, data, historical)
+
+    @staticmethod
+    def _items(raw: Dict, key: str):
+        """
+        Returns the list under key, checking that every item has a line_item and value.
+        """
+        items = raw.get(key)
+        if not isinstance(items, list):
+            raise ExtractionParseError(f"'{key}' must be an array")
+        for item in items:
+            if not isinstance(item, dict) or "line_item" not in item or "value" not in item:
+                raise ExtractionParseError(f"Malformed '{key}' item: {item!r}")
+        return items
+
+    @classmethod
+    def _from_legacy(cls, raw: Dict) -> "StatementExtraction":
+        """
+        Converts the pre-schema shape. Its historical values carry no year unless nested as {year: value},
+        so flat ones are dropped.
+        """
+        data = raw.get("Data") or {}
+        if not isinstance(data, dict):
+            raise ExtractionParseError("'Data' must be an object")
+        historical = {
+            metric: {str(year): str(value) for year, value in values.items()}
+            for metric, values in (raw.get("Historical Data") or {}).items()
+            if isinstance(values, dict)
+        }
+        return cls(raw["Statement Type"], {k: str(v) for k, v in data.items()}, historical)
+
+
+_stats_lock = threading.Lock()
+_stats = {"responses": 0, "parse_failures": 0, "repaired": 0, "dropped": 0}
+
+
+def record_parse(outcome: str):
+    """
+    Counts one extraction response: "ok", "repaired" (first parse failed, repair succeeded)
+    or "dropped" (both failed).
+    """
+    with _stats_lock:
+        _stats["responses"] += 1
+        if outcome != "ok":
+            _stats["parse_failures"] += 1
+            _stats[outcome] += 1
+
+
+def reset_extraction_stats():
+    """
+    Zeroes the parse counters.
+    """
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def extraction_stats() -> Dict:
+    """
+    Returns the parse counters and the share of responses that failed their first parse.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["parse_failure_rate"] = round(stats["parse_failures"] / stats["responses"], 4) if stats["responses"] else 0.0
+    return stats
@@ -0,0 +1,22 @@
+# fiscal_years.py
+
+import datetime
+import os
+from typing import List, Optional
+
+DEFAULT_FIRST_YEAR = 2015
+
+
+def fiscal_year_window(year_from: Optional[int] = None, year_to: Optional[int] = None) -> List[int]:
+    """
+    Returns the fiscal years the pipeline covers, oldest first.
+    Bounds default to FISCAL_YEAR_FROM / FISCAL_YEAR_TO from the environment, then to 2015 and
+    the last completed calendar year, so a newly published annual report falls inside the window.
+    """
+    if year_from is None:
+        year_from = int(os.getenv("FISCAL_YEAR_FROM", DEFAULT_FIRST_YEAR))
+    if year_to is None:
+        year_to = int(os.getenv("FISCAL_YEAR_TO", datetime.date.today().year - 1))
+    if year_from > year_to:
+        raise ValueError(f"Invalid fiscal year window: {year_from}-{year_to}")
+    return list(range(year_from, year_to + 1))
@@ -0,0 +1,142 @@
+# http_cache.py
+
+import gzip
+import hashlib
+import json
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Mapping, Optional, Tuple
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Browsers always revalidate (cheap with a 304); a CDN may serve its copy for CDN_MAX_AGE seconds.
+BROWSER_MAX_AGE = int(os.getenv("BROWSER_MAX_AGE", "0"))
+CDN_MAX_AGE = int(os.getenv("CDN_MAX_AGE", "60"))
+STALE_WHILE_REVALIDATE = int(os.getenv("STALE_WHILE_REVALIDATE", "300"))
+
+
+def make_etag(ticker: str, version: int, variant: str = "") -> str:
+    """
+    Returns a strong ETag for one representation of a ticker's data at a data version.
+    variant distinguishes responses built from the same data (endpoint and query string).
+    """
+    digest = hashlib.sha1(variant.encode("utf-8")).hexdigest()[:10]
+    return f'"{ticker.upper()}-{version}-{digest}"'
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    Tags a strong ETag with the content encoding, since compressed bytes are a different representation.
+    """
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def matched_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """
+    Checks an If-None-Match header against an ETag, ignoring weak prefixes.
+    Returns the ETag of the representation the client holds (plain, -gzip or -br), or None when none matches.
+    """
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    base = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate == base or candidate in (f"{base}-gzip", f"{base}-br"):
+            return f'"{candidate}"'
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Checks an If-None-Match header against an ETag, ignoring weak prefixes and encoding tags.
+    """
+    return matched_etag(if_none_match, etag) is not None
+
+
+def http_date(timestamp: float) -> str:
+    """
+    Formats a Unix timestamp as an HTTP date.
+    """
+    return formatdate(timestamp, usegmt=True)
+
+
+def not_modified(headers: Mapping[str, str], etag: str, updated_at: float) -> Optional[str]:
+    """
+    Checks whether the client's copy is current. If-None-Match takes precedence over If-Modified-Since.
+    Returns the ETag to send with the 304 (that of the representation the client holds), or None.
+    """
+    if headers.get("if-none-match"):
+        return matched_etag(headers.get("if-none-match"), etag)
+    since = headers.get("if-modified-since")
+    if since:
+        try:
+            return etag if int(updated_at) <= parsedate_to_datetime(since).timestamp() else None
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> set:
+    """
+    Returns the content codings an Accept-Encoding header allows: those listed with a q-value above 0,
+    plus br and gzip through "*" unless they are refused explicitly. Malformed q-values count as 1.
+    """
+    weights = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    pass
+        weights[coding] = weight
+    accepted = {coding for coding, weight in weights.items() if weight > 0}
+    if "*" in accepted:
+        accepted |= {coding for coding in ("br", "gzip") if coding not in weights}
+    return accepted
+
+
+def encode_body(payload, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """
+    Serializes a payload to JSON and compresses it when it is larger than COMPRESS_MIN_BYTES.
+    Brotli is used when the client accepts it and the brotli package is installed, gzip otherwise.
+    Returns (body, content encoding or None).
+    """
+    body = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    accepted = accepted_encodings(accept_encoding)
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if "br" in accepted:
+        try:
+            import brotli
+            return brotli.compress(body, quality=5), "br"
+        except ImportError:
+            pass
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
+
+
+def cache_headers(etag: str, updated_at: float, encoding: Optional[str] = None) -> Dict[str, str]:
+    """
+    Returns the validator and Cache-Control headers shared by 200 and 304 responses.
+    """
+    headers = {
+        "ETag": encoded_etag(etag, encoding),
+        "Last-Modified": http_date(updated_at),
+        "Cache-Control": f"public, max-age={BROWSER_MAX_AGE}, s-maxage={CDN_MAX_AGE}, "
+                         f"stale-while-revalidate={STALE_WHILE_REVALIDATE}",
+        "Vary": "Accept-Encoding",
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return headers
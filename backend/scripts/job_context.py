@@ -0,0 +1,97 @@
+# job_context.py
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import List, Optional
+
+try:
+    from .progress import emit, EventCallback
+except ImportError:
+    from progress import emit, EventCallback
+
+PDF_DIR = os.path.join(os.path.dirname(__file__), "../pdfs")
+
+
+class JobContext:
+    """
+    The state of one scrape → parse run of a ticker: the PDFs it downloaded, the tokens it used,
+    a private scratch directory and where its progress events go.
+    Each run gets its own context, so runs for different tickers can share a process (and threads).
+    """
+    def __init__(self, ticker: str, on_event: Optional[EventCallback] = None, pdf_dir: str = PDF_DIR):
+        self.ticker = ticker.upper()
+        self.on_event = on_event
+        self.pdf_dir = pdf_dir
+        self.downloaded_pdfs: List[str] = []
+        self.prompt_tokens = 0
+        self.parser_tokens = 0
+        self._scratch_dir: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def scratch_dir(self) -> str:
+        """
+        A directory only this job writes to, created on first use next to the PDF folder
+        (same filesystem, so finished files can be moved into place atomically).
+        """
+        with self._lock:
+            if self._scratch_dir is None:
+                root = os.path.join(self.pdf_dir, ".jobs")
+                os.makedirs(root, exist_ok=True)
+                self._scratch_dir = tempfile.mkdtemp(prefix=f"{self.ticker}-", dir=root)
+            return self._scratch_dir
+
+    def close(self):
+        """
+        Removes the scratch directory and anything left in it.
+        """
+        if self._scratch_dir is not None:
+            shutil.rmtree(self._scratch_dir, ignore_errors=True)
+            self._scratch_dir = None
+
+    def emit(self, event: str, **fields):
+        """
+        Sends a progress event to this job's listener, if it has one.
+        """
+        emit(self.on_event, event, **fields)
+
+    def add_prompt_tokens(self, tokens: int):
+        with self._lock:
+            self.prompt_tokens += tokens
+
+    def add_parser_tokens(self, tokens: int):
+        with self._lock:
+            self.parser_tokens += tokens
+
+    def pdf_path(self, fname: str) -> str:
+        return os.path.join(self.pdf_dir, fname)
+
+    def record_download(self, fname: str):
+        """
+        Records a PDF (downloaded or already on disk) as available to this job.
+        """
+        with self._lock:
+            if fname not in self.downloaded_pdfs:
+                self.downloaded_pdfs.append(fname)
+
+    def downloaded_years(self) -> List[int]:
+        """
+        Returns the fiscal years of this job's ticker that it has a PDF for.
+        """
+        with self._lock:
+            return sorted({
+                int(m.group(1))
+                for fname in self.downloaded_pdfs
+                if fname.startswith(f"{self.ticker}_")
+                for m in [re.search(r"_(\d{4})\.pdf$", fname)]
+                if m
+            })
@@ -0,0 +1,411 @@
+# llm_client.py
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_MODEL = "gpt-4o"
+SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "gpt-4o-mini")
+LARGE_MODEL = os.getenv("LLM_LARGE_MODEL", DEFAULT_MODEL)
+SMALL_TIER_MAX_CHARS = int(os.getenv("LLM_SMALL_TIER_MAX_CHARS", "24000"))
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")  # openai | record | replay
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1.0"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "../llm_cache.jsonl"))
+LLM_DEBUG_LOG = os.getenv("LLM_DEBUG_LOG", "openai_responses_debug.txt")
+
+# Task → tier. Short classification and choice calls go to the small model; extraction stays on the large one.
+# Calls without a task, or whose prompt is longer than SMALL_TIER_MAX_CHARS, use the large tier.
+TASK_TIERS = {
+    "ir_url": "small",
+    "link_choice": "small",
+    "page_classification": "small",
+    "extraction": "large",
+    "metric_aliases": "large",
+    "json_repair": "small",
+}
+
+# USD per million tokens (prompt, completion), for the per-tier cost report.
+MODEL_PRICES = {"gpt-4o": (2.50, 10.00), "gpt-4o-mini": (0.15, 0.60)}
+
+# OpenAI errors worth retrying; anything else (bad request, auth) fails immediately.
+RETRYABLE_ERRORS = {"Timeout", "APIError", "APIConnectionError", "RateLimitError", "ServiceUnavailableError", "TryAgain"}
+
+
+class LLMError(Exception):
+    """Raised when a completion cannot be produced."""
+
+
+class ReplayMiss(LLMError):
+    """Raised by the replay backend when no recorded response matches a request."""
+
+
+class LLMResponse:
+    """
+    The text of a completion plus its token usage.
+    """
+
+    def __init__(self, content: str, usage: Optional[Dict] = None, model: str = DEFAULT_MODEL, cached: bool = False):
+        """
+        Initializes the response; usage defaults to zero tokens.
+        """
+        self.content = content
+        self.usage = usage or {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.model = model
+        self.cached = cached
+
+
+def request_key(model: str, messages: List[Dict], temperature, max_tokens, response_format: Optional[Dict] = None) -> str:
+    """
+    Returns a stable hash of everything that determines a completion, used as the cache key.
+    """
+    request = [model, messages, temperature, max_tokens] + ([response_format] if response_format else [])
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (4 characters per token), for streamed responses that carry no usage.
+    """
+    return len(text) // 4
+
+
+class OpenAIBackend:
+    """
+    Calls the OpenAI chat completions API over one shared HTTP session, so connections are reused.
+    """
+
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Configures the openai module with the API key and a pooled requests session.
+        The key is read after loading .env, so nothing touches the environment until the first real call.
+        """
+        import openai
+        import requests
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        openai.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        openai.requestssession = requests.Session()
+        self.openai = openai
+
+    def is_retryable(self, error: Exception) -> bool:
+        """
+        Returns True for transient errors: timeouts, rate limits, connection resets and 5xx responses.
+        """
+        return type(error).__name__ in RETRYABLE_ERRORS
+
+    def complete(self, model: str, messages: List[Dict], temperature=None, max_tokens=None,
+                 timeout: float = LLM_TIMEOUT, on_token: Optional[Callable[[str], None]] = None,
+                 label: Optional[str] = None, response_format: Optional[Dict] = None) -> LLMResponse:
+        """
+        Runs one chat completion. With on_token, the response is streamed and each chunk is passed to on_token.
+        response_format is passed through, e.g. a JSON schema for structured output.
+        """
+        params: Dict = {"model": model, "messages": messages, "request_timeout": timeout}
+        if temperature is not None:
+            params["temperature"] = temperature
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if response_format is not None:
+            params["response_format"] = response_format
+
+        if on_token is None:
+            response = self.openai.ChatCompletion.create(**params)
+            content = response.choices[0].message["content"] or ""  # type: ignore
+            return LLMResponse(content.strip(), dict(response["usage"]), model)  # type: ignore
+
+        chunks = []
+        for event in self.openai.ChatCompletion.create(stream=True, **params):
+            delta = event["choices"][0].get("delta", {}).get("content")  # type: ignore
+            if delta:
+                chunks.append(delta)
+                on_token(delta)
+        content = "".join(chunks)
+        prompt_tokens = estimate_tokens("".join(m.get("content", "") for m in messages))
+        completion_tokens = estimate_tokens(content)
+        return LLMResponse(content.strip(), {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }, model)
+
+
+class ReplayBackend:
+    """
+    Serves recorded responses without any network access.
+    Responses are matched by request hash (from the JSONL cache) or, failing that, by the label they were logged
+    under in an openai_responses_debug.txt-style log ("--- Pages [3, 4] of <pdf sha256> ---"); repeated labels
+    replay in order, each response once, and a miss raises ReplayMiss rather than reusing another response.
+    """
+
+    def __init__(self, cache_path: Optional[str] = LLM_CACHE_PATH, debug_logs: Optional[List[str]] = None):
+        """
+        Loads the response cache and any debug logs.
+        """
+        self.by_key: Dict[str, Dict] = {}
+        self.by_label: Dict[str, deque] = {}
+        if cache_path and os.path.exists(cache_path):
+            for entry in read_cache(cache_path):
+                self.by_key[entry["key"]] = entry
+        for path in debug_logs or []:
+            if not os.path.exists(path):
+                continue
+            for label, content in parse_debug_log(path):
+                self.by_label.setdefault(label, deque()).append(content)
+
+    def is_retryable(self, error: Exception) -> bool:
+        """
+        Replay misses are permanent.
+        """
+        return False
+
+    def lookup(self, key: str, label: Optional[str]) -> Optional[LLMResponse]:
+        """
+        Returns the recorded response for a request hash or log label, if any.
+        """
+        if key in self.by_key:
+            entry = self.by_key[key]
+            return LLMResponse(entry["content"], entry.get("usage"), entry.get("model", DEFAULT_MODEL), cached=True)
+        queue = self.by_label.get(label) if label else None
+        if queue:
+            content = queue.popleft()
+            tokens = estimate_tokens(content)
+            return LLMResponse(content, {"prompt_tokens": 0, "completion_tokens": tokens, "total_tokens": tokens}, cached=True)
+        return None
+
+    def complete(self, model: str, messages: List[Dict], temperature=None, max_tokens=None,
+                 timeout: float = LLM_TIMEOUT, on_token=None, label: Optional[str] = None,
+                 response_format: Optional[Dict] = None) -> LLMResponse:
+        """
+        Replays the recorded response for a request; raises ReplayMiss when there is none.
+        """
+        response = self.lookup(request_key(model, messages, temperature, max_tokens, response_format), label)
+        if response is None:
+            raise ReplayMiss(f"No recorded response for {label or 'request'}")
+        if on_token:
+            on_token(response.content)
+        return response
+
+
+def read_cache(path: str) -> List[Dict]:
+    """
+    Reads the JSONL response cache, skipping lines that were cut off mid-write.
+    """
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def parse_debug_log(path: str) -> List[tuple]:
+    """
+    Splits an openai_responses_debug.txt-style log into (label, content) pairs.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    parts = re.split(r"^--- (.+?) ---$", text, flags=re.MULTILINE)
+    return [(parts[i].strip(), parts[i + 1].strip()) for i in range(1, len(parts) - 1, 2)]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of a list of values (0.0 when empty).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class LLMClient:
+    """
+    Single entry point for LLM calls: routes each call to a model tier, retries with exponential backoff and jitter,
+    applies timeouts, optionally streams, logs labelled responses and, in record mode, fills a JSONL cache the
+    replay backend can serve. Latency, tokens and cost are tracked per tier.
+    """
+
+    def __init__(self, backend=None, record_path: Optional[str] = None, debug_log: Optional[str] = LLM_DEBUG_LOG,
+                 max_retries: int = LLM_MAX_RETRIES, backoff: float = LLM_BACKOFF_SECONDS, timeout: float = LLM_TIMEOUT,
+                 tiers: Optional[Dict[str, str]] = None):
+        """
+        Wraps a backend (OpenAIBackend by default, created lazily on first call).
+        tiers maps "small"/"large" to model names.
+        """
+        self._backend = backend
+        self.record_path = record_path
+        self.debug_log = debug_log
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.tiers = tiers or {"small": SMALL_MODEL, "large": LARGE_MODEL}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def backend(self):
+        """
+        Returns the backend, creating the OpenAI one on first use.
+        """
+        if self._backend is None:
+            self._backend = OpenAIBackend()
+        return self._backend
+
+    def route(self, task: Optional[str], messages: List[Dict]) -> str:
+        """
+        Picks the tier for a call from its task type and prompt size.
+        """
+        if TASK_TIERS.get(task or "") != "small":
+            return "large"
+        size = sum(len(m.get("content", "")) for m in messages)
+        return "small" if size <= SMALL_TIER_MAX_CHARS else "large"
+
+    def complete(self, messages: List[Dict], model: Optional[str] = None, temperature=None, max_tokens=None,
+                 label: Optional[str] = None, on_token: Optional[Callable[[str], None]] = None,
+                 task: Optional[str] = None, accept: Optional[Callable[[str], bool]] = None,
+                 response_format: Optional[Dict] = None) -> LLMResponse:
+        """
+        Runs a chat completion and returns an LLMResponse.
+        Without an explicit model, the task decides the tier. When a small-tier answer fails accept(content),
+        the call is escalated to the large tier. label names the call in the debug log (e.g. "Pages [3, 4]")
+        so the log can be replayed later.
+        """
+        if model is None:
+            tier = self.route(task, messages)
+            model = self.tiers[tier]
+        else:
+            tier = "small" if model == self.tiers["small"] else "large"
+
+        response = self._call(tier, model, messages, temperature, max_tokens, label, on_token, response_format)
+        if tier == "small" and accept is not None and not accept(response.content):
+            print(f"[LLM] Low-confidence {task or 'small-tier'} answer, escalating to {self.tiers['large']}")
+            with self._lock:
+                self._stats["small"]["escalations"] += 1
+            response = self._call("large", self.tiers["large"], messages, temperature, max_tokens, label, on_token,
+                                  response_format)
+        return response
+
+    def _call(self, tier: str, model: str, messages: List[Dict], temperature, max_tokens,
+              label: Optional[str], on_token, response_format: Optional[Dict] = None) -> LLMResponse:
+        """
+        Calls the backend with retries and records latency and usage for the tier.
+        """
+        extra = {"response_format": response_format} if response_format else {}
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            try:
+                response = self.backend.complete(model, messages, temperature, max_tokens, self.timeout, on_token, label,
+                                                 **extra)
+                break
+            except Exception as e:
+                if attempt >= self.max_retries or not self.backend.is_retryable(e):
+                    raise
+                delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+                print(f"[LLM] {type(e).__name__}, retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                attempt += 1
+        latency = time.perf_counter() - start
+
+        prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        with self._lock:
+            stats = self._stats[tier]
+            stats["calls"] += 1
+            stats["latencies"].append(latency)
+            stats["prompt_tokens"] += response.usage.get("prompt_tokens", 0)
+            stats["completion_tokens"] += response.usage.get("completion_tokens", 0)
+            stats["cost_usd"] += (response.usage.get("prompt_tokens", 0) * prompt_price
+                                  + response.usage.get("completion_tokens", 0) * completion_price) / 1e6
+
+        if not response.cached:
+            self.record(request_key(model, messages, temperature, max_tokens, response_format), label, response)
+        return response
+
+    def prompt(self, prompt: str, **kwargs) -> LLMResponse:
+        """
+        Sends a single user message.
+        """
+        return self.complete([{"role": "user", "content": prompt}], **kwargs)
+
+    def reset_stats(self):
+        """
+        Clears the per-tier latency, token and cost counters.
+        """
+        self._stats = {
+            tier: {"calls": 0, "escalations": 0, "latencies": [], "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+            for tier in ("small", "large")
+        }
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Returns per-tier call counts, escalations, p50/p95 latency (seconds), tokens and estimated cost (USD).
+        """
+        with self._lock:
+            return {
+                tier: {
+                    "model": self.tiers[tier],
+                    "calls": s["calls"],
+                    "escalations": s["escalations"],
+                    "p50_seconds": round(percentile(s["latencies"], 0.5), 3),
+                    "p95_seconds": round(percentile(s["latencies"], 0.95), 3),
+                    "total_seconds": round(sum(s["latencies"]), 3),
+                    "prompt_tokens": s["prompt_tokens"],
+                    "completion_tokens": s["completion_tokens"],
+                    "cost_usd": round(s["cost_usd"], 4),
+                }
+                for tier, s in self._stats.items()
+            }
+
+    def record(self, key: str, label: Optional[str], response: LLMResponse):
+        """
+        Appends a live response to the debug log (when labelled) and to the record cache (in record mode).
+        """
+        with self._lock:
+            if label and self.debug_log:
+                with open(self.debug_log, "a", encoding="utf-8") as f:
+                    f.write(f"\n\n--- {label} ---\n{response.content}\n")
+            if self.record_path:
+                with open(self.record_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({
+                        "key": key, "label": label, "model": response.model,
+                        "content": response.content, "usage": response.usage,
+                    }, ensure_ascii=False) + "\n")
+
+
+_client: Optional[LLMClient] = None
+
+
+def get_client() -> LLMClient:
+    """
+    Returns the process-wide client, configured from LLM_BACKEND:
+    "openai" calls the API, "record" calls the API and caches responses, "replay" serves the cache and debug log.
+    """
+    global _client
+    if _client is None:
+        if LLM_BACKEND == "replay":
+            _client = LLMClient(ReplayBackend(LLM_CACHE_PATH, [LLM_DEBUG_LOG]), debug_log=None)
+        elif LLM_BACKEND == "record":
+            _client = LLMClient(record_path=LLM_CACHE_PATH)
+        else:
+            _client = LLMClient()
+    return _client
+
+
+def set_client(client: Optional[LLMClient]):
+    """
+    Replaces the process-wide client, e.g. with a replay or fake backend for tests and benchmarks.
+    """
+    global _client
+    _client = client
@@ -1,21 +1,37 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .quick_scrape import scrapeticker as quick_scrape
-from .deep_scrape import scrapeticker as deep_scrape
-from .parser import parsed_pdf
-from .structure import save_to_db, load_from_db
+from fastapi.responses import Response, StreamingResponse
+from .structure import save_to_db, load_from_db, query_company_data, find_missing_years, migrate as migrate_company
+from .fiscal_years import fiscal_year_window
+from .llm_client import get_client
+from .extraction_schema import extraction_stats
+from .metrics_store import load_series, load_metric_panel, series_to_json
+from .screening import screen, rank
+from .derived_metrics import load_derived
+from .provenance import load_provenance, reextract_value
+from .progress import run_with_events, format_sse, format_ndjson
+from .data_version import load_version, migrate as migrate_data_version
+from .http_cache import make_etag, not_modified, encode_body, cache_headers
+from .single_flight import SingleFlight, ticker_lock
+from .job_context import JobContext
+from .pdf_store import materialize_pdf
 import logging
 import traceback
 import os
 import json
-from dotenv import load_dotenv
-
-load_dotenv()
+from typing import Optional
 
 API_BASE_URL = os.getenv("API_BASE_URL")
 PDF_DIR = os.path.join(os.path.dirname(__file__), "../pdfs")
 COMPANY_TABLE_PATH = os.path.join(os.path.dirname(__file__), "../company_table.json")
 
+# APP_MODE=serve answers from the database only and never imports the scraping/parsing stack
+# (playwright, openai, requests, fitz, pdfplumber), which keeps cold starts of read-only workers fast.
+SERVE_ONLY = os.getenv("APP_MODE", "full") == "serve"
+
+# Concurrent requests for the same pipeline run share one run in this process
+PIPELINE_RUNS = SingleFlight()
+
 app = FastAPI()
 
 app.add_middleware(
@@ -26,9 +42,18 @@ app.add_middleware(
         ],
     allow_credentials=True,
     allow_methods=["GET", "POST"],
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", "If-None-Match", "If-Modified-Since"],
+    expose_headers=["ETag", "Last-Modified"],
 )
 
+@app.on_event("startup")
+def run_migrations():
+    """
+    Creates and upgrades the data tables and DataVersion once per start, so the read paths never write.
+    """
+    migrate_company()
+    migrate_data_version()
+
 class ScrapeError(Exception):
     """Custom exception for scraping errors."""
     def __init__(self, message: str):
@@ -58,6 +83,19 @@ class FileSaveError(Exception):
 
 
 
+def load_pipeline():
+    """
+    Imports the scrapers and the parser on first use and returns (quick_scrape, deep_scrape, parsed_pdf).
+    .env is loaded here rather than at import, since only the pipeline needs the API keys.
+    """
+    from dotenv import load_dotenv
+    from .quick_scrape import scrapeticker as quick_scrape
+    from .deep_scrape import scrapeticker as deep_scrape
+    from .parser import parsed_pdf
+
+    load_dotenv()
+    return quick_scrape, deep_scrape, parsed_pdf
+
 def save_company_info(company_name, ticker, ir_url):
     """
     Saves or updates company information (name, ticker, IR URL) to a JSON file.
@@ -98,27 +136,268 @@ def get_company_info(ticker):
         return data.get(ticker)
     return None
 
+def cached_response(request: Request, ticker: str, build):
+    """
+    Answers a read of a ticker's data with HTTP caching: a strong ETag from the ticker's data version
+    and the request URL, 304 when the client's copy is current (without touching the data tables),
+    and compression for large payloads. Returns None when nothing is stored for the ticker yet.
+    """
+    version = load_version(ticker)
+    if version is None:
+        return None
+    etag = make_etag(ticker, version[0], f"{request.url.path}?{request.url.query}")
+    current = not_modified(request.headers, etag, version[1])
+    if current:
+        return Response(status_code=304, headers=cache_headers(current, version[1]))
+    body, encoding = encode_body(build(), request.headers.get("accept-encoding"))
+    return Response(body, media_type="application/json", headers=cache_headers(etag, version[1], encoding))
+
+@app.get("/series/{ticker}")
+def get_series(request: Request, ticker: str, metrics: Optional[str] = None, year_from: Optional[int] = None,
+               year_to: Optional[int] = None):
+    """
+    Returns metric × year arrays for a ticker from the columnar metrics store.
+    Metrics can be limited with a comma-separated list.
+    """
+    def build():
+        series = load_series(ticker, metrics.split(",") if metrics else None, year_from, year_to)
+        return {
+            "ticker": ticker,
+            "years": series["years"],
+            "metrics": {metric: series_to_json(values) for metric, values in series["metrics"].items()}
+        }
+    return cached_response(request, ticker, build) or build()
+
+@app.get("/compare")
+def compare_metric(metric: str, tickers: Optional[str] = None, year_from: Optional[int] = None, year_to: Optional[int] = None):
+    """
+    Returns one metric for several tickers on a shared year axis, for cross-company comparison.
+    """
+    panel = load_metric_panel(metric, tickers.split(",") if tickers else None, year_from, year_to)
+    return {
+        "metric": metric,
+        "years": panel["years"],
+        "tickers": {ticker: series_to_json(values) for ticker, values in panel["tickers"].items()}
+    }
+
+@app.get("/derived/{ticker}")
+def get_derived(request: Request, ticker: str, metrics: Optional[str] = None):
+    """
+    Returns the precomputed growth rates, margins, ratios and CAGRs for a ticker.
+    """
+    def build():
+        return {"ticker": ticker, "derived": load_derived(ticker, metrics.split(",") if metrics else None)}
+    return cached_response(request, ticker, build) or build()
+
+@app.get("/screen")
+def run_screen(metric: str, op: str, value: float, years: int = 1, year_to: Optional[int] = None, limit: Optional[int] = None):
+    """
+    Screens all tickers for a metric condition held over the last N years,
+    e.g. /screen?metric=Revenue YoY Growth&op=gt&value=0.1&years=3.
+    """
+    try:
+        results = screen(metric, op, value, years, year_to, limit)
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"metric": metric, "op": op, "value": value, "years": years, "results": results}
+
+@app.get("/rank")
+def run_rank(metric: str, year: int, limit: int = 20, order: str = "desc"):
+    """
+    Ranks all tickers by a metric in a given year, e.g. /rank?metric=Gross Margin&year=2023&limit=20.
+    """
+    return {"metric": metric, "year": year, "results": rank(metric, year, limit, order != "asc")}
+
+@app.get("/provenance/{ticker}")
+def get_provenance(ticker: str, year: Optional[int] = None, metric: Optional[str] = None):
+    """
+    Returns the source PDF hash, page, text span and bbox of a ticker's stored values.
+    """
+    return {"ticker": ticker, "provenance": load_provenance(ticker, year, metric)}
+
+@app.post("/reextract/{ticker}")
+def reextract(ticker: str, year: int, metric: str, statement_type: Optional[str] = None):
+    """
+    Re-extracts one value from the page it was taken from and stores the corrected number.
+    """
+    if SERVE_ONLY:
+        return {"error": "Re-extraction is disabled in serve mode."}
+    try:
+        return reextract_value(ticker, year, metric, statement_type)
+    except (ValueError, FileNotFoundError) as e:
+        return {"error": str(e)}
+
+@app.get("/llm/stats")
+def llm_stats():
+    """
+    Returns LLM latency, token and cost totals per model tier since the server started,
+    plus the extraction parse-failure counts under "extraction".
+    """
+    return {**get_client().stats(), "extraction": extraction_stats()}
+
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO)
 
 
 @app.get("/scrape/{ticker}")
-def run_pipeline(ticker: str):
+def scrape(request: Request, ticker: str, refresh: bool = False, year_from: Optional[int] = None,
+           year_to: Optional[int] = None, statement_type: Optional[str] = None, metrics: Optional[str] = None,
+           limit: Optional[int] = None, cursor: Optional[str] = None):
+    """
+    Serves a stored ticker with HTTP caching (ETag/304, compression), or runs the pipeline when
+    nothing is stored yet or refresh=true.
+    A stored ticker can be projected with comma-separated statement_type and metrics, year_from/year_to,
+    and paged with limit; pass the returned next_cursor back as cursor for the next page.
+    """
+    statement_types = statement_type.split(",") if statement_type else None
+    metric_list = metrics.split(",") if metrics else None
+    if not refresh:
+        def build():
+            return company_page(ticker, statement_types, metric_list, year_from, year_to, limit, cursor)
+
+        try:
+            cached = cached_response(request, ticker, build)
+        except ValueError as e:
+            return {"error": str(e)}
+        if cached is not None:
+            print(f"[CACHE HIT] Returning saved data for {ticker}")
+            return cached
+    return run_pipeline(ticker, refresh, year_from, year_to, statement_types, metric_list, limit, cursor)
+
+def company_page(ticker: str, statement_types: Optional[list] = None, metrics: Optional[list] = None,
+                 year_from: Optional[int] = None, year_to: Optional[int] = None, limit: Optional[int] = None,
+                 cursor: Optional[str] = None) -> dict:
+    """
+    Builds the /scrape/{ticker} response for a projection of the stored data, with next_cursor when paged.
+    Raises ValueError when the cursor is malformed.
+    """
+    page = query_company_data(ticker, statement_types, metrics, year_from, year_to, limit, cursor)
+    if limit is None:
+        return {"company": ticker, "results": page["results"]}
+    return {"company": ticker, "results": page["results"], "next_cursor": page["next_cursor"]}
+
+def run_pipeline(ticker: str, refresh: bool = False, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                 statement_types: Optional[list] = None, metrics: Optional[list] = None, limit: Optional[int] = None,
+                 cursor: Optional[str] = None):
     """
     Runs the full data pipeline for a given company ticker, including scraping, parsing, and structuring.
+    With refresh=true, a cached ticker is updated incrementally: only fiscal years that are missing or only
+    known from another filing's historical data are scraped and parsed.
+    """
+    return coalesced_pipeline(ticker, refresh, year_from, year_to, statement_types=statement_types, metrics=metrics,
+                              limit=limit, cursor=cursor)
+
+def serve_stored(ticker: str, refresh: bool = False) -> dict:
+    """
+    Answers a pipeline request in serve mode from the database alone, without locking the ticker or
+    creating a job: the stored data when it is there (covering the fiscal year window, for refresh), else an error.
+    """
+    db_data = load_from_db(ticker)
+    if db_data and refresh:
+        try:
+            gaps = find_missing_years(ticker, fiscal_year_window())
+        except ValueError as e:
+            return {"error": str(e)}
+        if gaps["missing"] or gaps["stale"]:
+            db_data = None
+    if not db_data:
+        return {"error": f"No up-to-date data for {ticker}; scraping is disabled in serve mode."}
+    return {"company": ticker, "results": db_data}
+
+def coalesced_pipeline(ticker: str, refresh: bool = False, year_from: Optional[int] = None,
+                       year_to: Optional[int] = None, on_event=None, statement_types: Optional[list] = None,
+                       metrics: Optional[list] = None, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """
+    Runs the pipeline at most once at a time per ticker. Callers asking for the same run while it is in flight
+    in this process wait for its result (and get its progress events) instead of scraping again, and the
+    ticker's file lock serializes runs across worker processes, so a run that waited finds the data stored.
+    The pipeline always covers the configured fiscal year window; the results are then projected like a
+    stored ticker's, by statement_types, metrics, year_from/year_to, limit and cursor.
+    """
+    if year_from is not None and year_to is not None and year_from > year_to:
+        return {"error": f"Invalid year range: {year_from}-{year_to}"}
+
+    if SERVE_ONLY:
+        result = serve_stored(ticker, refresh)
+    else:
+        def run(broadcast):
+            try:
+                with ticker_lock(ticker), JobContext(ticker, broadcast, PDF_DIR) as job:
+                    return pipeline(ticker, refresh, job)
+            except TimeoutError as e:
+                return {"error": str(e)}
+        result = PIPELINE_RUNS.do((ticker, refresh), run, on_event)
+
+    projected = statement_types or metrics or cursor or any(v is not None for v in (year_from, year_to, limit))
+    if "results" in result and projected:
+        try:
+            result = {**result, **company_page(ticker, statement_types, metrics, year_from, year_to, limit, cursor)}
+        except ValueError as e:
+            return {"error": str(e)}
+    return result
+
+@app.get("/scrape/{ticker}/stream")
+def stream_pipeline(ticker: str, refresh: bool = False, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                    format: str = "sse"):
     """
+    Runs the pipeline like /scrape/{ticker} but streams its progress as Server-Sent Events
+    (or newline-delimited JSON with format=ndjson): ir_url, pdf_downloaded, pages_filtered, pages_without_text,
+    block_extracted and year_stored with that year's values as soon as they are saved, then done (or error) with the full results.
+    """
+    events = run_with_events(lambda on_event: coalesced_pipeline(ticker, refresh, year_from, year_to, on_event))
+    if format == "ndjson":
+        return StreamingResponse((format_ndjson(e) for e in events), media_type="application/x-ndjson")
+    return StreamingResponse((format_sse(e) for e in events), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def year_results(ticker: str, year: int) -> dict:
+    """
+    Returns the stored values of one fiscal year of a ticker, by statement type.
+    """
+    return {
+        st_type: years[year]
+        for st_type, years in query_company_data(ticker, year_from=year, year_to=year)["results"].items()
+    }
+
+def pipeline(ticker: str, refresh: bool = False, job: Optional[JobContext] = None):
+    """
+    The scrape → parse → store pipeline behind /scrape/{ticker}, over the fiscal year window
+    (FISCAL_YEAR_FROM/FISCAL_YEAR_TO). Download state, token usage and progress events are kept
+    on the job, so pipelines for different tickers can run side by side.
+    """
+    if job is None:
+        with JobContext(ticker, pdf_dir=PDF_DIR) as job:
+            return pipeline(ticker, refresh, job)
     print(f"[START] Running pipeline for ticker: {ticker}")
 
     failed_tickers = []
 
+    try:
+        expected_years = fiscal_year_window()
+    except ValueError as e:
+        return {"error": str(e)}
+
     db_data = load_from_db(ticker)
-    if db_data:
+    if db_data and not refresh:
         print(f"[CACHE HIT] Returning saved data for {ticker}")
         return {"company": ticker, "results": db_data}
 
-    print(f"[CACHE MISS] No data found for {ticker}. Starting scrape...")
+    if db_data:
+        gaps = find_missing_years(ticker, expected_years)
+        target_years = sorted(gaps["missing"] + gaps["stale"])
+        if not target_years:
+            print(f"[UP TO DATE] {ticker} has filings for {expected_years[0]}-{expected_years[-1]}")
+            return {"company": ticker, "results": db_data}
+        print(f"[REFRESH] {ticker} missing years: {gaps['missing']}, stale years: {gaps['stale']}")
+    else:
+        print(f"[CACHE MISS] No data found for {ticker}. Starting scrape...")
+        target_years = expected_years
+
+    if SERVE_ONLY:
+        return {"error": f"No up-to-date data for {ticker}; scraping is disabled in serve mode."}
+    quick_scrape, deep_scrape, parsed_pdf = load_pipeline()
+    job.emit("started", ticker=ticker, years=target_years, refresh=bool(db_data))
 
-    pdfs_before = set(os.listdir(PDF_DIR))
     company_name = ticker
     ir_url = ""
     downloaded_years = []
@@ -126,7 +405,7 @@ def run_pipeline(ticker: str):
 
     # Quick Scrape
     try:
-        result = quick_scrape(ticker)
+        result = quick_scrape(ticker, target_years, job=job)
         company_name, ir_url = result["name"], result["ir_url"]
         downloaded_years = result["downloaded_years"]
         missed_years = result["missed_years"]
@@ -141,13 +420,12 @@ def run_pipeline(ticker: str):
         failed_tickers.append(ticker)  
 
     # Deep Scrape if quick scrape fails
-    expected_years = list(range(2015, 2025))
-    if sorted(downloaded_years) == expected_years:
-        print(f"[ QUICK SCRAPE COMPLETE] 10  pdfs downloaded. No deep scrape needed.")
+    if sorted(downloaded_years) == target_years:
+        print(f"[ QUICK SCRAPE COMPLETE] {len(target_years)} pdfs downloaded. No deep scrape needed.")
     elif missed_years:
         print(f"[Missing years: {missed_years}] Trying deep scrape...")
         try:
-            result = deep_scrape(ticker, missed_years)
+            result = deep_scrape(ticker, missed_years, job=job)
             downloaded_years += result["downloaded_years"]
             missed_years = result["missed_years"]
             ir_url = result["ir_url"]
@@ -163,29 +441,34 @@ def run_pipeline(ticker: str):
     if not downloaded_years:
         return {"error": "No pdfs were successfully downloaded."}
 
-    # Find the downloaded pdfs
-    pdfs_after = set(os.listdir(PDF_DIR))
-    new_pdfs = sorted(list(pdfs_after - pdfs_before), reverse=True)
+    # Find the downloaded pdfs for the target years, newest first
+    new_pdfs = sorted([
+        f"{ticker.upper()}_{year}.pdf"
+        for year in target_years
+        if materialize_pdf(ticker, year, job.pdf_dir)
+    ], reverse=True)
 
     print(f"[PARSER] New pdfs to process: {new_pdfs}")
 
     for pdf_file in new_pdfs:
         try:
             year = int(pdf_file.split("_")[1].replace(".pdf", ""))
-            pdf_path = os.path.join(PDF_DIR, pdf_file)
+            pdf_path = job.pdf_path(pdf_file)
 
             print(f"[PARSER] Parsing {pdf_file}...")
-            parsed_output = parsed_pdf(pdf_path)
+            parsed_output = parsed_pdf(pdf_path, job=job)
 
             structured_data = {
                 "company": company_name,
                 "ticker": ticker,
                 "ir_url": ir_url,
+                "year": year,
                 "data": parsed_output
             }
 
             print(f"[STRUCTURE] Structuring and saving data for {company_name} {year}")
-            save_to_db(company_name, structured_data)
+            rows = save_to_db(company_name, structured_data)
+            job.emit("year_stored", year=year, rows=rows, results=year_results(ticker, year))
 
         except DataParseError as e:
             logging.error(f"[DATA ERROR] {ticker} - {e}")
@@ -196,5 +479,12 @@ def run_pipeline(ticker: str):
             traceback.print_exc()  
             failed_tickers.append(ticker)  
 
+    for tier, stats in get_client().stats().items():
+        print(f"[LLM] {tier}: {stats['calls']} calls, p50 {stats['p50_seconds']}s, "
+              f"{stats['escalations']} escalations, ${stats['cost_usd']}")
+    parse_stats = extraction_stats()
+    print(f"[LLM] extraction: {parse_stats['responses']} responses, parse failure rate {parse_stats['parse_failure_rate']}, "
+          f"{parse_stats['repaired']} repaired, {parse_stats['dropped']} dropped")
+    print(f"[TOKENS] {ticker}: ~{job.prompt_tokens} scraper prompt tokens, {job.parser_tokens} parser tokens")
     print(f"[DONE] Pipeline complete for {ticker}")
     return {"company": ticker, "results": load_from_db(ticker)}
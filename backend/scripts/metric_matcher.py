@@ -0,0 +1,217 @@
+# metric_matcher.py
+
+import math
+import re
+from typing import Dict, List, Tuple
+
+NGRAM_SIZE = 3
+MIN_MATCH_SCORE = 0.55
+
+# Tokens that change what a line item measures; labels that disagree on them never match.
+QUALIFIER_TOKENS = {"other", "non", "basic", "diluted", "attributable", "controlling"}
+
+STOPWORDS = {"and", "of", "the", "for", "in", "on", "at", "to", "from", "a", "an", "total", "year", "period", "ended"}
+
+# Parenthesized words that only flag the sign of a line item, e.g. "Net income (loss)"; they are dropped.
+SIGN_QUALIFIERS = {"loss", "losses", "gain", "gains", "deficit", "decrease"}
+
+# Abbreviation → words, expanded before synonyms so that "Research and development (R&D)" reads once.
+ABBREVIATIONS = {
+    "r d": "research development",
+    "sg a": "selling general administrative",
+}
+
+# Phrase → canonical phrase, applied to normalized labels (longest phrases first).
+SYNONYMS = {
+    "total net sales": "revenue",
+    "net sales": "revenue",
+    "net revenue": "revenue",
+    "net revenues": "revenue",
+    "revenues": "revenue",
+    "turnover": "revenue",
+    "cost of goods sold": "cost of sales",
+    "costs of goods sold": "cost of sales",
+    "cost of revenue": "cost of sales",
+    "cost of revenues": "cost of sales",
+    "gross profit on sales": "gross profit",
+    "income from operations": "operating income",
+    "operating profit": "operating income",
+    "profit from operations": "operating income",
+    "net profit": "net income",
+    "profit from equity method": "earnings from equity method",
+    "profit for the year": "net income",
+    "income before income taxes": "income before taxes",
+    "income before tax": "income before taxes",
+    "profit before tax": "income before taxes",
+    "stockholders equity": "shareholders equity",
+    "shareholder equity": "shareholders equity",
+    "earnings per share": "eps",
+    "net income per ordinary share": "eps",
+    "property plant equipment": "ppe",
+    "purchases of": "purchase of",
+    "administration": "administrative",
+    "development costs": "development expenses",
+    "marketing costs": "marketing expenses",
+    "administrative costs": "administrative expenses",
+    "net cash provided by used in": "net cash",
+    "net cash provided by": "net cash",
+    "net cash used in": "net cash",
+    "net cash flows from used in": "net cash",
+    "net cash flows from": "net cash",
+    "cash flows from": "net cash",
+    "increase decrease": "increase",
+    "changes in exchange rates": "exchange rate changes",
+    "currency translation": "exchange rate changes",
+}
+
+# Words that are only synonyms when they make up the whole label: "Sales" is revenue, "Cost of sales" is not.
+WHOLE_LABEL_SYNONYMS = {
+    "sales": "revenue",
+    "costs": "expenses",
+}
+
+
+def _dedupe_tokens(text: str) -> str:
+    tokens = []
+    for token in text.split():
+        if token not in tokens:
+            tokens.append(token)
+    return " ".join(tokens)
+
+
+def normalize_label(label: str) -> str:
+    """
+    Normalizes a metric label to lowercase tokens with sign qualifiers and stopwords removed and synonyms applied.
+    """
+    text = label.lower().replace("’", "'").replace("&", " ")
+    text = re.sub(
+        r"\(([^)]*)\)",
+        lambda m: " " if m.group(1).strip() in SIGN_QUALIFIERS else f" {m.group(1)} ",
+        text
+    )
+    text = " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+    for phrase, words in ABBREVIATIONS.items():
+        text = re.sub(rf"\b{phrase}\b", words, text)
+    # Drop words repeated by the abbreviation, e.g. "research and development research development"
+    text = _dedupe_tokens(text)
+    for phrase in sorted(SYNONYMS, key=len, reverse=True):
+        text = re.sub(rf"\b{phrase}\b", SYNONYMS[phrase], text)
+    text = " ".join(t for t in text.split() if t not in STOPWORDS)
+    text = WHOLE_LABEL_SYNONYMS.get(text, text)
+    return _dedupe_tokens(text)
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> Dict[str, int]:
+    """
+    Counts character n-grams of a normalized label, padded so word boundaries count.
+    """
+    padded = f" {text} "
+    counts: Dict[str, int] = {}
+    for i in range(len(padded) - n + 1):
+        gram = padded[i:i + n]
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+class MetricIndex:
+    """
+    Matches issuer-specific line items to reference metrics.
+    Reference labels are vectorized once (character n-gram TF-IDF); each filing's candidates are then scored
+    against every reference metric of a statement in one sparse matrix product and assigned one-to-one.
+    """
+
+    def __init__(self, reference_metrics: Dict[str, List[str]]):
+        """
+        Builds the index from {statement type: [reference metric, ...]}.
+        A reference_keys_2024.json mapping of {statement type: {metric: value}} is accepted as well.
+        """
+        self.reference_metrics = {stype: list(metrics) for stype, metrics in reference_metrics.items()}
+        self.normalized = {
+            stype: [normalize_label(m) for m in metrics]
+            for stype, metrics in self.reference_metrics.items()
+        }
+
+        documents = [label for labels in self.normalized.values() for label in labels]
+        document_frequency: Dict[str, int] = {}
+        for label in documents:
+            for gram in char_ngrams(label):
+                document_frequency[gram] = document_frequency.get(gram, 0) + 1
+        total = len(documents)
+        self.idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+        self.unseen_idf = math.log(1 + total) + 1
+
+        # Inverted index: n-gram → [(statement type, reference position, weight)]
+        self.postings: Dict[str, List[Tuple[str, int, float]]] = {}
+        for stype, labels in self.normalized.items():
+            for position, label in enumerate(labels):
+                for gram, weight in self.vectorize(label).items():
+                    self.postings.setdefault(gram, []).append((stype, position, weight))
+
+    def vectorize(self, label: str) -> Dict[str, float]:
+        """
+        Returns the L2-normalized TF-IDF vector of a normalized label.
+        """
+        vector = {
+            gram: count * self.idf.get(gram, self.unseen_idf)
+            for gram, count in char_ngrams(label).items()
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {gram: w / norm for gram, w in vector.items()}
+
+    def score_matrix(self, stype: str, candidates: List[str]) -> List[List[float]]:
+        """
+        Scores every candidate against every reference metric of a statement.
+        Cosine similarity of the n-gram vectors is scaled by token recall and precision, so that extra words
+        ("Net interest income" vs "Net income") lower the score, and qualifier mismatches rule a pair out.
+        """
+        references = self.normalized.get(stype, [])
+        scores = [[0.0] * len(candidates) for _ in references]
+        candidate_labels = [normalize_label(c) for c in candidates]
+
+        for column, label in enumerate(candidate_labels):
+            for gram, weight in self.vectorize(label).items():
+                for posting_stype, row, ref_weight in self.postings.get(gram, ()):
+                    if posting_stype == stype:
+                        scores[row][column] += weight * ref_weight
+
+        for row, ref_label in enumerate(references):
+            ref_tokens = set(ref_label.split())
+            for column, label in enumerate(candidate_labels):
+                if label == ref_label:
+                    scores[row][column] = 1.0
+                    continue
+                tokens = set(label.split())
+                if not tokens or not ref_tokens or (tokens ^ ref_tokens) & QUALIFIER_TOKENS:
+                    scores[row][column] = 0.0
+                    continue
+                overlap = len(ref_tokens & tokens)
+                scores[row][column] *= (overlap / len(ref_tokens)) * (overlap / len(tokens))
+        return scores
+
+    def match(self, stype: str, available_metrics: Dict) -> Dict[str, str]:
+        """
+        Assigns available line items to reference metrics of a statement, best scores first and one-to-one.
+        Returns {reference metric: available key}; reference metrics without a good enough match are omitted.
+        """
+        references = self.reference_metrics.get(stype, [])
+        candidates = list(available_metrics.keys())
+        if not references or not candidates:
+            return {}
+
+        scores = self.score_matrix(stype, candidates)
+        ranked = sorted(
+            ((scores[row][column], row, column)
+             for row in range(len(references))
+             for column in range(len(candidates))
+             if scores[row][column] >= MIN_MATCH_SCORE),
+            reverse=True
+        )
+
+        assigned: Dict[str, str] = {}
+        used_columns = set()
+        for _, row, column in ranked:
+            if references[row] in assigned or column in used_columns:
+                continue
+            assigned[references[row]] = candidates[column]
+            used_columns.add(column)
+        return assigned
@@ -0,0 +1,164 @@
+# metric_registry.py
+
+import json
+import os
+import re
+import sqlite3
+from typing import Dict, Optional
+
+try:
+    from . import structure
+    from .llm_client import get_client
+except ImportError:
+    import structure
+    from llm_client import get_client
+
+
+def label_key(label: str) -> str:
+    """
+    Normalizes an issuer label for alias lookup (case, punctuation and whitespace insensitive).
+    """
+    return " ".join(re.sub(r"[^a-z0-9&%]+", " ", label.lower().replace("’", "'")).split())
+
+
+def ensure_alias_table(cursor):
+    """
+    Ensures that the MetricAlias table exists.
+    A NULL canonical name records a label that was reviewed and deliberately left out.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS MetricAlias (
+            statement_type TEXT,
+            label_key TEXT,
+            label TEXT,
+            canonical TEXT,
+            source TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (statement_type, label_key)
+        )
+    """)
+
+
+def ask_openai_canonical_names(unseen: Dict[str, list], known_canonical: Dict[str, list]) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    Asks OpenAI, in a single call, for the canonical name of every unseen label.
+    Returns {statement type: {label: canonical name or None}}.
+    """
+    prompt = f"""You are a financial data cleaning assistant. Map each issuer-specific line item below to a standardized metric name.
+
+Rules:
+1. Reuse one of the existing canonical names whenever it means the same thing.
+2. Otherwise use a short, standard English name (e.g. "Revenue", "Gross Profit", "Net Cash Provided by Operating Activities").
+3. Use null for subtotals, sub-components or items that are not a headline metric of the statement.
+
+Existing canonical names:
+{json.dumps(known_canonical)}
+
+Line items to map:
+{json.dumps(unseen)}
+
+Return valid JSON only, no markdown, in the form:
+{{ "Income Statement": {{ "<line item>": "<canonical name or null>", ... }}, ... }}
+"""
+    response = get_client().prompt(prompt, task="metric_aliases", temperature=0, max_tokens=2000, label="Metric aliases")
+    raw = response.content.replace("```json", "").replace("```", "").strip()
+    return json.loads(raw)
+
+
+class MetricRegistry:
+    """
+    Persistent mapping from issuer-specific labels to canonical metric names.
+    All aliases are loaded once, so known labels resolve locally in O(1); only unseen labels reach the LLM.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ask_llm=ask_openai_canonical_names):
+        """
+        Loads every known alias from the MetricAlias table.
+        """
+        self.db_path = db_path or structure.DB_PATH
+        self.ask_llm = ask_llm
+        self.aliases: Dict[tuple, Optional[str]] = {}
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        ensure_alias_table(cursor)
+        conn.commit()
+        cursor.execute("SELECT statement_type, label_key, canonical FROM MetricAlias")
+        for statement_type, key, canonical in cursor.fetchall():
+            self.aliases[(statement_type, key)] = canonical
+        conn.close()
+
+    def lookup(self, statement_type: str, label: str):
+        """
+        Returns (known, canonical name) for a label without calling the LLM.
+        """
+        key = (statement_type, label_key(label))
+        return key in self.aliases, self.aliases.get(key)
+
+    def add_aliases(self, mapping: Dict[str, Dict[str, Optional[str]]], source: str = "manual"):
+        """
+        Stores {statement type: {label: canonical}} aliases in memory and in the database.
+        """
+        rows = [
+            (statement_type, label_key(label), label, canonical, source)
+            for statement_type, labels in mapping.items()
+            for label, canonical in labels.items()
+        ]
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        ensure_alias_table(cursor)
+        cursor.executemany("""
+            INSERT OR REPLACE INTO MetricAlias (statement_type, label_key, label, canonical, source)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+        conn.close()
+
+        for statement_type, key, _, canonical, _ in rows:
+            self.aliases[(statement_type, key)] = canonical
+
+    def canonical_names(self) -> Dict[str, list]:
+        """
+        Returns the canonical names already in use, per statement type.
+        """
+        names: Dict[str, set] = {}
+        for (statement_type, _), canonical in self.aliases.items():
+            if canonical:
+                names.setdefault(statement_type, set()).add(canonical)
+        return {statement_type: sorted(values) for statement_type, values in names.items()}
+
+    def canonicalize(self, data: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+        """
+        Renames {statement type: {label: value}} to canonical metric names.
+        Unseen labels are resolved in one batched LLM call and written back. When several labels map to the same
+        canonical name, the first one wins; labels mapped to null are dropped.
+        """
+        unseen: Dict[str, list] = {}
+        for statement_type, items in data.items():
+            for label in items:
+                known, _ = self.lookup(statement_type, label)
+                if not known and label not in unseen.get(statement_type, []):
+                    unseen.setdefault(statement_type, []).append(label)
+
+        if unseen:
+            count = sum(len(labels) for labels in unseen.values())
+            print(f"[REGISTRY] Resolving {count} unseen labels with one LLM call")
+            answers = self.ask_llm(unseen, self.canonical_names())
+            # Labels the model skipped stay unseen so the next run asks again
+            self.add_aliases({
+                statement_type: {
+                    label: answers[statement_type][label]
+                    for label in labels
+                    if label in answers.get(statement_type, {})
+                }
+                for statement_type, labels in unseen.items()
+            }, source="llm")
+
+        cleaned: Dict[str, Dict[str, str]] = {}
+        for statement_type, items in data.items():
+            section = cleaned.setdefault(statement_type, {})
+            for label, value in items.items():
+                _, canonical = self.lookup(statement_type, label)
+                if canonical and canonical not in section:
+                    section[canonical] = value
+        return cleaned
@@ -0,0 +1,209 @@
+# metrics_store.py
+
+import math
+import sqlite3
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from . import structure
+except ImportError:
+    import structure
+
+
+def ensure_series_table(cursor):
+    """
+    Ensures that the MetricSeries table exists.
+    Each row holds one metric of one ticker as a float64 array indexed by year, starting at first_year.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS MetricSeries (
+            ticker TEXT,
+            metric TEXT,
+            statement_type TEXT,
+            first_year INTEGER,
+            year_values BLOB,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (ticker, metric)
+        )
+    """)
+
+
+def pack_values(values: array) -> bytes:
+    """
+    Serializes a float64 array as little-endian bytes.
+    """
+    if sys.byteorder != "little":
+        values = array("d", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_values(blob: bytes) -> array:
+    """
+    Deserializes little-endian bytes written by pack_values into a float64 array.
+    """
+    values = array("d")
+    values.frombytes(blob)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def refresh_series(cursor, ticker: str, metrics: Optional[Iterable[str]] = None):
+    """
+    Rebuilds the MetricSeries rows of a ticker from the Company table.
+    Only the given metrics are rebuilt when metrics is provided, so save_to_db can refresh what it touched.
+    Values from the newest filing win; for the same filing, filing-year rows beat Historical rows.
+    """
+    ensure_series_table(cursor)
+
+    query = "SELECT year, statement_type, metric, value, filing_year FROM Company WHERE ticker = ?"
+    params: List = [ticker]
+    if metrics is not None:
+        metrics = sorted(set(metrics))
+        if not metrics:
+            return
+        query += f" AND metric IN ({','.join('?' for _ in metrics)})"
+        params += metrics
+    cursor.execute(query, params)
+
+    points: Dict[str, Dict[int, float]] = {}
+    precedence: Dict[tuple, tuple] = {}
+    statement_types: Dict[str, str] = {}
+    for year, st_type, metric, value, filing_year in cursor.fetchall():
+        if value is None or year is None:
+            continue
+        is_historical = st_type == "Historical"
+        if not is_historical or metric not in statement_types:
+            statement_types[metric] = st_type
+        rank = (filing_year if filing_year is not None else year, not is_historical)
+        if rank >= precedence.get((metric, year), rank):
+            precedence[(metric, year)] = rank
+            points.setdefault(metric, {})[year] = value
+
+    if metrics is None:
+        cursor.execute("DELETE FROM MetricSeries WHERE ticker = ?", (ticker,))
+    else:
+        cursor.executemany("DELETE FROM MetricSeries WHERE ticker = ? AND metric = ?", [(ticker, m) for m in metrics])
+
+    rows = []
+    for metric, by_year in points.items():
+        first_year, last_year = min(by_year), max(by_year)
+        values = array("d", (by_year.get(y, math.nan) for y in range(first_year, last_year + 1)))
+        rows.append((ticker, metric, statement_types[metric], first_year, pack_values(values)))
+
+    cursor.executemany("""
+        INSERT INTO MetricSeries (ticker, metric, statement_type, first_year, year_values)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+
+
+def rebuild_all():
+    """
+    Rebuilds MetricSeries for every ticker in the Company table.
+    Used to backfill the store for data saved before it existed.
+    """
+    conn = sqlite3.connect(structure.DB_PATH)
+    cursor = conn.cursor()
+    structure.ensure_tables(cursor)
+    structure.migrate_company_table(cursor)
+    ensure_series_table(cursor)
+    cursor.execute("SELECT DISTINCT ticker FROM Company")
+    tickers = [row[0] for row in cursor.fetchall()]
+    for ticker in tickers:
+        refresh_series(cursor, ticker)
+    conn.commit()
+    conn.close()
+    print(f"[SERIES] Rebuilt metric series for {len(tickers)} tickers")
+
+
+def _align(rows, year_from: Optional[int], year_to: Optional[int]):
+    """
+    Puts (key, first_year, blob) rows on a shared year axis, padding missing years with NaN.
+    """
+    series = {key: (first_year, unpack_values(blob)) for key, first_year, blob in rows}
+    if not series:
+        return [], {}
+
+    start = min(first for first, _ in series.values())
+    end = max(first + len(values) - 1 for first, values in series.values())
+    start = max(start, year_from) if year_from is not None else start
+    end = min(end, year_to) if year_to is not None else end
+    years = list(range(start, end + 1))
+
+    aligned = {}
+    for key, (first_year, values) in series.items():
+        out = array("d", [math.nan]) * len(years)
+        lo, hi = max(start, first_year), min(end, first_year + len(values) - 1)
+        if lo <= hi:
+            out[lo - start:hi - start + 1] = values[lo - first_year:hi - first_year + 1]
+        aligned[key] = out
+    return years, aligned
+
+
+def read_series(cursor, ticker: str, metrics: Optional[List[str]] = None,
+                year_from: Optional[int] = None, year_to: Optional[int] = None) -> Dict:
+    """
+    Reads metric × year arrays for one ticker using an open cursor.
+    Returns {"years": [...], "metrics": {metric: array('d')}} with NaN for missing years.
+    """
+    query = "SELECT metric, first_year, year_values FROM MetricSeries WHERE ticker = ?"
+    params: List = [ticker]
+    if metrics:
+        query += f" AND metric IN ({','.join('?' for _ in metrics)})"
+        params += list(metrics)
+    try:
+        rows = cursor.execute(query, params).fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # not migrated yet
+
+    years, aligned = _align(rows, year_from, year_to)
+    return {"years": years, "metrics": aligned}
+
+
+def load_series(ticker: str, metrics: Optional[List[str]] = None,
+                year_from: Optional[int] = None, year_to: Optional[int] = None) -> Dict:
+    """
+    Loads metric × year arrays for one ticker, aligned on a shared ascending year axis.
+    Returns {"years": [...], "metrics": {metric: array('d')}} with NaN for missing years.
+    """
+    conn = sqlite3.connect(structure.DB_PATH)
+    series = read_series(conn.cursor(), ticker, metrics, year_from, year_to)
+    conn.close()
+    return series
+
+
+def load_metric_panel(metric: str, tickers: Optional[List[str]] = None,
+                      year_from: Optional[int] = None, year_to: Optional[int] = None) -> Dict:
+    """
+    Loads one metric for many tickers, aligned on a shared ascending year axis for cross-company comparison.
+    Returns {"years": [...], "tickers": {ticker: array('d')}} with NaN for missing years.
+    """
+    query = "SELECT ticker, first_year, year_values FROM MetricSeries WHERE metric = ?"
+    params: List = [metric]
+    if tickers:
+        query += f" AND ticker IN ({','.join('?' for _ in tickers)})"
+        params += list(tickers)
+    conn = sqlite3.connect(structure.DB_PATH)
+    try:
+        rows = conn.execute(query, params).fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # not migrated yet
+    finally:
+        conn.close()
+
+    years, aligned = _align(rows, year_from, year_to)
+    return {"years": years, "tickers": aligned}
+
+
+def series_to_json(values: array) -> List[Optional[float]]:
+    """
+    Converts a float64 array to a JSON-friendly list, mapping NaN to None.
+    """
+    return [None if math.isnan(v) else v for v in values]
+
+
+if __name__ == "__main__":
+    rebuild_all()
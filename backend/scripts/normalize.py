@@ -0,0 +1,158 @@
+# normalize.py
+
+import math
+import re
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+# Values in the parsed JSON are already in the filing's reporting unit, which is millions for most issuers.
+DEFAULT_UNIT_SCALE = 1e6
+
+SCALE_WORDS = {
+    "thousand": 1e3, "thousands": 1e3, "k": 1e3,
+    "million": 1e6, "millions": 1e6, "mn": 1e6, "mln": 1e6, "m": 1e6,
+    "billion": 1e9, "billions": 1e9, "bn": 1e9, "b": 1e9,
+}
+
+# Currency symbols and codes, including prefixed dollars such as "US$", "A$" and "HK$"
+CURRENCY_PATTERN = re.compile(r"(?:\b(?:us|a|c|nz|hk|s)\s?)?\$|[€£¥]|\b(?:eur|usd|gbp|chf|sek|dkk|nok)\b")
+VALUE_PATTERN = re.compile(r"^(?P<number>\d[\d.,\s']*|\.\d+)\s*(?P<scale>[a-z]+)?$")
+US_THOUSANDS_PATTERN = re.compile(r"^\d{1,3}(?:,\d{3})+$")
+PLAIN_NUMBER_PATTERN = re.compile(r"^(?:\d+(?:\.\d*)?|\.\d+)$")
+NUMBER_TOKEN_PATTERN = re.compile(r"\d[\d.,\s']*\d|\.\d+|\d")
+
+
+def _strip_grouping(number: str) -> str:
+    return number.replace(" ", "").replace("'", "").replace("\u202f", "").replace("\xa0", "")
+
+
+def _unambiguous_decimal(number: str) -> Optional[str]:
+    """
+    Returns the decimal separator ("." or ",") a digit string shows it uses, or None when it cannot tell:
+    no separator, or a single one followed by exactly three digits ("1.234" is 1.234 in US and 1234 in EU format).
+    """
+    has_comma, has_dot = "," in number, "." in number
+    if has_comma and has_dot:
+        return "," if number.rfind(",") > number.rfind(".") else "."
+    separator = "," if has_comma else "." if has_dot else None
+    if separator is None:
+        return None
+    if number.count(separator) > 1:
+        return "." if separator == "," else ","
+    return None if len(number) - number.rfind(separator) - 1 == 3 else separator
+
+
+def _to_float(number: str, decimal: Optional[str] = None) -> Optional[float]:
+    """
+    Converts a digit string with thousands/decimal separators to a float.
+    Accepts both US (1,234.5) and EU (1.234,5) conventions. Ambiguous strings such as "1.234" follow
+    `decimal`, the table's separator; without it "1,234" is read as 1234 and "1.234" as 1.234.
+    """
+    number = _strip_grouping(number)
+    separator = _unambiguous_decimal(number)
+    if separator is None:
+        if decimal is not None:
+            separator = decimal
+        else:
+            separator = "," if "," in number and not US_THOUSANDS_PATTERN.match(number) else "."
+
+    if separator == ",":
+        number = number.replace(".", "").replace(",", ".")
+    else:
+        number = number.replace(",", "")
+
+    if not PLAIN_NUMBER_PATTERN.match(number):
+        return None
+    return float(number)
+
+
+def decimal_separator(values: Iterable) -> Optional[str]:
+    """
+    Decides the decimal separator of a table from its unambiguous cells, e.g. "," when it holds "12.345,6".
+    Returns None when no cell shows it, or the majority separator when cells disagree.
+    """
+    votes = {".": 0, ",": 0}
+    for value in values:
+        if not isinstance(value, str):
+            continue
+        match = NUMBER_TOKEN_PATTERN.search(value)
+        separator = _unambiguous_decimal(_strip_grouping(match.group())) if match else None
+        if separator:
+            votes[separator] += 1
+    if not votes["."] and not votes[","]:
+        return None
+    return "," if votes[","] > votes["."] else "."
+
+
+def parse_number(value, unit_scale: float = DEFAULT_UNIT_SCALE, decimal: Optional[str] = None) -> Optional[float]:
+    """
+    Parses a single raw financial value into a float in the reporting unit.
+    Handles accounting negatives, currency symbols and scale words; returns None when it is not a number.
+    decimal is the decimal separator of the value's table (see decimal_separator), used for ambiguous values.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if math.isnan(value) else float(value)
+
+    text = CURRENCY_PATTERN.sub("", str(value).strip().lower()).strip()
+    # Accounting parentheses may be followed by a scale word: "(1,680.6) million"
+    parenthesised = False
+    if text.startswith("(") and ")" in text:
+        close = text.index(")")
+        parenthesised, text = True, f"{text[1:close].strip()} {text[close + 1:].strip()}".strip()
+    negative = False
+    if text[:1] in ("-", "−", "–"):
+        negative, text = True, text[1:].strip()
+    elif text.endswith("-"):
+        negative, text = True, text[:-1].strip()
+    # A sign inside parentheses, "(-5)", restates the same negative rather than cancelling it
+    negative = negative or parenthesised
+
+    match = VALUE_PATTERN.match(text)
+    if not match:
+        return None
+    number = _to_float(match.group("number").strip(), decimal)
+    if number is None:
+        return None
+
+    scale = match.group("scale")
+    if scale:
+        if scale not in SCALE_WORDS:
+            return None
+        number *= SCALE_WORDS[scale] / unit_scale
+
+    return -number if negative else number
+
+
+def normalize_values(values: Iterable, unit_scale: float = DEFAULT_UNIT_SCALE,
+                     decimal: Optional[str] = None) -> Tuple[array, array]:
+    """
+    Normalizes a column of raw values in one pass.
+    decimal is the table's decimal separator; by default it is decided from the column itself.
+    Returns a float64 array (NaN where rejected) and a reject mask (1 where the value could not be parsed).
+    """
+    values: List = list(values)
+    if decimal is None:
+        decimal = decimal_separator(values)
+    parsed = array("d")
+    rejected = array("b")
+    seen = {}
+
+    for value in values:
+        key = value if isinstance(value, str) else None
+        if key is not None and key in seen:
+            number = seen[key]
+        else:
+            number = parse_number(value, unit_scale, decimal)
+            if key is not None:
+                seen[key] = number
+
+        if number is None:
+            parsed.append(math.nan)
+            rejected.append(1)
+        else:
+            parsed.append(number)
+            rejected.append(0)
+
+    return parsed, rejected
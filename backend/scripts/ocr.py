@@ -0,0 +1,152 @@
+# ocr.py
+
+import hashlib
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from .page_text_cache import CACHE_DIR
+except ImportError:
+    from page_text_cache import CACHE_DIR
+
+OCR_ENABLED = os.getenv("OCR_ENABLED", "1") == "1"
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+# Pages with fewer characters than this in their text layer, but with images, are treated as scanned
+MIN_TEXT_CHARS = 20
+OCR_CACHE_DIR = os.path.join(CACHE_DIR, "ocr")
+
+_warned = threading.Event()
+
+
+def needs_ocr(page, text: str) -> bool:
+    """
+    True for a PyMuPDF page that has (almost) no text layer but does have images, i.e. a scanned page.
+    """
+    return len(text.strip()) < MIN_TEXT_CHARS and bool(page.get_images())
+
+
+def page_hash(doc, page_index: int) -> str:
+    """
+    Hashes what a page looks like (its content stream and the raw bytes of its images) together with the
+    OCR settings, so the same scanned page is recognised once, whichever filing or file name it comes in.
+    """
+    page = doc[page_index]
+    digest = hashlib.sha256(f"{OCR_LANGUAGE}:{OCR_DPI}:".encode("utf-8"))
+    digest.update(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+
+def ocr_available() -> bool:
+    """
+    True when Tesseract (used through PyMuPDF's OCR support) can be found.
+    """
+    return bool(os.getenv("TESSDATA_PREFIX") or shutil.which("tesseract"))
+
+
+def ocr_cache_kind(kind: str) -> str:
+    """
+    Returns the page-text cache kind to use for an extractor. Text extracted while OCR was active is cached
+    apart from text extracted without it, so scanned pages cached as "" are redone once Tesseract is installed.
+    """
+    return f"{kind}.ocr" if OCR_ENABLED and ocr_available() else kind
+
+
+def ocr_page(pdf_path: str, page_index: int) -> str:
+    """
+    OCRs one page with Tesseract through PyMuPDF. Runs in a worker process, so it opens the PDF itself.
+    """
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        page = doc[page_index]
+        textpage = page.get_textpage_ocr(language=OCR_LANGUAGE, dpi=OCR_DPI, full=True)
+        return page.get_text("text", textpage=textpage)
+
+
+def cached_ocr(digest: str) -> Optional[str]:
+    path = os.path.join(OCR_CACHE_DIR, digest[:2], f"{digest}.txt")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def save_ocr(digest: str, text: str):
+    directory = os.path.join(OCR_CACHE_DIR, digest[:2])
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f"{digest}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, os.path.join(directory, f"{digest}.txt"))
+
+
+def run_ocr(tasks: Dict[str, Tuple[str, int]], worker: Callable[[str, int], str] = ocr_page,
+            workers: int = OCR_WORKERS) -> Dict[str, str]:
+    """
+    Runs worker(pdf_path, page) for each {page hash: (pdf_path, page)} task not cached yet, in a process pool
+    when there is more than one, and caches every result by page hash. Failed pages are left out.
+    Returns {page hash: text}.
+    """
+    results = {}
+    missing = {}
+    for digest, task in tasks.items():
+        text = cached_ocr(digest)
+        if text is None:
+            missing[digest] = task
+        else:
+            results[digest] = text
+    if not missing:
+        return results
+
+    print(f"[OCR] Recognising {len(missing)} scanned pages ({len(tasks) - len(missing)} cached)")
+    workers = max(1, min(workers, len(missing)))
+    if workers == 1:
+        outcomes = {}
+        for digest, (pdf_path, page) in missing.items():
+            try:
+                outcomes[digest] = worker(pdf_path, page)
+            except Exception as e:
+                print(f"[OCR] Page {page + 1} of {os.path.basename(pdf_path)} failed: {e}")
+    else:
+        # spawn, not fork: the API process has threads (uvicorn, the refresh daemon) that fork would copy mid-flight
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {digest: pool.submit(worker, *task) for digest, task in missing.items()}
+            outcomes = {}
+            for digest, future in futures.items():
+                try:
+                    outcomes[digest] = future.result()
+                except Exception as e:
+                    pdf_path, page = missing[digest]
+                    print(f"[OCR] Page {page + 1} of {os.path.basename(pdf_path)} failed: {e}")
+
+    for digest, text in outcomes.items():
+        save_ocr(digest, text)
+    results.update(outcomes)
+    return results
+
+
+def ocr_pages(pdf_path: str, doc, pages: List[int]) -> Dict[int, str]:
+    """
+    Returns OCR text for the given (scanned) pages of an open PyMuPDF document, from the page-hash cache
+    where possible. Returns nothing when OCR is disabled or Tesseract is missing, after saying so once.
+    """
+    if not pages:
+        return {}
+    if not OCR_ENABLED or not ocr_available():
+        if not _warned.is_set():
+            _warned.set()
+            print(f"[OCR] {len(pages)} pages of {os.path.basename(pdf_path)} have no text layer and OCR is "
+                  f"{'disabled' if not OCR_ENABLED else 'unavailable (install Tesseract)'}, they will be skipped")
+        return {}
+
+    hashes = {p: page_hash(doc, p) for p in pages}
+    texts = run_ocr({digest: (pdf_path, p) for p, digest in hashes.items()})
+    return {p: texts[digest] for p, digest in hashes.items() if digest in texts}
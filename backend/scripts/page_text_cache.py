@@ -0,0 +1,196 @@
+# page_text_cache.py
+
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .pdf_store import file_sha256
+except ImportError:
+    from pdf_store import file_sha256
+
+CACHE_DIR = os.getenv("PAGE_TEXT_CACHE_DIR", os.path.join(os.path.dirname(__file__), "../text_cache"))
+MAX_OPEN_CACHES = 16
+
+# File layout: MAGIC, page count (uint32), one "extracted" flag byte per page, padding to 8 bytes,
+# page_count + 1 little-endian uint64 offsets into the UTF-8 text that follows.
+MAGIC = b"PTC1"
+
+_open: "OrderedDict[str, PageTextCache]" = OrderedDict()
+_hashes: Dict[tuple, str] = {}
+_lock = threading.Lock()
+
+
+def cache_path(sha256: str, kind: str) -> str:
+    """
+    Returns the cache file of one extractor's page texts for a document (by PDF sha256).
+    """
+    return os.path.join(CACHE_DIR, f"{sha256}.{kind}.ptc")
+
+
+def document_sha256(pdf_path: str) -> str:
+    """
+    Returns a PDF's sha256, hashed once per (path, size, mtime) in this process.
+    """
+    stat = os.stat(pdf_path)
+    key = (os.path.realpath(pdf_path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        sha256 = _hashes.get(key)
+    if sha256 is None:
+        sha256 = file_sha256(pdf_path)
+        with _lock:
+            _hashes[key] = sha256
+    return sha256
+
+
+class PageTextCache:
+    """
+    Read-only view of a page-text cache file through mmap. Page texts are decoded from the mapping on
+    access, so any number of parser passes and worker processes share one copy in the page cache.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a page text cache: {path}")
+        (self.page_count,) = struct.unpack_from("<I", self._mm, 4)
+        self._flags = self._mm[8:8 + self.page_count]
+        offsets_start = 8 + padded(self.page_count)
+        self._offsets = array("Q")
+        self._offsets.frombytes(self._mm[offsets_start:offsets_start + 8 * (self.page_count + 1)])
+        if sys.byteorder != "little":
+            self._offsets.byteswap()
+        self._data_start = offsets_start + 8 * (self.page_count + 1)
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def has_page(self, page: int) -> bool:
+        return 0 <= page < self.page_count and self._flags[page] == 1
+
+    def page_bytes(self, page: int) -> memoryview:
+        """
+        Returns the UTF-8 bytes of a page as a zero-copy view into the mapping.
+        """
+        start, end = self._offsets[page], self._offsets[page + 1]
+        return memoryview(self._mm)[self._data_start + start:self._data_start + end]
+
+    def page(self, page: int) -> str:
+        return str(self.page_bytes(page), "utf-8", "surrogatepass")
+
+    def pages(self) -> Dict[int, str]:
+        """
+        Returns every extracted page's text.
+        """
+        return {p: self.page(p) for p in range(self.page_count) if self.has_page(p)}
+
+    def close(self):
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # a caller still holds a page_bytes view; the mapping goes away with it
+
+
+def padded(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+def write_cache(path: str, page_count: int, texts: Dict[int, str]):
+    """
+    Writes the texts of the extracted pages of a document to a cache file, atomically.
+    """
+    flags = bytearray(padded(page_count))
+    offsets = array("Q", [0])
+    chunks = []
+    for page in range(page_count):
+        chunk = texts[page].encode("utf-8", "surrogatepass") if page in texts else b""
+        if page in texts:
+            flags[page] = 1
+            chunks.append(chunk)
+        offsets.append(offsets[-1] + len(chunk))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", page_count))
+        f.write(flags)
+        f.write(offsets.tobytes())
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+
+def _remember(path: str, cache: PageTextCache):
+    with _lock:
+        stale = _open.pop(path, None)
+        _open[path] = cache
+        while len(_open) > MAX_OPEN_CACHES:
+            _open.popitem(last=False)[1].close()
+    # Views handed out earlier keep the old mapping alive, so it is only dropped, not closed
+    del stale
+
+
+def _cached(path: str) -> Optional[PageTextCache]:
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cache = _open.get(path)
+        # Another process may have rewritten the file with more pages since it was mapped
+        if cache is not None and cache.inode == inode:
+            _open.move_to_end(path)
+            return cache
+    try:
+        cache = PageTextCache(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    _remember(path, cache)
+    return cache
+
+
+def open_cache(pdf_path: str, kind: str, pages: Optional[Iterable[int]],
+               extract: Callable[[Optional[List[int]]], Tuple[int, Dict[int, str]]]) -> PageTextCache:
+    """
+    Returns the cache of extractor `kind` for a PDF, holding at least the given pages (all pages when None).
+    Pages not cached yet are extracted with extract(missing pages, or None for all), which returns
+    (page count, {page: text}); pages it leaves out count as unreadable and are not cached.
+    The cache file is keyed by the PDF's sha256, so a changed file never reads stale text.
+    """
+    path = cache_path(document_sha256(pdf_path), kind)
+    cache = _cached(path)
+    if cache is None:
+        missing = None if pages is None else list(pages)
+    else:
+        wanted = range(cache.page_count) if pages is None else pages
+        missing = [p for p in wanted if not cache.has_page(p)]
+        if not missing:
+            return cache
+
+    page_count, texts = extract(missing)
+    if cache is not None:
+        texts = {**cache.pages(), **texts}
+    write_cache(path, page_count, texts)
+    cache = PageTextCache(path)
+    _remember(path, cache)
+    return cache
+
+
+def clear_open_caches():
+    """
+    Drops the open mappings of this process (tests, or after deleting cache files).
+    """
+    with _lock:
+        while _open:
+            _open.popitem()[1].close()
+        _hashes.clear()
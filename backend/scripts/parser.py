@@ -1,15 +1,36 @@
 import os
 import fitz
-import openai
 import re
 import json
-import pdfplumber
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+
+try:
+    from .llm_client import get_client
+    from .extraction_schema import (EXTRACTION_RESPONSE_FORMAT, STATEMENT_TYPES, ExtractionParseError,
+                                    StatementExtraction, record_parse)
+    from .pdf_store import file_sha256
+    from .job_context import JobContext
+    from .page_text_cache import PageTextCache, document_sha256, open_cache
+    from .text_backends import TEXT_BACKEND, extract_texts
+    from .ocr import needs_ocr, ocr_cache_kind, ocr_pages
+except ImportError:
+    from llm_client import get_client
+    from extraction_schema import (EXTRACTION_RESPONSE_FORMAT, STATEMENT_TYPES, ExtractionParseError,
+                                   StatementExtraction, record_parse)
+    from pdf_store import file_sha256
+    from job_context import JobContext
+    from page_text_cache import PageTextCache, document_sha256, open_cache
+    from text_backends import TEXT_BACKEND, extract_texts
+    from ocr import needs_ocr, ocr_cache_kind, ocr_pages
 
 PDF_FOLDER = os.path.join(os.path.dirname(__file__), "../pdfs")
-MODEL = "gpt-4o"
-openai.api_key = os.getenv("OPENAI_API_KEY")
-BATCH_SIZE = 2
+PARSED_JSON_DIR = os.path.join(os.path.dirname(__file__), "../parsed_json")
+MAX_BLOCK_PAGES = 4
+HEADING_LINES = 12
+LAYOUT_PROBE_RADIUS = 6
+LLM_PAGE_CLASSIFIER = os.getenv("LLM_PAGE_CLASSIFIER", "0") == "1"
+PAGE_SNIPPET_CHARS = 800
+PAGES_PER_CLASSIFICATION = 15
 
 def get_pdf_year(pdf_path: str) -> int:
     """
@@ -33,6 +54,16 @@ SIGNAL_PHRASES = [
     "depreciation and amortization", "accounts payable", "cash and cash equivalents"
 ]
 
+# Headings that start a statement block; a page whose top lines name none of these continues the previous block.
+STATEMENT_HEADINGS = {
+    "Income Statement": [
+        "income statement", "statement of operations", "statement of income", "statement of profit",
+        "profit and loss", "statement of comprehensive income", "statement of earnings"
+    ],
+    "Balance Sheet": ["balance sheet", "statement of financial position", "financial condition"],
+    "Cash Flow Statement": ["statement of cash flows", "cash flow statement", "statement of cash flow", "cash flows"],
+}
+
 TABLE_SECTION_HEADERS = [
     "assets", "liabilities", "equity", "revenue", "sales", "expenses", "cost", "cash",
     "operating", "investing", "financing", "depreciation", "interest", "income", "tax",
@@ -84,27 +115,55 @@ def strong_structural_signal_adjusted(text: str) -> bool:
         (year_hits >= 2 or header_hits >= 3 or consistent_columns >= 2)
     )
 
+def page_text_cache(pdf_path: str) -> PageTextCache:
+    """
+    Returns the PyMuPDF (fitz) plain text of every page of a PDF through the shared page-text cache.
+    The whole document is extracted once per file content; every pass and process after that reads the cache.
+    Scanned pages (images, no text layer) get their text from OCR when Tesseract is available.
+    """
+    def extract(pages):
+        with fitz.open(pdf_path) as doc:
+            wanted = range(doc.page_count) if pages is None else pages
+            texts = {p: doc[p].get_text("text") for p in wanted}  # type: ignore
+            scanned = [p for p, text in texts.items() if needs_ocr(doc[p], text)]
+            texts.update(ocr_pages(pdf_path, doc, scanned))
+            return doc.page_count, texts
+    return open_cache(pdf_path, ocr_cache_kind("text"), None, extract)
+
 def get_page_text(pdf_path: str, page_num: int) -> str:
     """
     Extracts plain text content from a specific page of a PDF document.
-    Uses PyMuPDF (fitz) for text extraction.
+    Uses PyMuPDF (fitz) for text extraction, through the page-text cache.
     """
-    with fitz.open(pdf_path) as doc:
-        return doc[page_num].get_text("text")  # type: ignore
+    return page_text_cache(pdf_path).page(page_num)
 
-def extract_text_with_pdfplumber(pdf_path: str, pages: List[int]) -> str:
+def extract_page_texts(pdf_path: str, pages: List[int], backend: Optional[str] = None) -> Dict[int, str]:
     """
-    Extracts and merges text content from specified pages of a PDF using pdfplumber.
-    Useful for more precise text extraction from tables.
+    Extracts the LLM input text of each of the specified pages of a PDF, skipping unreadable pages.
+    The backend (TEXT_BACKEND by default) keeps table rows and columns together; extracted pages are kept
+    in the page-text cache of that backend. Scanned pages, which have no text for the backend to read,
+    take their OCR text from page_text_cache.
     """
-    merged_text = ""
-    with pdfplumber.open(pdf_path) as pdf:
-        for p in pages:
-            try:
-                merged_text += pdf.pages[p].extract_text() + "\n"
-            except:
-                continue
-    return merged_text.strip()
+    backend = backend or TEXT_BACKEND
+    if not pages:
+        return {}
+
+    def extract(missing):
+        plain = page_text_cache(pdf_path)
+        texts = extract_texts(pdf_path, missing, backend)
+        for p in missing:
+            if not texts.get(p, "").strip() and plain.has_page(p) and plain.page(p).strip():
+                texts[p] = plain.page(p)
+        return len(plain), texts
+
+    cache = open_cache(pdf_path, ocr_cache_kind(backend), pages, extract)
+    return {p: cache.page(p) for p in pages if cache.has_page(p)}
+
+def extract_text(pdf_path: str, pages: List[int]) -> str:
+    """
+    Extracts and merges the LLM input text of the specified pages of a PDF.
+    """
+    return "".join(extract_page_texts(pdf_path, pages).values()).strip()
 
 def safe_parse_json(content: str) -> Dict:
     """
@@ -123,16 +182,23 @@ def safe_parse_json(content: str) -> Dict:
         print(f"   Failed to parse JSON: {e}")
         return {}
 
-def ask_openai_batch(text: str, page_ids: List[int], current_year: int) -> Tuple[Dict, Dict]:
+def ask_openai_batch(text: str, page_ids: List[int], current_year: int, statement_hint: Optional[str] = None,
+                     pdf_sha256: Optional[str] = None) -> Tuple[Optional[StatementExtraction], Dict]:
     """
     Sends a batch of text from PDF pages to OpenAI for financial data extraction.
-    Focuses on extracting data for the current year and categorizing historical data.
+    statement_hint names the statement the segmentation pass found on the pages, if any. pdf_sha256 identifies
+    the document in the call's log label, so replays match a batch of pages of that filing only.
+    The response is constrained to EXTRACTION_SCHEMA; if it still fails to parse, one repair call is made
+    before the batch is dropped. Returns the extraction (or None) and the tokens used by both calls.
     """
     print(f"   GPT validating pages {', '.join(str(p+1) for p in page_ids)}")
+    document = f" of {pdf_sha256}" if pdf_sha256 else ""
+    hint = f"The pages were segmented as the **{statement_hint}**; only use another statement_type if the text clearly is not.\n" if statement_hint else ""
 
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
     try:
-        response = openai.ChatCompletion.create(
-            model=MODEL,
+        response = get_client().complete(
+            task="extraction",
             messages=[
                 {"role": "system", "content": "You are a financial data extractor and cleaner."},
                 {
@@ -146,14 +212,9 @@ Please extract **only the exact line items** (no renaming) related to:
 - Operating Expenses (R&D, SG&A, Amortization, etc.)
 - Any lines found in those three statements
 
-Return only data for **{current_year}** under `"Data"` and anything from **before {current_year}** under `"Historical Data"`.
-
-Strict JSON format:
-{{
-  "Statement Type": "...",
-  "Data": {{ "Line Item": "Value", ... }},
-  "Historical Data": {{ "Line Item": "Value", ... }}
-}}
+Set `statement_type` to the statement the text belongs to ("None" if it is none of them).
+{hint}Put values for **{current_year}** in `data`, and values for years **before {current_year}** in `historical_data`, one entry per line item and year.
+Copy values exactly as printed.
 
 Text:
 {text}
@@ -161,41 +222,117 @@ Text:
                 }
             ],
             temperature=0,
-            max_tokens=1500
+            max_tokens=3000,
+            label=f"Pages {page_ids}{document}",
+            response_format=EXTRACTION_RESPONSE_FORMAT
         )
+        add_usage(usage, response.usage)
+
+        try:
+            result = StatementExtraction.from_json(response.content)
+            record_parse("ok")
+            return result, usage
+        except ExtractionParseError as e:
+            print(f"   Invalid extraction on pages {page_ids}: {e}, repairing")
+            error = e
 
-        content = response.choices[0].message["content"].strip() # type: ignore
-        usage = response['usage'] # type: ignore
+        repair = get_client().prompt(
+            f"""This response was meant to match the JSON schema below but failed with: {error}
 
-        with open("openai_responses_debug.txt", "a") as f:
-            f.write(f"\n\n--- Pages {page_ids} ---\n{content}\n")
+Schema:
+{json.dumps(EXTRACTION_RESPONSE_FORMAT["json_schema"]["schema"])}
 
-        return safe_parse_json(content), usage
+Response:
+{response.content}
+
+Return the corrected JSON only. Do not add data that is not in the response.""",
+            task="json_repair",
+            temperature=0,
+            max_tokens=3000,
+            label=f"Repair {page_ids}{document}",
+            response_format=EXTRACTION_RESPONSE_FORMAT,
+            accept=is_valid_extraction
+        )
+        add_usage(usage, repair.usage)
+        try:
+            result = StatementExtraction.from_json(repair.content)
+            record_parse("repaired")
+            return result, usage
+        except ExtractionParseError as e:
+            print(f"   Dropping pages {page_ids}, repair failed: {e}")
+            record_parse("dropped")
+            return None, usage
 
     except Exception as e:
         print(f"   GPT failed on pages {page_ids}: {e}")
-        return {}, {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        return None, usage
 
-def parsed_pdf(pdf_path: str) -> Dict:
+def add_usage(total: Dict, usage: Dict):
     """
-    Parses a PDF document to extract structured financial data.
-    Applies a multi-pass filtering process to identify relevant pages and extracts data using OpenAI.
+    Adds one call's token usage to a running total.
     """
-    print(f"\n Parsing: {pdf_path}")
-    year = get_pdf_year(pdf_path)
+    for key in total:
+        total[key] += usage.get(key, 0)
+
+def is_valid_extraction(content: str) -> bool:
+    """
+    Returns whether a response parses as a StatementExtraction.
+    """
+    try:
+        StatementExtraction.from_json(content)
+        return True
+    except ExtractionParseError:
+        return False
+
+def classify_pages(pdf_path: str, pages: List[int]) -> Dict[int, str]:
+    """
+    Asks the small model which statement, if any, each candidate page holds, from the top of its text.
+    Pages are sent in groups of PAGES_PER_CLASSIFICATION; unreadable answers escalate to the large model.
+    Returns {page: statement type or "None"}.
+    """
+    labels = set(STATEMENT_TYPES) | {"None"}
+    classified = {}
+    texts = page_text_cache(pdf_path)
+    for i in range(0, len(pages), PAGES_PER_CLASSIFICATION):
+        group = pages[i:i + PAGES_PER_CLASSIFICATION]
+        snippets = "\n\n".join(
+            f"=== Page {p+1} ===\n{texts.page(p)[:PAGE_SNIPPET_CHARS]}" for p in group
+        )
+        prompt = f"""For each annual report page below, say which primary financial statement it contains.
+Answer with one of: "Income Statement", "Balance Sheet", "Cash Flow Statement", "None".
+Notes, summaries and segment tables are "None".
+
+Return JSON only, keyed by page number: {{"<page>": "<answer>", ...}}
+
+{snippets}
+"""
+        def accept(content, group=group):
+            answers = safe_parse_json(content)
+            return all(answers.get(str(p+1)) in labels for p in group)
+
+        response = get_client().prompt(prompt, task="page_classification", temperature=0, max_tokens=300, accept=accept)
+        answers = safe_parse_json(response.content)
+        classified.update({p: answers.get(str(p+1), "None") for p in group})
+    return classified
 
+def filter_pages(pdf_path: str, page_indices: List[int] = None) -> List[int]:
+    """
+    Runs the three-pass page filter over a PDF and returns the pages that look like financial statements.
+    When page_indices is given, only those pages are considered.
+    """
     matched_pages = []
-    with fitz.open(pdf_path) as doc:
-        for i, page in enumerate(doc):  # type: ignore
-            text = page.get_text("text")
-            if any(k in text.lower() for k in KEYWORDS) and has_numbers(text):
-                matched_pages.append(i)
+    texts = page_text_cache(pdf_path)
+    candidates = range(len(texts)) if page_indices is None else page_indices
+    for i in candidates:
+        text = texts.page(i)
+        if any(k in text.lower() for k in KEYWORDS) and has_numbers(text):
+            matched_pages.append(i)
 
     print(f"\n🔍 First-pass matched pages: {len(matched_pages)} → {[p+1 for p in matched_pages]}")
 
     second_pass = []
     for p in matched_pages:
-        text = get_page_text(pdf_path, p)
+        text = texts.page(p)
         if is_relevant_financial_table(text):
             second_pass.append(p)
 
@@ -203,30 +340,286 @@ def parsed_pdf(pdf_path: str) -> Dict:
 
     filtered_pages = []
     for p in second_pass:
-        text = get_page_text(pdf_path, p)
+        text = texts.page(p)
         if strong_structural_signal_adjusted(text):
             filtered_pages.append(p)
 
     print(f"\n Final filtered pages: {len(filtered_pages)} → {[p+1 for p in filtered_pages]}")
 
-    extracted = {"Income Statement": {}, "Balance Sheet": {}, "Cash Flow Statement": {}}
-    historical = {"Income Statement": {}, "Balance Sheet": {}, "Cash Flow Statement": {}}
-    total_tokens = 0
+    if LLM_PAGE_CLASSIFIER and filtered_pages:
+        try:
+            labels = classify_pages(pdf_path, filtered_pages)
+            filtered_pages = [p for p in filtered_pages if labels.get(p) in STATEMENT_TYPES]
+            print(f"\n🏷️ Classifier kept: {len(filtered_pages)} → {[p+1 for p in filtered_pages]}")
+        except Exception as e:
+            print(f"   Page classifier failed, keeping heuristic pages: {e}")
+    return filtered_pages
+
+def get_pdf_ticker(pdf_path: str) -> str:
+    """
+    Extracts the ticker from a PDF filename of the form TICKER_YEAR.pdf.
+    """
+    return os.path.basename(pdf_path).split("_")[0].upper()
+
+def layout_profile_path(ticker: str) -> str:
+    """
+    Returns the path of the layout profile for a ticker, stored next to reference_keys_2024.json.
+    """
+    return os.path.join(PARSED_JSON_DIR, f"layout_profile_{ticker.upper()}.json")
 
-    for i in range(0, len(filtered_pages), BATCH_SIZE):
-        batch = filtered_pages[i:i + BATCH_SIZE]
-        batch_text = extract_text_with_pdfplumber(pdf_path, batch)
-        if not batch_text.strip():
+def load_layout_profile(ticker: str) -> Dict:
+    """
+    Loads the saved layout profile for a ticker.
+    Returns an empty profile if none has been recorded yet.
+    """
+    path = layout_profile_path(ticker)
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"   Could not read layout profile {path}: {e}")
+    return {"ticker": ticker.upper(), "filings": {}}
+
+def save_layout_profile(ticker: str, profile: Dict):
+    """
+    Writes the layout profile for a ticker to disk.
+    """
+    os.makedirs(PARSED_JSON_DIR, exist_ok=True)
+    with open(layout_profile_path(ticker), "w") as f:
+        json.dump(profile, f, indent=2)
+
+def get_page_heading(text: str) -> str:
+    """
+    Returns the first line of a page that names a financial statement, normalized for comparison.
+    Digits are dropped so that headings match across fiscal years.
+    """
+    for line in text.split("\n"):
+        line_lower = line.lower().strip()
+        if line_lower and any(k in line_lower for k in KEYWORDS):
+            return re.sub(r"\s+", " ", re.sub(r"\d+", "", line_lower)).strip()[:120]
+    return ""
+
+def probe_pages(profile: Dict, year: int, pdf_path: str) -> List[int]:
+    """
+    Picks the pages to look at first, based on where the statements sat in the closest newer filing.
+    Pages whose heading matches the recorded one are preferred over the whole neighbourhood.
+    """
+    filings = profile.get("filings", {})
+    newer = sorted(int(y) for y in filings if int(y) > year)
+    if not newer:
+        return []
+    layout = filings[str(newer[0])]
+
+    pages = set()
+    texts = page_text_cache(pdf_path)
+    page_count = len(texts)
+    for entry in layout.get("statements", {}).values():
+        center = round(entry["relative_offset"] * page_count)
+        window = range(max(0, center - LAYOUT_PROBE_RADIUS), min(page_count, center + LAYOUT_PROBE_RADIUS + 1))
+        headings = set(entry.get("headings", []))
+        hits = [p for p in window if get_page_heading(texts.page(p)) in headings]
+        if hits:
+            pages.update(p for hit in hits for p in (hit, hit + 1) if p < page_count)
+        else:
+            pages.update(window)
+    return sorted(pages)
+
+def record_layout(profile: Dict, year: int, pdf_path: str, located: Dict[str, List[int]]):
+    """
+    Stores where each statement was found in this filing, as relative offsets plus page headings.
+    """
+    statements = {}
+    texts = page_text_cache(pdf_path)
+    page_count = len(texts)
+    for st_type, pages in located.items():
+        if not pages:
             continue
+        headings = {get_page_heading(texts.page(p)) for p in pages}
+        statements[st_type] = {
+            "pages": sorted(pages),
+            "relative_offset": round(min(pages) / max(page_count, 1), 4),
+            "headings": sorted(h for h in headings if h)
+        }
+    if statements:
+        profile.setdefault("filings", {})[str(year)] = {"page_count": page_count, "statements": statements}
+
+def page_statement_type(text: str) -> Optional[str]:
+    """
+    Returns the statement named in the first HEADING_LINES lines of a page, or None when the page
+    has no statement heading (e.g. the second page of a statement).
+    """
+    lines = [line.lower().strip().replace("statements", "statement") for line in text.split("\n") if line.strip()]
+    lines = lines[:HEADING_LINES]
+    for line in lines:
+        for st_type, headings in STATEMENT_HEADINGS.items():
+            if any(h in line for h in headings):
+                return st_type
+    return None
+
+def segment_statements(page_types: List[Tuple[int, Optional[str]]]) -> List[Tuple[Optional[str], List[int]]]:
+    """
+    Groups (page, statement heading) pairs into contiguous statement blocks.
+    A page continues the previous block when it directly follows it and has the same heading or none;
+    blocks are capped at MAX_BLOCK_PAGES, and the block a capped statement continues in keeps its statement.
+    Returns [(statement or None, pages)].
+    """
+    blocks: List[Tuple[Optional[str], List[int]]] = []
+    for page, st_type in sorted(page_types):
+        if blocks:
+            last_type, last_pages = blocks[-1]
+            if page == last_pages[-1] + 1 and st_type in (None, last_type):
+                if len(last_pages) < MAX_BLOCK_PAGES:
+                    last_pages.append(page)
+                else:
+                    blocks.append((last_type, [page]))
+                continue
+        blocks.append((st_type, [page]))
+    return blocks
+
+def merge_block(target: Dict, values: Dict, sources: Dict, page_range: List[int]) -> List[str]:
+    """
+    Adds a block's line items to target without overwriting ones an earlier block already supplied,
+    and records the page range each new item came from in sources. Returns the items that were added.
+    """
+    added = []
+    for metric, value in values.items():
+        if metric not in target:
+            target[metric] = value
+            sources[metric] = page_range
+            added.append(metric)
+        elif target[metric] != value:
+            print(f"   Keeping {metric} = {target[metric]} from pages {sources.get(metric)}, ignoring {value}")
+    return added
+
+def value_bbox(page, metric: str, value: str) -> Optional[List[float]]:
+    """
+    Returns the bounding box of a printed value on a PyMuPDF page, picking the occurrence closest
+    to the row naming the metric when the value appears more than once.
+    """
+    rects = page.search_for(value)
+    if not rects:
+        return None
+    anchors = page.search_for(metric)
+    if anchors:
+        row = (anchors[0].y0 + anchors[0].y1) / 2
+        rect = min(rects, key=lambda r: abs((r.y0 + r.y1) / 2 - row))
+    else:
+        rect = rects[0]
+    return [round(c, 1) for c in (rect.x0, rect.y0, rect.x1, rect.y1)]
+
+def locate_value(doc, page_texts: Dict[int, str], block: List[int], metric: str, value: str) -> Dict:
+    """
+    Finds where an extracted value is printed within a block: the 1-based page, the character span of
+    the value in that page's extracted text (preferring the line that names the metric) and its bbox.
+    Falls back to the first page of the block with no span when the value is not found verbatim.
+    """
+    found = None
+    for p in block:
+        offset = 0
+        for line in page_texts.get(p, "").split("\n"):
+            column = line.find(value) if value else -1
+            if column >= 0:
+                span = [offset + column, offset + column + len(value)]
+                if metric.lower() in line.lower():
+                    return {"page": p + 1, "span": span, "bbox": value_bbox(doc[p], metric, value)}
+                found = found or (p, span)
+            offset += len(line) + 1
+    if found is None:
+        return {"page": block[0] + 1, "span": None, "bbox": None}
+    page, span = found
+    return {"page": page + 1, "span": span, "bbox": value_bbox(doc[page], metric, value)}
+
+def extract_pages(pdf_path: str, pages: List[int], year: int, extracted: Dict, historical: Dict, located: Dict,
+                  sources: Dict, provenance: List[Dict], job: Optional[JobContext] = None) -> int:
+    """
+    Segments the given pages into statement blocks and extracts each block with one OpenAI call.
+    Merges the results into extracted/historical, records the pages each statement came from in located,
+    the page range of every line item in sources, and one provenance entry (page, span, bbox) per new value.
+    Emits a "block_extracted" event per block on the job. Returns the tokens used.
+    """
+    job = job or JobContext(get_pdf_ticker(pdf_path))
+    total_tokens = 0
+    with fitz.open(pdf_path) as doc:
+        texts = page_text_cache(pdf_path)
+        page_types = [(p, page_statement_type(texts.page(p))) for p in pages]
+        blocks = segment_statements(page_types)
+        print(f"\n🧩 Statement blocks: {[(st_type, [p+1 for p in block]) for st_type, block in blocks]}")
+
+        for hint, block in blocks:
+            page_texts = extract_page_texts(pdf_path, block)
+            block_text = "".join(page_texts.values()).strip()
+            if not block_text:
+                continue
+
+            result, usage = ask_openai_batch(block_text, block, year, hint, document_sha256(pdf_path))
+            total_tokens += usage["total_tokens"]
 
-        result, usage = ask_openai_batch(batch_text, batch, year)
-        total_tokens += usage["total_tokens"]
+            page_range = [block[0] + 1, block[-1] + 1]
+            job.emit("block_extracted", year=year, pages=page_range,
+                     statement_type=result.statement_type if result else None, items=len(result.data) if result else 0)
+            if not result or result.statement_type not in extracted:
+                continue
+            st_type = result.statement_type
+            for metric in merge_block(extracted[st_type], result.data, sources.setdefault(st_type, {}), page_range):
+                location = locate_value(doc, page_texts, block, metric, result.data[metric])
+                provenance.append({"statement_type": st_type, "metric": metric, "year": year, "pages": page_range, **location})
+            for metric, year_values in result.historical.items():
+                known = historical[st_type].setdefault(metric, {})
+                for y, value in year_values.items():
+                    if y in known:
+                        continue
+                    known[y] = value
+                    location = locate_value(doc, page_texts, block, metric, value)
+                    provenance.append({"statement_type": "Historical", "metric": metric, "year": int(y), "pages": page_range, **location})
+            located.setdefault(st_type, []).extend(block)
+    return total_tokens
+
+def parsed_pdf(pdf_path: str, job: Optional[JobContext] = None) -> Dict:
+    """
+    Parses a PDF document to extract structured financial data.
+    Probes the pages suggested by the ticker's layout profile first and only scans the whole document
+    when some statement is still missing afterwards. Progress ("pages_filtered", "block_extracted")
+    and token usage are reported to the job.
+    """
+    print(f"\n Parsing: {pdf_path}")
+    year = get_pdf_year(pdf_path)
+    ticker = get_pdf_ticker(pdf_path)
+    job = job or JobContext(ticker)
+    profile = load_layout_profile(ticker)
+
+    extracted = {"Income Statement": {}, "Balance Sheet": {}, "Cash Flow Statement": {}}
+    historical = {"Income Statement": {}, "Balance Sheet": {}, "Cash Flow Statement": {}}
+    located = {}
+    sources = {}
+    provenance = []
+    total_tokens = 0
 
-        if result and "Statement Type" in result:
-            st_type = result["Statement Type"]
-            if st_type in extracted:
-                extracted[st_type].update(result.get("Data", {}))
-                historical[st_type].update(result.get("Historical Data", {}))
+    probed = probe_pages(profile, year, pdf_path)
+    if probed:
+        print(f"\n📐 Probing layout from newer filing: {[p+1 for p in probed]}")
+        pages = filter_pages(pdf_path, probed)
+        job.emit("pages_filtered", year=year, stage="probe", pages=[p+1 for p in pages])
+        total_tokens += extract_pages(pdf_path, pages, year, extracted, historical, located, sources, provenance, job)
+
+    if all(extracted[st] for st in STATEMENT_TYPES):
+        print("\n📐 All statements located from layout profile, skipping full scan")
+    else:
+        probed_set = set(probed)
+        cache = page_text_cache(pdf_path)
+        remaining = [p for p in range(len(cache)) if p not in probed_set]
+        blank = [p for p in remaining if not cache.page(p).strip()]
+        if blank:
+            # Scanned pages that OCR could not read (or OCR is off): say so instead of matching nothing silently
+            print(f"\n🖼️ {len(blank)} of {len(cache)} pages have no text")
+            job.emit("pages_without_text", year=year, pages=[p+1 for p in blank])
+        pages = filter_pages(pdf_path, remaining)
+        job.emit("pages_filtered", year=year, stage="scan", pages=[p+1 for p in pages])
+        total_tokens += extract_pages(pdf_path, pages, year, extracted, historical, located, sources, provenance, job)
+
+    job.add_parser_tokens(total_tokens)
+    record_layout(profile, year, pdf_path, located)
+    save_layout_profile(ticker, profile)
 
     output = {
         "Income Statement": extracted["Income Statement"],
@@ -237,6 +630,7 @@ def parsed_pdf(pdf_path: str) -> Dict:
             **historical["Balance Sheet"],
             **historical["Cash Flow Statement"]
         },
+        "Provenance": {"pdf_sha256": file_sha256(pdf_path), "values": provenance},
         "Total Tokens Used": total_tokens
     }
 
@@ -1,12 +1,16 @@
 import os
 import fitz  # PyMuPDF
-import openai
 import re
 import json
 import pdfplumber
 from typing import List, Dict, Tuple
 from dotenv import load_dotenv
 
+try:
+    from .llm_client import get_client
+except ImportError:
+    from llm_client import get_client
+
 load_dotenv()
 
 PDF_FOLDER = os.path.join(os.path.dirname(__file__), "../pdfs")
@@ -14,8 +18,6 @@ OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), "../parsed_json")
 REFERENCE_KEYS_FILE = os.path.join(OUTPUT_FOLDER, "reference_keys_2024.json")
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-MODEL = "gpt-4o"
-openai.api_key = os.getenv("OPENAI_API_KEY")
 BATCH_SIZE = 2
 
 KEYWORDS = [
@@ -140,8 +142,8 @@ def ask_openai_batch(text: str, page_ids: List[int], current_year: int) -> Tuple
     print(f"  🧠 GPT validating pages {', '.join(str(p+1) for p in page_ids)}")
 
     try:
-        response = openai.ChatCompletion.create(
-            model=MODEL,
+        response = get_client().complete(
+            task="extraction",
             messages=[
                 {"role": "system", "content": "You are a financial data extractor and cleaner."},
                 {
@@ -178,14 +180,12 @@ Text:
                 }
             ],
             temperature=0,
-            max_tokens=1500
+            max_tokens=1500,
+            label=f"Pages {page_ids}"
         )
 
-        content = response.choices[0].message["content"].strip()  # type: ignore
-        usage = response['usage']  # type: ignore
-
-        with open("openai_responses_debug.txt", "a") as f:
-            f.write(f"\n\n--- Pages {page_ids} ---\n{content}\n")
+        content = response.content
+        usage = response.usage
 
         return safe_parse_json(content), usage
 
@@ -208,8 +208,8 @@ def ask_openai_for_known_keys(text: str, page_ids: List[int], year: int, keymap:
     prompt_block = "\n\n".join(prompt_sections)
 
     try:
-        response = openai.ChatCompletion.create(
-            model=MODEL,
+        response = get_client().complete(
+            task="extraction",
             messages=[
                 {"role": "system", "content": "You are a financial data extractor."},
                 {
@@ -234,14 +234,12 @@ Text:
                 }
             ],
             temperature=0,
-            max_tokens=1200
+            max_tokens=1200,
+            label=f"Pages {page_ids} (known keys for {year})"
         )
 
-        content = response.choices[0].message["content"].strip()  # type: ignore
-        usage = response['usage']  # type: ignore
-
-        with open("openai_responses_debug.txt", "a") as f:
-            f.write(f"\n\n--- Pages {page_ids} (known keys for {year}) ---\n{content}\n")
+        content = response.content
+        usage = response.usage
 
         return safe_parse_json(content), usage
 
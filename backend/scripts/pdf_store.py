@@ -0,0 +1,340 @@
+# pdf_store.py
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from typing import Dict, Optional
+
+try:
+    from . import structure
+except ImportError:
+    import structure
+
+PDF_DIR = os.path.join(os.path.dirname(__file__), "../pdfs")
+
+# Filings older than this many fiscal years are "cold" and may be zstd-compressed by compress_cold
+COLD_AFTER_YEARS = int(os.getenv("PDF_COLD_AFTER_YEARS", "5"))
+ZSTD_LEVEL = 19
+
+
+def ensure_pdf_tables(cursor):
+    """
+    Ensures that the PdfBlob and PdfFile tables exist.
+    PdfBlob has one row per distinct document (by sha256); PdfFile maps (ticker, year) to a blob and remembers
+    the URL and ETag it was downloaded from. A blob's reference count is the number of PdfFile rows pointing at it.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS PdfBlob (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER,
+            compressed INTEGER DEFAULT 0,
+            stored_at REAL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS PdfFile (
+            ticker TEXT,
+            year INTEGER,
+            sha256 TEXT,
+            source_url TEXT,
+            etag TEXT,
+            stored_at REAL,
+            PRIMARY KEY (ticker, year)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pdffile_url ON PdfFile (source_url)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pdffile_sha ON PdfFile (sha256)")
+
+
+def file_sha256(path: str) -> str:
+    """
+    Returns the sha256 of a file, read in 1 MB chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_path(sha256: str, pdf_dir: str = PDF_DIR, compressed: bool = False) -> str:
+    """
+    Returns where a blob lives: pdfs/blobs/<first two hex digits>/<sha256>.pdf (.pdf.zst when compressed).
+    """
+    return os.path.join(pdf_dir, "blobs", sha256[:2], f"{sha256}.pdf" + (".zst" if compressed else ""))
+
+
+def file_name(ticker: str, year) -> str:
+    return f"{ticker.upper()}_{year}.pdf"
+
+
+def link_name(blob: str, path: str):
+    """
+    Points path at a blob with a hard link (a copy where hard links are not supported), replacing
+    whatever was there in one step.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.link(blob, tmp_path)
+    except OSError:
+        shutil.copyfile(blob, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def connect():
+    """
+    Opens the shared database (structure.DB_PATH). The PdfBlob/PdfFile index lives there whichever pdf_dir
+    the blobs are stored in.
+    """
+    conn = sqlite3.connect(structure.DB_PATH)
+    ensure_pdf_tables(conn.cursor())
+    return conn
+
+
+def store_pdf(ticker: str, year, src_path: str, source_url: Optional[str] = None, etag: Optional[str] = None,
+              pdf_dir: str = PDF_DIR) -> str:
+    """
+    Moves a downloaded PDF into the store and makes it available as pdfs/<TICKER>_<YEAR>.pdf.
+    A document already in the store (same sha256, under any name) is not stored twice: the new file is
+    dropped and the name becomes another hard link to the existing blob. Returns the sha256.
+    """
+    sha256 = file_sha256(src_path)
+    blob = blob_path(sha256, pdf_dir)
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT compressed FROM PdfBlob WHERE sha256 = ?", (sha256,))
+    row = cursor.fetchone()
+    if os.path.exists(blob):
+        os.remove(src_path)
+    else:
+        os.replace(src_path, blob)
+    if row is None or row[0]:
+        if row and row[0]:
+            os.remove(blob_path(sha256, pdf_dir, compressed=True))
+        cursor.execute("""
+            INSERT INTO PdfBlob (sha256, size, compressed, stored_at) VALUES (?, ?, 0, ?)
+            ON CONFLICT(sha256) DO UPDATE SET compressed = 0
+        """, (sha256, os.path.getsize(blob), time.time()))
+    else:
+        print(f"[PDF STORE] {file_name(ticker, year)} is a copy of a stored document, linking {sha256[:12]}")
+
+    link_name(blob, os.path.join(pdf_dir, file_name(ticker, year)))
+    cursor.execute("""
+        INSERT INTO PdfFile (ticker, year, sha256, source_url, etag, stored_at) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(ticker, year) DO UPDATE SET
+            sha256 = excluded.sha256,
+            source_url = COALESCE(excluded.source_url, PdfFile.source_url),
+            etag = COALESCE(excluded.etag, PdfFile.etag),
+            stored_at = excluded.stored_at
+    """, (ticker.upper(), year, sha256, source_url, etag, time.time()))
+    conn.commit()
+    conn.close()
+    return sha256
+
+
+def lookup_pdf(ticker: str, year) -> Optional[Dict]:
+    """
+    Returns the index entry of a ticker's filing ({"sha256", "source_url", "etag", "compressed"}) or None.
+    A primary-key lookup, so it is the cheap way to ask whether a filing is stored.
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT f.sha256, f.source_url, f.etag, COALESCE(b.compressed, 0)
+        FROM PdfFile f LEFT JOIN PdfBlob b ON b.sha256 = f.sha256
+        WHERE f.ticker = ? AND f.year = ?
+    """, (ticker.upper(), year))
+    row = cursor.fetchone()
+    conn.close()
+    if row is None:
+        return None
+    return {"sha256": row[0], "source_url": row[1], "etag": row[2], "compressed": bool(row[3])}
+
+
+def revalidation_headers(url: str, pdf_dir: str = PDF_DIR) -> Optional[Dict[str, str]]:
+    """
+    Returns the request headers that revalidate a URL downloaded before: {"If-None-Match": etag} when its
+    server sent an ETag, {} when it did not (the stored copy is then used without asking).
+    Returns None when the URL is unknown or its document is no longer stored, i.e. it must be downloaded.
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT sha256, etag FROM PdfFile WHERE source_url = ? ORDER BY stored_at DESC LIMIT 1
+    """, (url,))
+    row = cursor.fetchone()
+    conn.close()
+    if row is None:
+        return None
+    stored = os.path.exists(blob_path(row[0], pdf_dir)) or os.path.exists(blob_path(row[0], pdf_dir, compressed=True))
+    if not stored:
+        return None
+    return {"If-None-Match": row[1]} if row[1] else {}
+
+
+def link_known_url(ticker: str, year, url: str, pdf_dir: str = PDF_DIR) -> bool:
+    """
+    Makes pdfs/<TICKER>_<YEAR>.pdf available without the network when the URL was downloaded before
+    and its document is still stored. Returns False when the URL is unknown.
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT sha256, etag FROM PdfFile WHERE source_url = ? ORDER BY stored_at DESC LIMIT 1
+    """, (url,))
+    row = cursor.fetchone()
+    conn.close()
+    if row is None or not restore_blob(row[0], pdf_dir):
+        return False
+    link_name(blob_path(row[0], pdf_dir), os.path.join(pdf_dir, file_name(ticker, year)))
+    conn = connect()
+    conn.execute("""
+        INSERT INTO PdfFile (ticker, year, sha256, source_url, etag, stored_at) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(ticker, year) DO UPDATE SET sha256 = excluded.sha256, source_url = excluded.source_url,
+            etag = excluded.etag, stored_at = excluded.stored_at
+    """, (ticker.upper(), year, row[0], url, row[1], time.time()))
+    conn.commit()
+    conn.close()
+    return True
+
+
+def restore_blob(sha256: str, pdf_dir: str = PDF_DIR) -> Optional[str]:
+    """
+    Returns the path of an uncompressed blob, decompressing it first if it was compressed,
+    or None when the document is not in the store.
+    """
+    blob = blob_path(sha256, pdf_dir)
+    if os.path.exists(blob):
+        return blob
+    compressed = blob_path(sha256, pdf_dir, compressed=True)
+    if not os.path.exists(compressed):
+        return None
+    import zstandard
+
+    tmp_path = f"{blob}.{os.getpid()}.tmp"
+    with open(compressed, "rb") as src, open(tmp_path, "wb") as dst:
+        zstandard.ZstdDecompressor().copy_stream(src, dst)
+    os.replace(tmp_path, blob)
+    os.remove(compressed)
+    conn = connect()
+    conn.execute("UPDATE PdfBlob SET compressed = 0 WHERE sha256 = ?", (sha256,))
+    conn.commit()
+    conn.close()
+    return blob
+
+
+def materialize_pdf(ticker: str, year, pdf_dir: str = PDF_DIR) -> Optional[str]:
+    """
+    Returns the path of pdfs/<TICKER>_<YEAR>.pdf, relinking it from the store (and decompressing a cold
+    blob) when only the blob is left. Returns None when the filing is neither on disk nor in the store.
+    """
+    path = os.path.join(pdf_dir, file_name(ticker, year))
+    if os.path.exists(path):
+        return path
+    entry = lookup_pdf(ticker, year)
+    blob = restore_blob(entry["sha256"], pdf_dir) if entry else None
+    if blob is None:
+        return None
+    link_name(blob, path)
+    return path
+
+
+def compress_cold(before_year: int, pdf_dir: str = PDF_DIR) -> int:
+    """
+    Compresses the blobs of filings for fiscal years before before_year with zstd (needs the zstandard
+    package) and drops their <TICKER>_<YEAR>.pdf names; materialize_pdf brings them back on demand.
+    A blob is only compressed when every filing that references it is cold. Returns the blobs compressed.
+    """
+    try:
+        import zstandard
+    except ImportError:
+        print("[PDF STORE] zstandard is not installed, leaving cold filings uncompressed")
+        return 0
+
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT f.sha256, GROUP_CONCAT(f.ticker || '_' || f.year)
+        FROM PdfFile f JOIN PdfBlob b ON b.sha256 = f.sha256
+        WHERE b.compressed = 0
+        GROUP BY f.sha256
+        HAVING MAX(f.year) < ?
+    """, (before_year,))
+    compressed = 0
+    for sha256, names in cursor.fetchall():
+        blob = blob_path(sha256, pdf_dir)
+        if not os.path.exists(blob):
+            continue
+        target = blob_path(sha256, pdf_dir, compressed=True)
+        with open(blob, "rb") as src, open(f"{target}.tmp", "wb") as dst:
+            zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(src, dst)
+        os.replace(f"{target}.tmp", target)
+        for name in names.split(","):
+            path = os.path.join(pdf_dir, f"{name}.pdf")
+            if os.path.exists(path) and os.path.samefile(path, blob):
+                os.remove(path)
+        os.remove(blob)
+        cursor.execute("UPDATE PdfBlob SET compressed = 1 WHERE sha256 = ?", (sha256,))
+        compressed += 1
+    conn.commit()
+    conn.close()
+    return compressed
+
+
+def gc_blobs(pdf_dir: str = PDF_DIR) -> int:
+    """
+    Deletes blobs that no (ticker, year) references any more. Returns the number deleted.
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT sha256, compressed FROM PdfBlob
+        WHERE sha256 NOT IN (SELECT sha256 FROM PdfFile WHERE sha256 IS NOT NULL)
+    """)
+    orphans = cursor.fetchall()
+    for sha256, compressed in orphans:
+        path = blob_path(sha256, pdf_dir, bool(compressed))
+        if os.path.exists(path):
+            os.remove(path)
+    cursor.executemany("DELETE FROM PdfBlob WHERE sha256 = ?", [(sha256,) for sha256, _ in orphans])
+    conn.commit()
+    conn.close()
+    return len(orphans)
+
+
+def import_directory(src_dir: str, pdf_dir: str = PDF_DIR) -> int:
+    """
+    Adds existing <TICKER>_<YEAR>.pdf files to the store, e.g. a pdfs folder from before the store existed.
+    Files in pdf_dir itself are replaced by links to their blob. Returns the number of files imported.
+    """
+    imported = 0
+    for fname in sorted(os.listdir(src_dir)):
+        stem, ext = os.path.splitext(fname)
+        if ext.lower() != ".pdf" or "_" not in stem:
+            continue
+        ticker, year = stem.rsplit("_", 1)
+        src_path = os.path.join(src_dir, fname)
+        tmp_path = f"{src_path}.{os.getpid()}.import"
+        # store_pdf consumes its input, so hand it a link (or copy) and keep the original
+        link_name(src_path, tmp_path)
+        store_pdf(ticker, int(year) if year.isdigit() else year, tmp_path, pdf_dir=pdf_dir)
+        imported += 1
+    return imported
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("import", "compress", "gc"):
+        print("Usage: python3 pdf_store.py import <dir> | compress [before_year] | gc")
+        sys.exit(1)
+    if sys.argv[1] == "import":
+        print(f"Imported {import_directory(sys.argv[2] if len(sys.argv) > 2 else PDF_DIR)} files")
+    elif sys.argv[1] == "compress":
+        before = int(sys.argv[2]) if len(sys.argv) > 2 else time.gmtime().tm_year - COLD_AFTER_YEARS
+        print(f"Compressed {compress_cold(before)} blobs")
+    else:
+        print(f"Deleted {gc_blobs()} unreferenced blobs")
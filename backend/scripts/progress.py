@@ -0,0 +1,73 @@
+# progress.py
+
+import json
+import queue
+import threading
+from typing import Callable, Dict, Iterator, Optional
+
+EventCallback = Callable[[Dict], None]
+
+HEARTBEAT_SECONDS = 15.0
+
+
+def emit(on_event: Optional[EventCallback], event: str, **fields):
+    """
+    Sends a progress event ({"event": name, **fields}) to on_event, if there is one.
+    A failing listener is logged and never breaks the pipeline.
+    """
+    if on_event is None:
+        return
+    try:
+        on_event({"event": event, **fields})
+    except Exception as e:
+        print(f"[PROGRESS] Listener failed on {event}: {e}")
+
+
+def run_with_events(run: Callable[[EventCallback], Dict], heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[Dict]:
+    """
+    Runs run(on_event) in a worker thread and yields its events as they arrive, followed by a final
+    "done" event with the return value (or "error" when it returned {"error": ...} or raised).
+    A "heartbeat" event is yielded when nothing happened for `heartbeat` seconds, so proxies keep the stream open.
+    The worker keeps going if the consumer stops reading, so a disconnected client does not lose the stored data.
+    """
+    events: queue.Queue = queue.Queue()
+    finished = object()
+
+    def worker():
+        try:
+            result = run(events.put)
+            if isinstance(result, dict) and result.get("error"):
+                events.put({"event": "error", "error": result["error"]})
+            else:
+                events.put({"event": "done", "result": result})
+        except Exception as e:
+            events.put({"event": "error", "error": str(e)})
+        finally:
+            events.put(finished)
+
+    threading.Thread(target=worker, daemon=True).start()
+    while True:
+        try:
+            event = events.get(timeout=heartbeat)
+        except queue.Empty:
+            yield {"event": "heartbeat"}
+            continue
+        if event is finished:
+            return
+        yield event
+
+
+def format_sse(event: Dict) -> str:
+    """
+    Formats an event as a Server-Sent Events message; heartbeats become SSE comments.
+    """
+    if event["event"] == "heartbeat":
+        return ": keepalive\n\n"
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def format_ndjson(event: Dict) -> str:
+    """
+    Formats an event as one line of newline-delimited JSON.
+    """
+    return json.dumps(event, default=str) + "\n"
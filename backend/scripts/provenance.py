@@ -0,0 +1,191 @@
+# provenance.py
+
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from . import structure
+    from .normalize import parse_number
+    from .metrics_store import refresh_series
+    from .derived_metrics import refresh_derived
+    from .data_version import bump_version
+    from .pdf_store import file_sha256, materialize_pdf, restore_blob
+except ImportError:
+    import structure
+    from normalize import parse_number
+    from metrics_store import refresh_series
+    from derived_metrics import refresh_derived
+    from data_version import bump_version
+    from pdf_store import file_sha256, materialize_pdf, restore_blob
+
+PDF_DIR = os.path.join(os.path.dirname(__file__), "../pdfs")
+
+
+def ensure_provenance_table(cursor):
+    """
+    Ensures that the MetricProvenance table exists.
+    One row per stored value (same key as Company, without the name) with the filing PDF's sha256,
+    the 1-based page, the character span of the value in that page's text and its bbox as "x0,y0,x1,y1".
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS MetricProvenance (
+            ticker TEXT,
+            year INTEGER,
+            statement_type TEXT,
+            metric TEXT,
+            filing_year INTEGER,
+            pdf_sha256 TEXT,
+            page INTEGER,
+            span_start INTEGER,
+            span_end INTEGER,
+            bbox TEXT,
+            PRIMARY KEY (ticker, year, statement_type, metric)
+        ) WITHOUT ROWID
+    """)
+
+
+def save_provenance(cursor, ticker: str, filing_year: int, provenance: Dict):
+    """
+    Stores the parser's provenance entries for one filing.
+    Historical entries are kept only for years before the filing, and like Company rows,
+    an entry from an older filing never replaces one from a newer filing.
+    """
+    ensure_provenance_table(cursor)
+    rows = []
+    for entry in provenance.get("values", []):
+        year = int(entry.get("year") or filing_year)
+        if entry["statement_type"] == "Historical" and year >= filing_year:
+            continue
+        span = entry.get("span") or [None, None]
+        bbox = ",".join(str(c) for c in entry["bbox"]) if entry.get("bbox") else None
+        rows.append((ticker, year, entry["statement_type"], entry["metric"], filing_year,
+                     provenance.get("pdf_sha256"), entry.get("page"), span[0], span[1], bbox))
+
+    cursor.executemany("""
+        INSERT INTO MetricProvenance
+            (ticker, year, statement_type, metric, filing_year, pdf_sha256, page, span_start, span_end, bbox)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(ticker, year, statement_type, metric) DO UPDATE SET
+            filing_year = excluded.filing_year,
+            pdf_sha256 = excluded.pdf_sha256,
+            page = excluded.page,
+            span_start = excluded.span_start,
+            span_end = excluded.span_end,
+            bbox = excluded.bbox
+        WHERE excluded.filing_year >= COALESCE(MetricProvenance.filing_year, 0)
+    """, rows)
+
+
+def read_provenance(cursor, ticker: str, year: Optional[int] = None, metrics: Optional[Iterable[str]] = None) -> List[Dict]:
+    """
+    Returns the provenance rows of a ticker, optionally for one year and some metrics.
+    """
+    query = """
+        SELECT year, statement_type, metric, filing_year, pdf_sha256, page, span_start, span_end, bbox
+        FROM MetricProvenance WHERE ticker = ?
+    """
+    params: list = [ticker]
+    if year is not None:
+        query += " AND year = ?"
+        params.append(year)
+    if metrics:
+        metrics = list(metrics)
+        query += f" AND metric IN ({','.join('?' * len(metrics))})"
+        params.extend(metrics)
+    try:
+        cursor.execute(query + " ORDER BY year DESC, statement_type, metric", params)
+    except sqlite3.OperationalError:
+        return []  # not migrated yet
+    return [
+        {
+            "year": year, "statement_type": statement_type, "metric": metric, "filing_year": filing_year,
+            "pdf_sha256": pdf_sha256, "page": page,
+            "span": [span_start, span_end] if span_start is not None else None,
+            "bbox": [float(c) for c in bbox.split(",")] if bbox else None,
+        }
+        for year, statement_type, metric, filing_year, pdf_sha256, page, span_start, span_end, bbox in cursor.fetchall()
+    ]
+
+
+def load_provenance(ticker: str, year: Optional[int] = None, metric: Optional[str] = None) -> List[Dict]:
+    """
+    Loads where each stored value of a ticker came from.
+    """
+    conn = sqlite3.connect(structure.DB_PATH)
+    cursor = conn.cursor()
+    rows = read_provenance(cursor, ticker, year, [metric] if metric else None)
+    conn.close()
+    return rows
+
+
+def reextract_value(ticker: str, year: int, metric: str, statement_type: Optional[str] = None) -> Dict:
+    """
+    Re-extracts one stored value from the single page it came from, instead of reprocessing the whole filing.
+    Without statement_type, the filing-year row is preferred over a Historical one.
+    Raises ValueError when the value has no provenance or the page no longer yields it,
+    and FileNotFoundError when the source PDF is gone.
+    """
+    try:
+        from .parser import ask_openai_batch, extract_page_texts, locate_value
+    except ImportError:
+        from parser import ask_openai_batch, extract_page_texts, locate_value
+    import fitz
+
+    conn = sqlite3.connect(structure.DB_PATH)
+    cursor = conn.cursor()
+    try:
+        entries = [e for e in read_provenance(cursor, ticker, year, [metric])
+                   if statement_type is None or e["statement_type"] == statement_type]
+        if not entries:
+            raise ValueError(f"No provenance recorded for {ticker} {year} {metric}")
+        entry = sorted(entries, key=lambda e: e["statement_type"] == "Historical")[0]
+
+        # The exact document that was parsed, if the PDF store still has it, else the filing under its name
+        pdf_path = entry["pdf_sha256"] and restore_blob(entry["pdf_sha256"], PDF_DIR)
+        if not pdf_path:
+            pdf_path = materialize_pdf(ticker, entry["filing_year"], PDF_DIR)
+            if not pdf_path:
+                raise FileNotFoundError(os.path.join(PDF_DIR, f"{ticker.upper()}_{entry['filing_year']}.pdf"))
+            if entry["pdf_sha256"] and file_sha256(pdf_path) != entry["pdf_sha256"]:
+                print(f"[PROVENANCE] {pdf_path} changed since it was parsed, page {entry['page']} may have moved")
+
+        page = entry["page"] - 1
+        page_texts = extract_page_texts(pdf_path, [page])
+        historical = entry["statement_type"] == "Historical"
+        result, _ = ask_openai_batch(page_texts.get(page, ""), [page], entry["filing_year"],
+                                     None if historical else entry["statement_type"], file_sha256(pdf_path))
+        if result is None:
+            raise ValueError(f"Re-extraction of page {entry['page']} failed")
+        raw = result.historical.get(metric, {}).get(str(year)) if historical else result.data.get(metric)
+        value = parse_number(raw)
+        if value is None:
+            raise ValueError(f"{metric} not found on page {entry['page']} of {os.path.basename(pdf_path)}")
+
+        with fitz.open(pdf_path) as doc:
+            location = locate_value(doc, page_texts, [page], metric, raw)
+        cursor.execute("""
+            SELECT value FROM Company WHERE ticker = ? AND year = ? AND statement_type = ? AND metric = ?
+        """, (ticker, year, entry["statement_type"], metric))
+        old = cursor.fetchone()
+        cursor.execute("""
+            UPDATE Company SET value = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE ticker = ? AND year = ? AND statement_type = ? AND metric = ?
+        """, (value, ticker, year, entry["statement_type"], metric))
+        span = location["span"] or [None, None]
+        cursor.execute("""
+            UPDATE MetricProvenance SET span_start = ?, span_end = ?, bbox = ?
+            WHERE ticker = ? AND year = ? AND statement_type = ? AND metric = ?
+        """, (span[0], span[1], ",".join(str(c) for c in location["bbox"]) if location["bbox"] else None,
+              ticker, year, entry["statement_type"], metric))
+        refresh_series(cursor, ticker, [metric])
+        refresh_derived(cursor, ticker)
+        bump_version(cursor, ticker)
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "ticker": ticker, "year": year, "metric": metric, "statement_type": entry["statement_type"],
+        "page": entry["page"], "old_value": old[0] if old else None, "value": value,
+    }
@@ -1,19 +1,21 @@
 import os, sys, re, time
-import requests, openai
+import requests
 from urllib.parse import urljoin
-from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
 
-#  Load API key
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-# pdf folder
+try:
+    from .llm_client import get_client
+    from .fiscal_years import fiscal_year_window
+    from .job_context import JobContext
+    from .pdf_store import link_known_url, materialize_pdf, revalidation_headers, store_pdf
+except ImportError:
+    from llm_client import get_client
+    from fiscal_years import fiscal_year_window
+    from job_context import JobContext
+    from pdf_store import link_known_url, materialize_pdf, revalidation_headers, store_pdf
+
+# pdf folder, created when a scrape starts
 PDF_FOLDER = os.path.join(os.path.dirname(__file__), "../pdfs")
-os.makedirs(PDF_FOLDER, exist_ok=True)
-
-#  Token tracking
-TOTAL_TOKENS = 0
 
 def estimate_tokens(msg):
     """
@@ -32,23 +34,28 @@ def extract_first_url(text):
 
 #  AI prompt
 
-def ai_prompt(prompt):
+def ai_prompt(prompt, task=None, accept=None, job=None):
     """
     Sends a prompt to the OpenAI API and returns the AI's response.
-    Tracks total token usage for API calls.
+    The task picks the model tier; answers rejected by accept are retried on the large model.
+    Tracks token usage on the job.
     """
-    global TOTAL_TOKENS
-    TOTAL_TOKENS += estimate_tokens(prompt)
+    if job is not None:
+        job.add_prompt_tokens(estimate_tokens(prompt))
     print(f"\n[ AI PROMPT]\n{prompt[:300]}...")
-    res = openai.ChatCompletion.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return res.choices[0].message.content.strip() # type: ignore
+    res = get_client().prompt(prompt, task=task, accept=accept)
+    return res.content
+
+def is_known_link(answer, links):
+    """
+    Checks that an AI link choice is one of the links actually on the page.
+    """
+    url = extract_first_url(answer).rstrip("/")
+    return bool(url) and url in {l.rstrip("/") for l in links}
 
 #  AI chooses best next link
 
-def ai_pick_best_link(current_url, links, page_text, year="2024"):
+def ai_pick_best_link(current_url, links, page_text, year="2024", job=None):
     """
     Uses AI to select the best link from a list to navigate towards an annual report PDF.
     Considers the current URL, available links, and page text.
@@ -63,7 +70,7 @@ Here are the visible links:\n{chr(10).join(links)}
 Visible page text:\n{page_text[:3000]}
 
 Which link is the best next step? Only return one full URL."""
-    return ai_prompt(prompt)
+    return ai_prompt(prompt, task="link_choice", accept=lambda answer: is_known_link(answer, links), job=job)
 
 # Load and parse page with Playwright
 
@@ -140,34 +147,55 @@ def scan_page(url):
 
 #  Download pdf
 
-def download_pdf(url, year=None, ticker="UNKNOWN"):
+def download_pdf(url, year=None, ticker="UNKNOWN", job=None):
     """
-    Downloads a PDF from the given URL and saves it to the PDF_FOLDER.
-    Handles existing files, invalid PDF content, and download errors.
+    Downloads a PDF from the given URL into the job's scratch directory and adds it to the PDF store
+    once it is known to be a PDF, so other jobs never see a partial file.
+    Filings already in the store are linked without the network. A URL downloaded before is revalidated
+    with its ETag (If-None-Match) and linked on 304, or linked without a request when it had no ETag.
+    Handles invalid PDF content and download errors.
+    Emits a "pdf_downloaded" event for every PDF that is available afterwards.
     """
+    if job is None:
+        with JobContext(ticker, pdf_dir=PDF_FOLDER) as job:
+            return download_pdf(url, year, ticker, job)
     ticker = ticker.upper()
     year = str(year) if year else "unknown"
     fname = f"{ticker}_{year}.pdf"
-    fpath = os.path.join(PDF_FOLDER, fname)
+    stored_year = int(year) if year.isdigit() else year
 
-    if os.path.exists(fpath):
+    def already_stored():
         print(f"[SKIP] Already downloaded: {fname}")
+        job.record_download(fname)
+        job.emit("pdf_downloaded", year=int(year) if year.isdigit() else None, file=fname, cached=True)
         return True
 
+    if materialize_pdf(ticker, stored_year, job.pdf_dir):
+        return already_stored()
+    known = revalidation_headers(url, job.pdf_dir)
+    if known == {} and link_known_url(ticker, stored_year, url, job.pdf_dir):
+        return already_stored()
+
     print(f"[ DOWNLOAD] {url}")
     try:
-        r = requests.get(url, timeout=30)
+        r = requests.get(url, headers=known or {}, timeout=30)
+        if r.status_code == 304 and link_known_url(ticker, stored_year, url, job.pdf_dir):
+            return already_stored()
         r.raise_for_status()
-        with open(fpath, "wb") as f:
+        tmp_path = os.path.join(job.scratch_dir, fname)
+        with open(tmp_path, "wb") as f:
             f.write(r.content)
 
-        with open(fpath, "rb") as f:
+        with open(tmp_path, "rb") as f:
             if not f.read(4) == b'%PDF':
                 print(f"[ INVALID FILE] Not a real PDF. Removing: {fname}")
-                os.remove(fpath)
+                os.remove(tmp_path)
                 return False
 
+        store_pdf(ticker, stored_year, tmp_path, url, r.headers.get("ETag"), job.pdf_dir)
         print(f"[ SAVED] {fname}")
+        job.record_download(fname)
+        job.emit("pdf_downloaded", year=int(year) if year.isdigit() else None, file=fname, cached=False)
         return True
     except Exception as e:
         print(f"[ DOWNLOAD ERROR] {e}")
@@ -175,7 +203,7 @@ def download_pdf(url, year=None, ticker="UNKNOWN"):
 
 #  Recursively use AI to navigate
 
-def recursive_ai_nav(start_url, year="2024", ticker="UNKNOWN", depth=0, visited=None):
+def recursive_ai_nav(start_url, year="2024", ticker="UNKNOWN", depth=0, visited=None, job=None):
     """
     Recursively navigates web pages using AI to find and download annual report PDFs.
     Explores links until a PDF is found or max depth is reached.
@@ -197,78 +225,77 @@ def recursive_ai_nav(start_url, year="2024", ticker="UNKNOWN", depth=0, visited=
     )]
     if pdf_links:
         print(f"[ PDF LINK FOUND] {pdf_links[0]}")
-        if download_pdf(pdf_links[0], year, ticker):
+        if download_pdf(pdf_links[0], year, ticker, job):
             return pdf_links[0]
 
-    next_url = ai_pick_best_link(start_url, links, text, year)
+    next_url = ai_pick_best_link(start_url, links, text, year, job)
     if not next_url or next_url in visited:
         print("[ No better link found.]")
         return None
     if next_url.endswith(".pdf") or "download" in next_url or "asset" in next_url:
-        download_pdf(next_url, year, ticker)
+        download_pdf(next_url, year, ticker, job)
         return next_url
-    return recursive_ai_nav(next_url, year, ticker, depth + 1, visited)
+    return recursive_ai_nav(next_url, year, ticker, depth + 1, visited, job)
 
 # Try previous years using pattern match maybe
 
-def try_other_years(base_url_2024, ticker, from_year=2023, downloaded_pdfs=None):
+def try_other_years(base_url_2024, ticker, from_year=2023, years=None, job=None):
     """
-    Attempts to find and download annual reports for previous years based on the 2024 URL pattern.
-    Updates the list of downloaded PDFs.
+    Attempts to find and download annual reports for previous years based on the newest report's URL pattern.
+    Tries the given years, or the fiscal year window up to from_year. Downloads are recorded on the job.
     """
-    if downloaded_pdfs is None:
-        downloaded_pdfs = []
-    for y in range(from_year, 2014, -1):
+    if years is None:
+        years = [y for y in fiscal_year_window() if y <= from_year]
+    for y in sorted(years, reverse=True):
         guess_url = re.sub(r"20\d{2}", str(y), base_url_2024)
         print(f"[TRY] {guess_url}")
-        download_pdf(guess_url, y, ticker)
+        download_pdf(guess_url, y, ticker, job)
 
 #  Get IR URL using AI
-def find_ir_url_via_ai(ticker):
+def find_ir_url_via_ai(ticker, job=None):
     """
     Uses AI to find the official investor relations (IR) URL for a given company ticker.
     """
     prompt = f"""Find the official investor relations or annual reports page for European company '{ticker}'. Return the best direct URL."""
-    return ai_prompt(prompt)
-
-#  define globally
-downloaded_pdfs = []
+    return ai_prompt(prompt, task="ir_url", accept=lambda answer: bool(extract_first_url(answer)), job=job)
 
-def scrapeticker(ticker):
+def scrapeticker(ticker, years=None, job=None):
     """
     Main function to orchestrate the scraping of 10-year annual reports for a given ticker.
-    Returns company info and a status of PDF downloads.
+    Only the given fiscal years are scraped when years is provided (incremental refresh); otherwise the
+    configured fiscal year window is. Returns company info and a status of PDF downloads.
+    Download state, token usage and progress ("ir_url", "pdf_downloaded") live on the job,
+    a new one unless the caller shares its own.
     """
-    print(f"\n🔍 Scraping 10-year annual reports for: {ticker}")
-    downloaded_pdfs.clear()
-    ir_url = extract_first_url(find_ir_url_via_ai(ticker))
+    if job is None:
+        with JobContext(ticker, pdf_dir=PDF_FOLDER) as job:
+            return scrapeticker(ticker, years, job)
+    os.makedirs(job.pdf_dir, exist_ok=True)
+    years = sorted(years) if years else fiscal_year_window()
+    newest = years[-1]
+    print(f"\n🔍 Scraping annual reports {years[0]}-{newest} for: {ticker}")
+    ir_url = extract_first_url(find_ir_url_via_ai(ticker, job))
     print(f"[IR URL] {ir_url}")
+    job.emit("ir_url", url=ir_url, scraper="quick")
 
     company_name = ticker  
 
-    pdf_2024 = recursive_ai_nav(ir_url, "2024", ticker)
-    if pdf_2024:
-        try_other_years(pdf_2024, ticker, from_year=2023, downloaded_pdfs=downloaded_pdfs)
+    pdf_newest = recursive_ai_nav(ir_url, str(newest), ticker, job=job)
+    if pdf_newest:
+        try_other_years(pdf_newest, ticker, years=years[:-1], job=job)
     else:
-        print("[ Could not locate 2024 report]")
-
-    all_years = list(range(2015, 2025))
-    downloaded_years = sorted([
-        int(m.group(1))
-        for f in os.listdir(PDF_FOLDER)
-        if f.startswith(ticker) and f.endswith(".pdf")
-        for m in [re.search(r"(\d{4})", f)]
-        if m
-    ])
-    missed_years = [y for y in all_years if y not in downloaded_years]
-
-    print(f"\n Done. Tokens used: {TOTAL_TOKENS}")
+        print(f"[ Could not locate {newest} report]")
+
+    downloaded_years = [y for y in job.downloaded_years() if y in years]
+    missed_years = [y for y in years if y not in downloaded_years]
+
+    print(f"\n Done. Tokens used: {job.prompt_tokens}")
     return {
         "name": company_name,
         "ticker": ticker,
         "ir_url": ir_url,
         "downloaded_years": downloaded_years,
-        "missed_years": [y for y in range(2015, 2025) if y not in downloaded_years]
+        "missed_years": missed_years
     }
 
 if __name__ == "__main__":
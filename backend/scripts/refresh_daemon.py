@@ -0,0 +1,243 @@
+# refresh_daemon.py
+
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+try:
+    from . import structure
+except ImportError:
+    import structure
+
+REFRESH_INTERVAL_HOURS = float(os.getenv("REFRESH_INTERVAL_HOURS", "24"))
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "2"))
+REFRESH_JITTER = float(os.getenv("REFRESH_JITTER", "0.1"))
+REFRESH_POLL_SECONDS = int(os.getenv("REFRESH_POLL_SECONDS", "300"))
+REQUEST_TIMEOUT = 30
+
+# Links that look like annual report downloads; the hash ignores everything else on the IR page.
+REPORT_LINK_PATTERN = re.compile(r"\.pdf|annual|report|download|asset", re.IGNORECASE)
+
+
+def ensure_refresh_table(cursor):
+    """
+    Ensures that the RefreshState table exists.
+    One row per ticker with the validators and report-list hash of the last successful check.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS RefreshState (
+            ticker TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            report_hash TEXT,
+            last_checked REAL,
+            next_check REAL,
+            last_changed REAL,
+            status TEXT
+        )
+    """)
+
+
+def report_links_hash(html: str, base_url: str) -> str:
+    """
+    Hashes the sorted set of report links on an IR page, so layout, timestamp and banner changes
+    do not count as a new report.
+    """
+    links = set()
+    for href in re.findall(r"""href\s*=\s*["']([^"'#]+)["']""", html, re.IGNORECASE):
+        if REPORT_LINK_PATTERN.search(href):
+            links.add(urljoin(base_url, href.strip()))
+    return hashlib.sha256("\n".join(sorted(links)).encode("utf-8")).hexdigest()
+
+
+def next_check_time(now: float, interval_hours: float = REFRESH_INTERVAL_HOURS, jitter: float = REFRESH_JITTER) -> float:
+    """
+    Schedules the next check one interval from now, spread by ±jitter so tickers do not revalidate in lockstep.
+    """
+    return now + interval_hours * 3600 * (1 + random.uniform(-jitter, jitter))
+
+
+def due_tickers(cursor, now: float) -> List[Dict]:
+    """
+    Returns tracked tickers with an IR URL whose next check is due, oldest check first.
+    """
+    cursor.execute("""
+        SELECT m.ticker, m.ir_url, s.etag, s.last_modified, s.report_hash
+        FROM CompanyMetadata m
+        LEFT JOIN RefreshState s ON s.ticker = m.ticker
+        WHERE m.ir_url IS NOT NULL AND m.ir_url != ''
+          AND (s.next_check IS NULL OR s.next_check <= ?)
+        ORDER BY COALESCE(s.last_checked, 0)
+    """, (now,))
+    return [
+        {"ticker": ticker, "ir_url": ir_url, "etag": etag, "last_modified": last_modified, "report_hash": report_hash}
+        for ticker, ir_url, etag, last_modified, report_hash in cursor.fetchall()
+    ]
+
+
+def revalidate(session, entry: Dict) -> Dict:
+    """
+    Revalidates a ticker's IR page with a conditional GET.
+    Returns {"changed": bool, "etag", "last_modified", "report_hash"}; a 304 or an identical report list is unchanged.
+    """
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = session.get(entry["ir_url"], headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        return {
+            "changed": False,
+            "etag": entry.get("etag"),
+            "last_modified": entry.get("last_modified"),
+            "report_hash": entry.get("report_hash"),
+        }
+    response.raise_for_status()
+
+    report_hash = report_links_hash(response.text, entry["ir_url"])
+    return {
+        "changed": report_hash != entry.get("report_hash"),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "report_hash": report_hash,
+    }
+
+
+def run_incremental_scrape(ticker: str):
+    """
+    Runs the pipeline in incremental refresh mode for one ticker.
+    main uses package-relative imports, so the daemon must run as `python -m scripts.refresh_daemon`.
+    """
+    from .main import run_pipeline
+    result = run_pipeline(ticker, refresh=True)
+    if isinstance(result, dict) and result.get("error"):
+        raise RuntimeError(result["error"])
+
+
+def save_state(ticker: str, now: float, status: str, validators: Optional[Dict] = None, changed: bool = False):
+    """
+    Records the outcome of a check. Validators are only stored after a successful refresh, so a failed
+    scrape is retried on the next check instead of being hidden behind a 304.
+    """
+    conn = sqlite3.connect(structure.DB_PATH)
+    cursor = conn.cursor()
+    ensure_refresh_table(cursor)
+    cursor.execute("""
+        INSERT INTO RefreshState (ticker, last_checked, next_check, status)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(ticker) DO UPDATE SET
+            last_checked = excluded.last_checked,
+            next_check = excluded.next_check,
+            status = excluded.status
+    """, (ticker, now, next_check_time(now), status))
+    if validators is not None:
+        cursor.execute("""
+            UPDATE RefreshState
+            SET etag = ?, last_modified = ?, report_hash = ?, last_changed = CASE WHEN ? THEN ? ELSE last_changed END
+            WHERE ticker = ?
+        """, (validators["etag"], validators["last_modified"], validators["report_hash"], changed, now, ticker))
+    conn.commit()
+    conn.close()
+
+
+def check_ticker(session, entry: Dict, scrape=run_incremental_scrape) -> str:
+    """
+    Revalidates one ticker and runs an incremental scrape only when its report list changed.
+    The first check of a ticker only records its report list and validators: its data was just scraped
+    by the request that added it, so there is nothing to compare against yet.
+    Returns the recorded status: "seeded", "unchanged", "refreshed" or "error".
+    """
+    ticker = entry["ticker"]
+    now = time.time()
+    try:
+        validators = revalidate(session, entry)
+    except Exception as e:
+        print(f"[REFRESH] {ticker}: revalidation failed - {e}")
+        save_state(ticker, now, "error")
+        return "error"
+
+    if entry.get("report_hash") is None:
+        save_state(ticker, now, "seeded", validators)
+        return "seeded"
+    if not validators["changed"]:
+        save_state(ticker, now, "unchanged", validators)
+        return "unchanged"
+
+    print(f"[REFRESH] {ticker}: report list changed, running incremental scrape")
+    try:
+        scrape(ticker)
+    except Exception as e:
+        print(f"[REFRESH] {ticker}: incremental scrape failed - {e}")
+        save_state(ticker, now, "error")
+        return "error"
+
+    save_state(ticker, now, "refreshed", validators, changed=True)
+    return "refreshed"
+
+
+def run_once(session=None, scrape=run_incremental_scrape, concurrency: int = REFRESH_CONCURRENCY,
+             jitter_seconds: float = 0.0) -> Dict[str, str]:
+    """
+    Checks every due ticker, with at most `concurrency` revalidations and scrapes in flight at once.
+    Each check starts after a random delay of up to jitter_seconds. Returns {ticker: status}.
+    """
+    conn = sqlite3.connect(structure.DB_PATH)
+    cursor = conn.cursor()
+    structure.ensure_tables(cursor)
+    ensure_refresh_table(cursor)
+    conn.commit()
+    due = due_tickers(cursor, time.time())
+    conn.close()
+
+    if not due:
+        return {}
+    session = session or make_session()
+
+    def check(entry):
+        if jitter_seconds:
+            time.sleep(random.uniform(0, jitter_seconds))
+        return check_ticker(session, entry, scrape)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        statuses = list(pool.map(check, due))
+    return {entry["ticker"]: status for entry, status in zip(due, statuses)}
+
+
+def make_session():
+    """
+    Creates the HTTP session shared by all checks, so connections to IR sites are reused.
+    """
+    import requests  # only needed when the daemon actually runs
+
+    return requests.Session()
+
+
+def run_forever():
+    """
+    Polls for due tickers every REFRESH_POLL_SECONDS (±jitter) until interrupted.
+    """
+    session = make_session()
+    print(f"[REFRESH] Daemon started: every {REFRESH_INTERVAL_HOURS}h per ticker, concurrency {REFRESH_CONCURRENCY}")
+    while True:
+        results = run_once(session, jitter_seconds=REFRESH_POLL_SECONDS * REFRESH_JITTER)
+        if results:
+            print(f"[REFRESH] Checked {len(results)} tickers: {results}")
+        time.sleep(REFRESH_POLL_SECONDS * (1 + random.uniform(-REFRESH_JITTER, REFRESH_JITTER)))
+
+
+if __name__ == "__main__":
+    if not __package__:
+        sys.exit("Run the refresh daemon from the backend directory with: python -m scripts.refresh_daemon")
+    if "--once" in sys.argv:
+        print(run_once())
+    else:
+        run_forever()
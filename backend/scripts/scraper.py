@@ -1,12 +1,12 @@
 import os
 from playwright.sync_api import sync_playwright
-import openai
 import requests
-from dotenv import load_dotenv
-load_dotenv()
 
+try:
+    from .llm_client import get_client
+except ImportError:
+    from llm_client import get_client
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
 PDF_FOLDER = os.path.join(os.path.dirname(__file__), "../pdfs")
 
 def find_ir_url(ticker: str) -> str:
@@ -15,15 +15,11 @@ def find_ir_url(ticker: str) -> str:
     Sends a prompt to OpenAI and extracts the URL from the response.
     """
     prompt = f"Return the official investor relations website URL of the European company with ticker '{ticker}' in plain text only (no formatting)."
-    response = openai.ChatCompletion.create(
-    model="gpt-4o",
-    messages=[{"role": "user", "content": prompt}],
-)
+    response = get_client().prompt(prompt, task="ir_url", accept=lambda answer: answer.startswith("http"))
     print(f"[OPENAI] Finding IR URL for {ticker}")
-    content = response.choices[0].message.content
-    if content is None:
+    if not response.content:
         raise ValueError("No content returned from OpenAI API.")
-    return content.strip()
+    return response.content
 
 def download_pdf(pdf_url: str, file_path: str):
     """
@@ -1,12 +1,16 @@
-import os, re, requests, openai
+import os, re, requests
 import sys
 from urllib.parse import urljoin
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
 
-#  Load API key
+try:
+    from .llm_client import get_client
+except ImportError:
+    from llm_client import get_client
+
+#  Load environment
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # PDF folder
 PDF_FOLDER = os.path.join(os.path.dirname(__file__), "../pdfs")
@@ -40,11 +44,8 @@ def ai_prompt(prompt, log_label=""):
     TOTAL_TOKENS += estimate_tokens(prompt)
     print(f"\n[ AI PROMPT — {log_label}]\n{prompt[:500]}...\n")
 
-    res = openai.ChatCompletion.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    response = res.choices[0].message.content.strip()
+    res = get_client().prompt(prompt, label=log_label or None)
+    response = res.content
 
     print(f"\n [AI RESPONSE — {log_label}]\n{response}\n{'─'*80}")
     return response
@@ -1,12 +1,16 @@
 import os, sys, re, time
-import requests, openai
+import requests
 from urllib.parse import urljoin, urlparse
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
 
-#  Load API key
+try:
+    from .llm_client import get_client
+except ImportError:
+    from llm_client import get_client
+
+#  Load environment
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # PDF folder
 PDF_FOLDER = os.path.join(os.path.dirname(__file__), "../pdfs")
@@ -40,11 +44,8 @@ def ai_prompt(prompt):
     global TOTAL_TOKENS
     TOTAL_TOKENS += estimate_tokens(prompt)
     print(f"\n[ AI PROMPT]\n{prompt[:300]}...")
-    res = openai.ChatCompletion.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return res.choices[0].message.content.strip() # type: ignore
+    res = get_client().prompt(prompt)
+    return res.content
 
 #  AI chooses best next link
 
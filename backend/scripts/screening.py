@@ -0,0 +1,114 @@
+# screening.py
+
+import sqlite3
+from typing import Dict, List, Optional
+
+try:
+    from . import structure
+except ImportError:
+    import structure
+
+OPERATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "eq": "="}
+
+# Raw values resolve to the newest filing (filing-year rows before Historical rows within a filing); derived values come straight from DerivedMetric.
+# When a filing prints a line item under a derived metric's name (e.g. "Gross Margin"), the derived value wins, so each
+# (ticker, year) appears once and every ticker is ranked on the same definition.
+# Both branches filter on (metric, year) so they are served by the screening indexes.
+METRIC_VALUES_SQL = """
+    SELECT ticker, year, value FROM (
+        SELECT ticker, year, value,
+               ROW_NUMBER() OVER (
+                   PARTITION BY ticker, year ORDER BY filing_year DESC, statement_type = 'Historical'
+               ) AS rn
+        FROM Company c
+        WHERE metric = :metric AND year BETWEEN :year_from AND :year_to AND value IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM DerivedMetric d
+              WHERE d.ticker = c.ticker AND d.metric = :metric AND d.year = c.year AND d.value IS NOT NULL
+          )
+    )
+    WHERE rn = 1
+    UNION ALL
+    SELECT ticker, year, value FROM DerivedMetric
+    WHERE metric = :metric AND year BETWEEN :year_from AND :year_to AND value IS NOT NULL
+"""
+
+
+def latest_year(cursor, metric: str) -> Optional[int]:
+    """
+    Returns the most recent year that has a value for the metric, raw or derived.
+    """
+    cursor.execute("""
+        SELECT MAX(year) FROM (
+            SELECT MAX(year) AS year FROM Company WHERE metric = ?
+            UNION ALL
+            SELECT MAX(year) FROM DerivedMetric WHERE metric = ?
+        )
+    """, (metric, metric))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def screen(metric: str, op: str, threshold: float, years: int = 1, year_to: Optional[int] = None,
+           limit: Optional[int] = None) -> List[Dict]:
+    """
+    Finds tickers whose metric satisfies `op threshold` in each of the last `years` years up to year_to.
+    E.g. screen("Revenue YoY Growth", "gt", 0.10, years=3). Filtering and ranking run in SQL.
+    """
+    if op not in OPERATORS:
+        raise ValueError(f"Unsupported operator '{op}'. Use one of: {', '.join(OPERATORS)}")
+    if years < 1:
+        raise ValueError("years must be at least 1")
+
+    conn = sqlite3.connect(structure.DB_PATH)
+    cursor = conn.cursor()
+    try:
+        if year_to is None:
+            year_to = latest_year(cursor, metric)
+        if year_to is None:
+            return []
+
+        cursor.execute(f"""
+            WITH metric_values AS ({METRIC_VALUES_SQL})
+            SELECT ticker, MIN(value), MAX(value), AVG(value)
+            FROM metric_values
+            WHERE value {OPERATORS[op]} :threshold
+            GROUP BY ticker
+            HAVING COUNT(DISTINCT year) = :years
+            ORDER BY AVG(value) DESC
+            LIMIT :limit
+        """, {
+            "metric": metric, "year_from": year_to - years + 1, "year_to": year_to,
+            "threshold": threshold, "years": years, "limit": -1 if limit is None else limit
+        })
+        rows = cursor.fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # not migrated yet
+    finally:
+        conn.close()
+
+    return [
+        {"ticker": ticker, "min": min_value, "max": max_value, "avg": avg_value}
+        for ticker, min_value, max_value, avg_value in rows
+    ]
+
+
+def rank(metric: str, year: int, limit: int = 20, descending: bool = True) -> List[Dict]:
+    """
+    Returns the top tickers by a metric in a given year, e.g. rank("Gross Margin", 2023).
+    """
+    conn = sqlite3.connect(structure.DB_PATH)
+    try:
+        rows = conn.execute(f"""
+            WITH metric_values AS ({METRIC_VALUES_SQL})
+            SELECT ticker, value
+            FROM metric_values
+            ORDER BY value {"DESC" if descending else "ASC"}
+            LIMIT :limit
+        """, {"metric": metric, "year_from": year, "year_to": year, "limit": limit}).fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # not migrated yet
+    finally:
+        conn.close()
+
+    return [{"rank": i + 1, "ticker": ticker, "value": value} for i, (ticker, value) in enumerate(rows)]
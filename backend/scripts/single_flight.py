@@ -0,0 +1,106 @@
+# single_flight.py
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process coalescing applies
+    fcntl = None
+
+LOCK_DIR = os.path.join(os.path.dirname(__file__), "../locks")
+LOCK_TIMEOUT = float(os.getenv("PIPELINE_LOCK_TIMEOUT", "1800"))
+LOCK_POLL_SECONDS = 0.5
+
+
+@contextmanager
+def ticker_lock(ticker: str, timeout: float = LOCK_TIMEOUT, poll: float = LOCK_POLL_SECONDS):
+    """
+    Holds an exclusive advisory lock (flock on locks/<TICKER>.lock) for one ticker, so pipeline runs for it
+    are serialized across uvicorn worker processes. The kernel drops the lock if the holder dies.
+    Raises TimeoutError when the lock is not acquired within timeout seconds.
+    """
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    with open(os.path.join(LOCK_DIR, f"{ticker.upper()}.lock"), "a") as f:
+        if fcntl is None:
+            yield
+            return
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for the pipeline lock of {ticker}")
+                time.sleep(poll)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class _Call:
+    """
+    One in-flight call: its future and the progress listeners of every caller waiting on it.
+    """
+    def __init__(self):
+        self.future: Future = Future()
+        self.listeners: List[Callable[[Dict], None]] = []
+
+    def broadcast(self, event: Dict):
+        for listener in list(self.listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"[SINGLE FLIGHT] Listener failed on {event.get('event')}: {e}")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key in this process: the first caller runs the work and
+    later callers wait for the same result (or exception) instead of repeating it.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, run: Callable[[Callable[[Dict], None]], Dict],
+           on_event: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Runs run(on_event) for key, or joins the run already in flight for it.
+        Progress events of the shared run go to every joined caller's on_event from the moment it joined.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            if on_event is not None:
+                call.listeners.append(on_event)
+
+        if not leader:
+            print(f"[SINGLE FLIGHT] Joining the run in flight for {key}")
+            return call.future.result()
+
+        try:
+            result = run(call.broadcast)
+            call.future.set_result(result)
+            return result
+        except BaseException as e:
+            call.future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> List[Hashable]:
+        """
+        Returns the keys currently being run.
+        """
+        with self._lock:
+            return list(self._calls)
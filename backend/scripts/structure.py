@@ -1,9 +1,18 @@
 # structure.py
 
+import base64
+import json
 import sqlite3
 import os
-from typing import Dict
+from typing import Dict, Iterable, List, Optional
 
+try:
+    from .normalize import decimal_separator, parse_number, normalize_values
+except ImportError:
+    from normalize import decimal_separator, parse_number, normalize_values
+
+# The one database path. The other modules read it from here at call time, so setting structure.DB_PATH moves
+# every table; they import structure, so structure imports them where they are used.
 DB_PATH = os.path.join(os.path.dirname(__file__), "../data.sqlite")
 
 def ensure_tables(cursor):
@@ -29,38 +38,109 @@ def ensure_tables(cursor):
             statement_type TEXT,
             metric TEXT,
             value REAL,
+            filing_year INTEGER,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             UNIQUE(name, ticker, year, statement_type, metric)
         )
     """)
 
+def migrate_company_table(cursor):
+    """
+    Brings an existing Company table up to date: the filing_year column and the indexes.
+    Runs at API startup and before writes, never on reads.
+    """
+    # filing_year records which annual report a value came from; backfill databases created before it existed.
+    # Those were written from a ticker's newest filing only, so every legacy row is attributed to it: the year of
+    # its current statements, or the year after its latest Historical value when there are none.
+    cursor.execute("PRAGMA table_info(Company)")
+    if "filing_year" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE Company ADD COLUMN filing_year INTEGER")
+        cursor.execute("""
+            UPDATE Company
+            SET filing_year = COALESCE(
+                (SELECT MAX(c.year) FROM Company c WHERE c.ticker = Company.ticker AND c.statement_type != 'Historical'),
+                (SELECT MAX(c.year) + 1 FROM Company c WHERE c.ticker = Company.ticker)
+            )
+        """)
+
+    # Indexes for cross-company screens (metric, year) and per-ticker reads. The per-ticker index matches the
+    # keyset order of query_company_data and the Node company route (rowid is implicitly last), so pages are
+    # read straight off the index. Its (ticker, year) prefix also serves every lookup of the earlier
+    # idx_company_ticker_year, which it replaces rather than duplicating on every write.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_company_metric_year ON Company (metric, year)")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_company_ticker_page ON Company (ticker, year DESC, statement_type, metric)
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_company_ticker_year")
+
+def company_table_exists(cursor) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Company'")
+    return cursor.fetchone() is not None
+
+def migrate():
+    """
+    Creates or upgrades the CompanyMetadata and Company tables and the tables derived from them
+    (MetricSeries, DerivedMetric, MetricProvenance). Called once at API startup; read paths never run DDL.
+    """
+    try:
+        from .metrics_store import ensure_series_table
+        from .derived_metrics import ensure_derived_table
+        from .provenance import ensure_provenance_table
+    except ImportError:
+        from metrics_store import ensure_series_table
+        from derived_metrics import ensure_derived_table
+        from provenance import ensure_provenance_table
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    ensure_tables(cursor)
+    migrate_company_table(cursor)
+    ensure_series_table(cursor)
+    ensure_derived_table(cursor)
+    ensure_provenance_table(cursor)
+    conn.commit()
+    conn.close()
+
 def clean_value(value):
     """
     Cleans and converts a financial value to a float.
-    Removes currency symbols and commas, handles non-numeric values.
+    Handles accounting negatives, thousands separators, currency symbols and scale words.
     """
-    try:
-        return float(str(value).replace(",", "").replace("$", "").replace("€", "").strip())
-    except ValueError:
-        return None
+    return parse_number(value)
 
-def save_to_db(company_name: str, structured_data: Dict):
+def save_to_db(company_name: str, structured_data: Dict) -> int:
     """
     Saves structured financial data to the SQLite database.
     Handles metadata and financial metrics, ensuring no duplicate entries.
+    structured_data["year"] is the fiscal year of the filing (defaults to 2024); when several filings report
+    the same historical year, the newest filing wins regardless of the order they are saved in.
+    Returns the number of value rows written.
     """
+    try:
+        from .metrics_store import refresh_series
+        from .derived_metrics import refresh_derived
+        from .provenance import save_provenance
+        from .data_version import bump_version
+    except ImportError:
+        from metrics_store import refresh_series
+        from derived_metrics import refresh_derived
+        from provenance import save_provenance
+        from data_version import bump_version
+
     ticker = structured_data.get("ticker")
     ir_url = structured_data.get("ir_url")
     data = structured_data.get("data", {})
+    filing_year = int(structured_data.get("year") or 2024)
 
     if not ticker or not data:
         print("[ERROR] Missing ticker or data.")
-        return
+        return 0
 
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     ensure_tables(cursor)
+    migrate_company_table(cursor)
 
     # 🏢 Save company metadata
     cursor.execute("""
@@ -68,88 +148,180 @@ def save_to_db(company_name: str, structured_data: Dict):
         VALUES (?, ?, ?)
     """, (ticker, company_name, ir_url))
 
-    # 🧾 Save 2024 data first (preferred, always inserted)
-    for statement_type in ["Income Statement", "Balance Sheet", "Cash Flow Statement"]:
-        items = data.get(statement_type, {})
-        for metric, value in items.items():
-            value_float = clean_value(value)
-            if value_float is None:
-                continue
-            cursor.execute("""
-                INSERT OR REPLACE INTO Company (name, ticker, year, statement_type, metric, value)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (company_name, ticker, 2024, statement_type, metric, value_float))
-
-    # 📆 Save historical data (2014–2023), but only if row does not already exist
-    historical = data.get("Historical Data", {})
-    for metric, year_values in historical.items():
+    # 🧾 Save the filing year's own statements first (always inserted)
+    current_rows = [
+        (statement_type, metric, value)
+        for statement_type in ["Income Statement", "Balance Sheet", "Cash Flow Statement"]
+        for metric, value in data.get(statement_type, {}).items()
+    ]
+    # The statements and history of a filing share one number format, so "1.234" is read the same way in both
+    decimal = decimal_separator([value for _, _, value in current_rows] + [
+        value
+        for year_values in data.get("Historical Data", {}).values() if isinstance(year_values, dict)
+        for value in year_values.values()
+    ])
+    values, rejected = normalize_values((value for _, _, value in current_rows), decimal=decimal)
+    cursor.executemany("""
+        INSERT OR REPLACE INTO Company (name, ticker, year, statement_type, metric, value, filing_year)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (company_name, ticker, filing_year, statement_type, metric, values[i], filing_year)
+        for i, (statement_type, metric, _) in enumerate(current_rows)
+        if not rejected[i]
+    ])
+    written = cursor.rowcount
+
+    # 📆 Save historical data, replacing values that came from an older filing
+    historical_rows = []
+    for metric, year_values in data.get("Historical Data", {}).items():
+        if not isinstance(year_values, dict):
+            continue
         for year_str, value in year_values.items():
             try:
                 year = int(year_str)
             except ValueError:
                 continue
-            value_float = clean_value(value)
-            if value_float is None:
-                continue
+            if year < filing_year:
+                historical_rows.append((year, metric, value))
+    values, rejected = normalize_values((value for _, _, value in historical_rows), decimal=decimal)
+
+    cursor.executemany("""
+        INSERT INTO Company (name, ticker, year, statement_type, metric, value, filing_year)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(name, ticker, year, statement_type, metric) DO UPDATE SET
+            value = excluded.value,
+            filing_year = excluded.filing_year,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE excluded.filing_year >= COALESCE(Company.filing_year, 0)
+    """, [
+        (company_name, ticker, year, "Historical", metric, values[i], filing_year)
+        for i, (year, metric, _) in enumerate(historical_rows)
+        if not rejected[i]
+    ])
+    written += cursor.rowcount
 
-            # Skip if this (ticker, year, metric) already exists
-            cursor.execute("""
-                SELECT 1 FROM Company WHERE ticker = ? AND year = ? AND metric = ?
-            """, (ticker, year, metric))
-            exists = cursor.fetchone()
+    # 📍 Save where each value was printed in the filing
+    provenance = data.get("Provenance")
+    if isinstance(provenance, dict):
+        save_provenance(cursor, ticker, filing_year, provenance)
 
-            if not exists:
-                cursor.execute("""
-                    INSERT INTO Company (name, ticker, year, statement_type, metric, value)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (company_name, ticker, year, "Historical", metric, value_float))
+    # 📈 Refresh the columnar series for the metrics this filing touched
+    refresh_series(cursor, ticker, [metric for _, metric, _ in current_rows] + [metric for _, metric, _ in historical_rows])
+    refresh_derived(cursor, ticker)
+    bump_version(cursor, ticker)
 
     conn.commit()
     conn.close()
     print(f"[DB] Data saved for {company_name} ({ticker})")
+    return written
 
 def load_from_db(ticker: str) -> dict:
     """
     Loads structured financial data for a given ticker from the database.
     Returns data organized by statement type and year.
     """
+    return query_company_data(ticker)["results"]
+
+MAX_PAGE_SIZE = 10000
+
+def encode_cursor(row) -> str:
+    """
+    Encodes the (year, statement_type, metric, id) key of the last row of a page as an opaque cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(list(row)).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor_token: str):
+    """
+    Decodes a cursor from encode_cursor. Raises ValueError when it is malformed.
+    """
+    try:
+        padded = cursor_token + "=" * (-len(cursor_token) % 4)
+        year, statement_type, metric, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return int(year), str(statement_type), str(metric), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor_token}") from e
+
+def query_company_data(ticker: str, statement_types: Optional[List[str]] = None, metrics: Optional[List[str]] = None,
+                       year_from: Optional[int] = None, year_to: Optional[int] = None,
+                       limit: Optional[int] = None, after: Optional[str] = None) -> Dict:
+    """
+    Loads a projection of a ticker's values, filtered in SQL by statement type, metric and year range.
+    Rows are read newest year first in (year, statement_type, metric) order. With limit, at most that many
+    values are returned and "next_cursor" continues after the last one (pass it back as after).
+    Returns {"results": {statement_type: {year: {metric: value}}}, "next_cursor": str or None}.
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
+    if not company_table_exists(cursor):
+        conn.close()
+        return {"results": {}, "next_cursor": None}
 
-    #  Ensure the table exists before querying
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS Company (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            ticker TEXT,
-            year INTEGER,
-            statement_type TEXT,
-            metric TEXT,
-            value REAL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(name, ticker, year, statement_type, metric)
-        )
-    """)
-
-    cursor.execute("""
-        SELECT year, statement_type, metric, value
-        FROM Company
-        WHERE ticker = ?
-        ORDER BY year DESC
-    """, (ticker,))
+    query = "SELECT year, statement_type, metric, id, value FROM Company WHERE ticker = ?"
+    params: list = [ticker]
+    if statement_types:
+        query += f" AND statement_type IN ({','.join('?' * len(statement_types))})"
+        params.extend(statement_types)
+    if metrics:
+        query += f" AND metric IN ({','.join('?' * len(metrics))})"
+        params.extend(metrics)
+    if year_from is not None:
+        query += " AND year >= ?"
+        params.append(year_from)
+    if year_to is not None:
+        query += " AND year <= ?"
+        params.append(year_to)
+    if after:
+        year, statement_type, metric, row_id = decode_cursor(after)
+        query += """ AND (year < ? OR (year = ? AND (statement_type > ? OR (statement_type = ? AND
+                     (metric > ? OR (metric = ? AND id > ?))))))"""
+        params.extend([year, year, statement_type, statement_type, metric, metric, row_id])
+    query += " ORDER BY year DESC, statement_type, metric, id"
+    if limit is not None:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        query += " LIMIT ?"
+        params.append(limit + 1)
 
+    cursor.execute(query, params)
     rows = cursor.fetchall()
     conn.close()
 
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][:4])
+
     structured = {}
 
-    for year, st_type, metric, value in rows:
+    for year, st_type, metric, _, value in rows:
         if st_type not in structured:
             structured[st_type] = {}
         if year not in structured[st_type]:
             structured[st_type][year] = {}
         structured[st_type][year][metric] = value
 
-    return structured
+    return {"results": structured, "next_cursor": next_cursor}
+
+def find_missing_years(ticker: str, years: Iterable[int]) -> Dict[str, list]:
+    """
+    Checks which fiscal years in the window still need their own annual report parsed.
+    "missing" years have no values at all; "stale" years only have Historical values carried over from
+    another filing. Both are what an incremental refresh scrapes.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    has_filing = {}
+    if company_table_exists(cursor):
+        cursor.execute("""
+            SELECT year, MAX(statement_type != 'Historical')
+            FROM Company
+            WHERE ticker = ? AND value IS NOT NULL
+            GROUP BY year
+        """, (ticker,))
+        has_filing = dict(cursor.fetchall())
+    conn.close()
 
+    years = sorted(set(years))
+    return {
+        "missing": [y for y in years if y not in has_filing],
+        "stale": [y for y in years if has_filing.get(y) == 0],
+    }
@@ -1,14 +1,14 @@
 import os
 import json
 import re
-import openai
 import sqlite3
 from pathlib import Path
-import difflib
 from dotenv import load_dotenv
+from normalize import parse_number, normalize_values
+from metric_matcher import MetricIndex
+from metric_registry import MetricRegistry
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # 💾 DB Setup
 DB_PATH = os.path.join(os.path.dirname(__file__), "../../data.sqlite")
@@ -19,12 +19,9 @@ REFERENCE_METRICS_PATH = os.path.join(os.path.dirname(__file__), "../parsed_json
 def clean_value(value):
     """
     Cleans and converts a financial value to a float.
-    Removes currency symbols and commas, handles non-numeric values.
+    Handles accounting negatives, thousands separators, currency symbols and scale words.
     """
-    try:
-        return float(str(value).replace(",", "").replace("$", "").replace("€", "").strip())
-    except ValueError:
-        return None
+    return parse_number(value)
 
 
 def ensure_tables(cursor):
@@ -83,43 +80,6 @@ def detect_filing_year(data: dict) -> int:
     return max(years) if years else 2024
 
 
-def openai_deduplicate_2024(rows_2024, filing_year: int):
-    """
-    Uses OpenAI to deduplicate and normalize financial line items for the 2024 report.
-    Returns a cleaned JSON object with standardized metrics.
-    """
-    system_prompt = f"""You are a financial data cleaning assistant. You will receive a JSON object containing Income Statement, Balance Sheet, and Cash Flow Statement line items for the year {filing_year}.
-
-Your job is to:
-1. Deduplicate similar line items (e.g., 'Net Income', 'Net Income Attributable to Common Shareholders').
-2. Rename and normalize metrics to standardized labels.
-3. Return a single cleaned version of the data as:
-{{
-  "Income Statement": {{ "Revenue": "...", "Gross Profit": "...", ... }},
-  "Balance Sheet": {{ ... }},
-  "Cash Flow Statement": {{ ... }}
-}}
-Limit to ~15 rows per section.
-
-Output valid JSON only. No explanations, no markdown.
-"""
-
-    response = openai.ChatCompletion.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": json.dumps(rows_2024)}
-        ],
-        temperature=0.3,
-        max_tokens=1500,
-    )
-
-    raw = response.choices[0].message.content.strip() # type: ignore
-    print("[\U0001f4be RAW OPENAI OUTPUT]", raw)
-    raw = raw.replace("```json", "").replace("```", "").strip()
-    return json.loads(raw)
-
-
 def check_existing_in_db(ticker: str, year: int, statement_type: str, metric: str):
     """
     Checks if a specific financial metric for a company and year already exists in the database.
@@ -153,37 +113,30 @@ def safe_save_to_db(company_name: str, ticker: str, ir_url: str, filing_year: in
         VALUES (?, ?, ?)
     """, (ticker, company_name, ir_url))
 
-    for stype in ["Income Statement", "Balance Sheet", "Cash Flow Statement"]:
-        for metric, value in structured_data.get(stype, {}).items():
-            val = clean_value(value)
-            if val is None:
-                continue
-
-            if check_existing_in_db(ticker, filing_year, stype, metric):
-                continue
-
-            cursor.execute("""
-                INSERT INTO Company (name, ticker, year, statement_type, metric, value)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (company_name, ticker, filing_year, stype, metric, val))
-
+    rows = [
+        (filing_year, stype, metric, value)
+        for stype in ["Income Statement", "Balance Sheet", "Cash Flow Statement"]
+        for metric, value in structured_data.get(stype, {}).items()
+    ]
     for metric, year_vals in structured_data.get("Historical Data", {}).items():
         for year_str, value in year_vals.items():
             try:
-                year = int(year_str)
+                rows.append((int(year_str), "Historical", metric, value))
             except ValueError:
                 continue
-            val = clean_value(value)
-            if val is None:
-                continue
-
-            if check_existing_in_db(ticker, year, "Historical", metric):
-                continue
 
-            cursor.execute("""
-                INSERT INTO Company (name, ticker, year, statement_type, metric, value)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (company_name, ticker, year, "Historical", metric, val))
+    values, rejected = normalize_values(value for _, _, _, value in rows)
+    cursor.executemany("""
+        INSERT INTO Company (name, ticker, year, statement_type, metric, value)
+        SELECT ?, ?, ?, ?, ?, ?
+        WHERE NOT EXISTS (
+            SELECT 1 FROM Company WHERE ticker = ? AND year = ? AND statement_type = ? AND metric = ?
+        )
+    """, [
+        (company_name, ticker, year, stype, metric, values[i], ticker, year, stype, metric)
+        for i, (year, stype, metric, _) in enumerate(rows)
+        if not rejected[i]
+    ])
 
     conn.commit()
     conn.close()
@@ -201,6 +154,7 @@ def process_all():
     print(f"[ File count: {len(files)}]")
 
     reference_keys = {}
+    registry = MetricRegistry(DB_PATH)
 
     # Pass 1: Handle 2024 first
     for path in files:
@@ -227,7 +181,7 @@ def process_all():
 
         print(f"[ CLEANING 2024] {path.name} → {name}")
         try:
-            deduped = openai_deduplicate_2024(canonical_data, 2024)
+            deduped = registry.canonicalize(canonical_data)
             with open(REFERENCE_METRICS_PATH, "w") as ref:
                 json.dump(deduped, ref, indent=2)
             reference_keys = deduped
@@ -239,7 +193,7 @@ def process_all():
             }
             safe_save_to_db(name, ticker, ir_url, 2024, final_clean)
         except Exception as e:
-            print(f"[ OpenAI Error] {e}")
+            print(f"[ Canonicalization Error] {e}")
             continue
 
     # Load reference keys from saved file
@@ -249,7 +203,8 @@ def process_all():
         print("[ Could not load reference_keys_2024.json after pass 1]")
         return
 
-    # Pass 2: Process all other years
+    # Pass 2: Process all other years, matching against one index built from the reference keys
+    metric_index = MetricIndex(reference_keys)
     for path in files:
         if path.name == "reference_keys_2024.json" or "2024" in path.name:
             continue
@@ -280,27 +235,12 @@ def process_all():
             if stype in ["Income Statement", "Balance Sheet", "Cash Flow Statement"]
         }
 
-        def match_metric(ref_metric: str, available_metrics: dict) -> str:
-    """
-    Finds the best matching metric from available metrics based on a reference metric.
-    Uses difflib for fuzzy matching.
-    """
-            keys = list(available_metrics.keys())
-            for k in keys:
-                if k.lower().strip() == ref_metric.lower().strip():
-                    return k
-            matches = difflib.get_close_matches(ref_metric, keys, n=1, cutoff=0.5)
-            return matches[0] if matches else ""
-
         final_clean = {stype: {} for stype in reference_keys}
         for stype in reference_keys:
             if stype not in canonical_data:
                 continue
-            for ref_metric in reference_keys[stype]:
-                matched_key = match_metric(ref_metric, canonical_data[stype])
-                if matched_key:
-                    val = canonical_data[stype][matched_key]
-                    final_clean[stype][ref_metric] = val
+            for ref_metric, matched_key in metric_index.match(stype, canonical_data[stype]).items():
+                final_clean[stype][ref_metric] = canonical_data[stype][matched_key]
 
         historical_data = {}
         for stype in final_clean:
@@ -0,0 +1,121 @@
+# text_backends.py
+
+import os
+import re
+from statistics import median
+from typing import Dict, List, Sequence
+
+# "fitz": layout-preserving PyMuPDF text, with pdfplumber for pages whose column order came out garbled.
+# "pdfplumber": pdfplumber for every page (the previous behaviour, several times slower).
+TEXT_BACKENDS = ("fitz", "pdfplumber")
+TEXT_BACKEND = os.getenv("TEXT_BACKEND", "fitz")
+
+# Words gaps wider than this many character widths are kept as runs of spaces, so columns stay apart
+COLUMN_GAP_CHARS = 2.0
+MAX_GAP_SPACES = 12
+# A page is handed to pdfplumber when at least GARBLED_MIN_LINES lines carry numbers and more than this
+# share of them carry nothing else, i.e. the figures came out in a column apart from their labels
+GARBLED_NUMERIC_LINE_SHARE = 0.6
+GARBLED_MIN_LINES = 5
+
+LETTERS = re.compile(r"[A-Za-z]{2,}")
+DIGIT = re.compile(r"\d")
+
+
+def layout_lines(words: Sequence[Sequence]) -> List[List[Sequence]]:
+    """
+    Groups PyMuPDF words (x0, y0, x1, y1, text, ...) into visual lines, left to right.
+    Words belong to the same line when their vertical centres are within half a line height, regardless
+    of the text block PyMuPDF put them in, so a table row's label and figures end up on one line.
+    """
+    lines: List[Dict] = []
+    for word in sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+        center, height = (word[1] + word[3]) / 2, word[3] - word[1]
+        if lines and abs(center - lines[-1]["center"]) <= max(height, lines[-1]["height"]) / 2:
+            lines[-1]["words"].append(word)
+        else:
+            lines.append({"center": center, "height": height, "words": [word]})
+    return [sorted(line["words"], key=lambda w: w[0]) for line in lines]
+
+
+def layout_text(words: Sequence[Sequence]) -> str:
+    """
+    Rebuilds page text from PyMuPDF words, one visual line per text line. Wide gaps between words become
+    runs of spaces (one per character width, capped), which keeps table columns apart for the LLM.
+    """
+    if not words:
+        return ""
+    char_width = median((w[2] - w[0]) / max(len(w[4]), 1) for w in words) or 1.0
+    out = []
+    for line in layout_lines(words):
+        parts = [line[0][4]]
+        for prev, word in zip(line, line[1:]):
+            gap = (word[0] - prev[2]) / char_width
+            parts.append(" " * min(MAX_GAP_SPACES, round(gap)) if gap > COLUMN_GAP_CHARS else " ")
+            parts.append(word[4])
+        out.append("".join(parts))
+    return "\n".join(out) + "\n"
+
+
+def looks_garbled(text: str) -> bool:
+    """
+    Detects column-order garbling: most lines with figures hold nothing but figures.
+    """
+    numeric = [line for line in text.split("\n") if DIGIT.search(line)]
+    if len(numeric) < GARBLED_MIN_LINES:
+        return False
+    numbers_only = sum(1 for line in numeric if not LETTERS.search(line))
+    return numbers_only / len(numeric) > GARBLED_NUMERIC_LINE_SHARE
+
+
+def fitz_page_texts(pdf_path: str, pages: List[int]) -> Dict[int, str]:
+    """
+    Layout-preserving PyMuPDF text of the given pages, skipping unreadable pages.
+    """
+    import fitz
+
+    texts = {}
+    with fitz.open(pdf_path) as doc:
+        for p in pages:
+            try:
+                texts[p] = layout_text(doc[p].get_text("words", sort=True))  # type: ignore
+            except Exception:
+                continue
+    return texts
+
+
+def pdfplumber_page_texts(pdf_path: str, pages: List[int]) -> Dict[int, str]:
+    """
+    pdfplumber text of the given pages, skipping unreadable pages.
+    """
+    import pdfplumber
+
+    texts = {}
+    with pdfplumber.open(pdf_path) as pdf:
+        for p in pages:
+            try:
+                texts[p] = pdf.pages[p].extract_text() + "\n"
+            except Exception:
+                continue
+    return texts
+
+
+def extract_texts(pdf_path: str, pages: List[int], backend: str = TEXT_BACKEND) -> Dict[int, str]:
+    """
+    Extracts the LLM input text of the given pages with a text backend (see TEXT_BACKENDS).
+    With "fitz", pages that look garbled are re-extracted with pdfplumber when it is installed.
+    """
+    if backend == "pdfplumber":
+        return pdfplumber_page_texts(pdf_path, pages)
+    if backend != "fitz":
+        raise ValueError(f"Unknown text backend: {backend} (expected one of {', '.join(TEXT_BACKENDS)})")
+
+    texts = fitz_page_texts(pdf_path, pages)
+    garbled = [p for p, text in texts.items() if looks_garbled(text)]
+    if garbled:
+        print(f"[TEXT] Column order garbled on pages {[p+1 for p in garbled]}, using pdfplumber")
+        try:
+            texts.update(pdfplumber_page_texts(pdf_path, garbled))
+        except ImportError:
+            print("[TEXT] pdfplumber is not installed, keeping the PyMuPDF text")
+    return texts
@@ -0,0 +1,79 @@
+import { Request, Response } from "express";
+import crypto from "crypto";
+import zlib from "zlib";
+import { DataVersion } from "./models/DataVersion";
+
+const COMPRESS_MIN_BYTES = Number(process.env.COMPRESS_MIN_BYTES || 1024);
+// Browsers always revalidate (cheap with a 304); a CDN may serve its copy for CDN_MAX_AGE seconds.
+const BROWSER_MAX_AGE = Number(process.env.BROWSER_MAX_AGE || 0);
+const CDN_MAX_AGE = Number(process.env.CDN_MAX_AGE || 60);
+const STALE_WHILE_REVALIDATE = Number(process.env.STALE_WHILE_REVALIDATE || 300);
+
+// Same format as scripts/http_cache.py: "TICKER-version-hash(variant)", with -gzip/-br for compressed bodies.
+const makeEtag = (ticker: string, version: number, variant: string) => {
+  const digest = crypto.createHash("sha1").update(variant).digest("hex").slice(0, 10);
+  return `"${ticker.toUpperCase()}-${version}-${digest}"`;
+};
+
+// Returns the ETag of the representation the client holds (plain, -gzip or -br), or null when none matches.
+const matchedEtag = (ifNoneMatch: string | undefined, etag: string) => {
+  if (!ifNoneMatch) return null;
+  if (ifNoneMatch.trim() === "*") return etag;
+  const base = etag.replace(/"/g, "");
+  for (const candidate of ifNoneMatch.split(",")) {
+    const tag = candidate.trim().replace(/^W\//, "").replace(/"/g, "");
+    if (tag === base || tag === `${base}-gzip` || tag === `${base}-br`) return `"${tag}"`;
+  }
+  return null;
+};
+
+const cacheHeaders = (res: Response, etag: string, updatedAt: number) => {
+  res.setHeader("ETag", etag);
+  res.setHeader("Last-Modified", new Date(updatedAt * 1000).toUTCString());
+  res.setHeader(
+    "Cache-Control",
+    `public, max-age=${BROWSER_MAX_AGE}, s-maxage=${CDN_MAX_AGE}, stale-while-revalidate=${STALE_WHILE_REVALIDATE}`
+  );
+  res.setHeader("Vary", "Accept-Encoding");
+};
+
+/**
+ * Sends a ticker's data with HTTP caching: a strong ETag from the ticker's DataVersion and the request URL,
+ * 304 when If-None-Match (or If-Modified-Since) shows the client's copy is current, without running build(),
+ * and brotli/gzip compression for payloads above COMPRESS_MIN_BYTES.
+ * Tickers without a DataVersion row are sent uncached.
+ */
+export const sendCached = async (req: Request, res: Response, ticker: string, build: () => Promise<unknown>) => {
+  const version: any = await DataVersion.findByPk(ticker);
+  if (!version) {
+    return res.json(await build());
+  }
+
+  const etag = makeEtag(ticker, version.version, req.originalUrl);
+  const ifNoneMatch = req.headers["if-none-match"];
+  const ifModifiedSince = req.headers["if-modified-since"];
+  const current = ifNoneMatch
+    ? matchedEtag(ifNoneMatch, etag)
+    : ifModifiedSince && Math.floor(version.updated_at) * 1000 <= Date.parse(ifModifiedSince) ? etag : null;
+  if (current) {
+    // Echo the validator of the copy the client holds, which may be a compressed representation
+    cacheHeaders(res, current, version.updated_at);
+    return res.status(304).end();
+  }
+  cacheHeaders(res, etag, version.updated_at);
+
+  let body = Buffer.from(JSON.stringify(await build()));
+  const accepted = String(req.headers["accept-encoding"] || "");
+  if (body.length >= COMPRESS_MIN_BYTES) {
+    const encoding = /\bbr\b/.test(accepted) ? "br" : /\bgzip\b/.test(accepted) ? "gzip" : null;
+    if (encoding) {
+      body = encoding === "br"
+        ? zlib.brotliCompressSync(body, { params: { [zlib.constants.BROTLI_PARAM_QUALITY]: 5 } })
+        : zlib.gzipSync(body, { level: 6 });
+      res.setHeader("Content-Encoding", encoding);
+      res.setHeader("ETag", `${etag.slice(0, -1)}-${encoding}"`);
+    }
+  }
+  res.setHeader("Content-Type", "application/json; charset=utf-8");
+  return res.status(200).send(body);
+};
@@ -25,6 +25,9 @@ export const Company = sequelize.define("Company", {
   value: {
     type: DataTypes.FLOAT,
   },
+  filing_year: {
+    type: DataTypes.INTEGER,
+  },
 }, {
   tableName: "Company", 
   timestamps: false,
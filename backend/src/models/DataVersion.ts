@@ -0,0 +1,21 @@
+import { DataTypes } from "sequelize";
+import { sequelize } from "../db";
+
+// Per-ticker data version, bumped by save_to_db on every write; used for HTTP ETags.
+export const DataVersion = sequelize.define("DataVersion", {
+  ticker: {
+    type: DataTypes.STRING,
+    primaryKey: true,
+  },
+  version: {
+    type: DataTypes.INTEGER,
+    allowNull: false,
+  },
+  updated_at: {
+    type: DataTypes.FLOAT,
+    allowNull: false,
+  },
+}, {
+  tableName: "DataVersion",
+  timestamps: false
+});
@@ -0,0 +1,23 @@
+import { DataTypes } from "sequelize";
+import { sequelize } from "../db";
+
+export const DerivedMetric = sequelize.define("DerivedMetric", {
+  ticker: {
+    type: DataTypes.STRING,
+    primaryKey: true,
+  },
+  metric: {
+    type: DataTypes.STRING,
+    primaryKey: true,
+  },
+  year: {
+    type: DataTypes.INTEGER,
+    primaryKey: true,
+  },
+  value: {
+    type: DataTypes.FLOAT,
+  },
+}, {
+  tableName: "DerivedMetric",
+  timestamps: false
+});
@@ -1,18 +1,65 @@
 import express from "express";
+import { Op } from "sequelize";
 import { Company } from "../models/Company";
 import { CompanyMetadata } from "../models/CompanyMetadata";
+import { DerivedMetric } from "../models/DerivedMetric";
+import { sendCached } from "../httpCache";
 
 const router = express.Router();
 
+const MAX_PAGE_SIZE = 10000;
+
+const listParam = (value: unknown) =>
+  typeof value === "string" && value ? value.split(",") : undefined;
+
+const intParam = (value: unknown) => {
+  const parsed = Number(value);
+  return typeof value === "string" && value !== "" && Number.isInteger(parsed) ? parsed : undefined;
+};
+
+// Opaque keyset cursor: the (year, statement_type, metric, id) of the last row of a page.
+const encodeCursor = (row: any) =>
+  Buffer.from(JSON.stringify([row.year, row.statement_type, row.metric, row.id])).toString("base64url");
+
+const decodeCursor = (cursor: string) => {
+  const key = JSON.parse(Buffer.from(cursor, "base64url").toString("utf8"));
+  if (!Array.isArray(key) || key.length !== 4) throw new Error(`Invalid cursor: ${cursor}`);
+  return key as [number, string, string, number];
+};
+
+// Pushes the statement_type/metrics/year_from/year_to projection and the cursor into the SQL query.
+const companyWhere = (ticker: string, query: express.Request["query"]) => {
+  const where: any = { ticker };
+  const statementTypes = listParam(query.statement_type);
+  const metrics = listParam(query.metrics);
+  const yearFrom = intParam(query.year_from);
+  const yearTo = intParam(query.year_to);
+  if (statementTypes) where.statement_type = { [Op.in]: statementTypes };
+  if (metrics) where.metric = { [Op.in]: metrics };
+  if (yearFrom !== undefined || yearTo !== undefined) {
+    where.year = {
+      ...(yearFrom !== undefined && { [Op.gte]: yearFrom }),
+      ...(yearTo !== undefined && { [Op.lte]: yearTo }),
+    };
+  }
+  if (typeof query.cursor === "string" && query.cursor) {
+    const [year, statementType, metric, id] = decodeCursor(query.cursor);
+    where[Op.and] = [{
+      [Op.or]: [
+        { year: { [Op.lt]: year } },
+        { year, statement_type: { [Op.gt]: statementType } },
+        { year, statement_type: statementType, metric: { [Op.gt]: metric } },
+        { year, statement_type: statementType, metric, id: { [Op.gt]: id } },
+      ],
+    }];
+  }
+  return where;
+};
+
 router.get("/:ticker", async (req, res) => {
   const { ticker } = req.params;
 
   try {
-    const all = await CompanyMetadata.findAll();
-    console.log(
-      " All metadata rows:",
-      all.map((r) => r.toJSON())
-    );
     const meta = await CompanyMetadata.findOne({ where: { ticker } });
 
     if (!meta) {
@@ -21,19 +68,38 @@ router.get("/:ticker", async (req, res) => {
         .json({ error: `Ticker ${ticker} not found in CompanyMetadata` });
     }
 
-    const records = await Company.findAll({
-      where: { ticker },
-      order: [["year", "ASC"]],
-    });
+    let where: any;
+    try {
+      where = companyWhere(ticker, req.query);
+    } catch (err) {
+      return res.status(400).json({ error: String(err) });
+    }
+    const limit = intParam(req.query.limit);
+    const pageSize = limit === undefined ? undefined : Math.min(Math.max(limit, 1), MAX_PAGE_SIZE);
+
+    return await sendCached(req, res, ticker, async () => {
+      const records = await Company.findAll({
+        attributes: ["id", "year", "statement_type", "metric", "value"],
+        where,
+        // Same order as structure.query_company_data, the order of idx_company_ticker_page: no sort step
+        order: [["year", "DESC"], ["statement_type", "ASC"], ["metric", "ASC"], ["id", "ASC"]],
+        ...(pageSize !== undefined && { limit: pageSize + 1 }),
+      });
 
-    const result = records.map((row: any) => ({
-      year: row.year,
-      statement_type: row.statement_type,
-      metric: row.metric,
-      value: row.value,
-    }));
+      const page = pageSize !== undefined ? records.slice(0, pageSize) : records;
+      const result = page.map((row: any) => ({
+        year: row.year,
+        statement_type: row.statement_type,
+        metric: row.metric,
+        value: row.value,
+      }));
 
-    return res.json({ source: "db", data: result });
+      if (pageSize === undefined) {
+        return { source: "db", data: result };
+      }
+      const nextCursor = records.length > pageSize ? encodeCursor(page[page.length - 1]) : null;
+      return { source: "db", data: result, next_cursor: nextCursor };
+    });
   } catch (err) {
     console.error(" DB error:", err);
     return res.status(500).json({ error: "Server error", details: err });
@@ -59,5 +125,28 @@ router.get("/:ticker/meta", async (req, res) => {
   }
 });
 
+router.get("/:ticker/derived", async (req, res) => {
+  const { ticker } = req.params;
+
+  try {
+    return await sendCached(req, res, ticker, async () => {
+      const records = await DerivedMetric.findAll({
+        where: { ticker },
+        order: [["metric", "ASC"], ["year", "ASC"]],
+      });
+
+      const result = records.map((row: any) => ({
+        year: row.year,
+        metric: row.metric,
+        value: row.value,
+      }));
+
+      return { source: "db", data: result };
+    });
+  } catch (err) {
+    console.error("Derived metrics fetch error:", err);
+    return res.status(500).json({ error: "Server error", details: err });
+  }
+});
 
 export default router;
@@ -4,7 +4,7 @@ import cors from "cors";
 import companyRoutes from "./routes/company.routes";
 
 export const setupApp = (app: Express) => {
-  app.use(cors());
+  app.use(cors({ exposedHeaders: ["ETag", "Last-Modified"] }));
   app.use(express.json());
   app.use(express.urlencoded({ extended: false }));
 
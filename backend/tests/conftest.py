@@ -0,0 +1,29 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import structure
+
+@pytest.fixture(autouse=True)
+def temp_database(tmp_path, monkeypatch):
+    """
+    Points structure.DB_PATH, which every module reads, at a fresh database so no test touches data.sqlite.
+    """
+    db_path = str(tmp_path / "data.sqlite")
+    monkeypatch.setattr(structure, "DB_PATH", db_path)
+    yield db_path
+
+@pytest.fixture
+def save_filing(temp_database):
+    """
+    Saves one filing with save_to_db: save_filing(ticker, year, {metric: value}, {metric: {year: value}}).
+    The current values are Income Statement rows; provenance is the parser's Provenance entry, if any.
+    """
+    def save(ticker="TCO", year=2024, current=None, historical=None, provenance=None, name="TestCo"):
+        data = {"Income Statement": current or {}, "Historical Data": historical or {}}
+        if provenance is not None:
+            data["Provenance"] = provenance
+        return structure.save_to_db(name, {"ticker": ticker, "ir_url": "", "year": year, "data": data})
+    return save
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks')))
+
+from bench_pipeline import FakeLLM, compare, load_corpus, run_benchmarks, text_quality
+
+def test_corpus_skips_reference_keys():
+    corpus = load_corpus()
+
+    assert {f["ticker"] for f in corpus} == {"ASML", "AYDEN", "ROG"}
+    assert all("data" in f for f in corpus)
+
+def test_fake_llm_is_deterministic():
+    corpus = [{"ticker": "ASML", "year": 2024, "data": {"Balance Sheet": {"Total assets": "48,592.3"}}}]
+    fake = FakeLLM(corpus)
+    fake.ticker, fake.year = "ASML", 2024
+    messages = [{"role": "user", "content": "Extract...\nText:\nConsolidated balance sheet\nTotal assets 48,592.3"}]
+
+    first = fake.complete("gpt-4o", messages)
+    second = fake.complete("gpt-4o", messages)
+
+    assert first.content == second.content
+    assert json.loads(first.content)["data"] == [{"line_item": "Total assets", "value": "48,592.3"}]
+    other = fake.complete("gpt-4o", [{"role": "user", "content": "Text:\nLetter from the CEO"}])
+    assert json.loads(other.content)["statement_type"] == "None"
+
+def test_compare_flags_regressions_in_the_right_direction():
+    baseline = {"save_to_db_rows_per_sec": 1000.0, "load_from_db_seconds": 0.010}
+
+    assert compare({"save_to_db_rows_per_sec": 900.0, "load_from_db_seconds": 0.011}, baseline, 0.25) == []
+    regressions = compare({"save_to_db_rows_per_sec": 500.0, "load_from_db_seconds": 0.005}, baseline, 0.25)
+    assert len(regressions) == 1 and regressions[0].startswith("save_to_db_rows_per_sec")
+    assert len(compare({"load_from_db_seconds": 0.02}, baseline, 0.25)) == 1
+
+def test_compare_flags_peak_memory_growth():
+    baseline = {"save_to_db_peak_mb": 4.0}
+
+    assert compare({"save_to_db_peak_mb": 4.5}, baseline, 0.25) == []
+    regressions = compare({"save_to_db_peak_mb": 6.0}, baseline, 0.25)
+    assert len(regressions) == 1 and regressions[0].startswith("save_to_db_peak_mb")
+
+def test_structure_benchmarks_run_on_a_small_corpus():
+    corpus = [f for f in load_corpus() if f["ticker"] == "ASML"][:2]
+
+    results = run_benchmarks(repeats=1, corpus=corpus, pdfs=[])
+
+    assert results["save_to_db_rows_per_sec"] > 0
+    assert results["load_from_db_seconds"] > 0
+    assert results["skipped"]["extraction"] == "no PDFs"
+
+def test_text_quality_checks_values_stay_on_their_row():
+    statements = {"Income Statement": {"Total net sales": "28,262.9", "Cost of sales": "-13,770.0"}}
+
+    rows = {0: "Total net sales 28,262.9\nCost of sales (13,770.0)\n"}
+    columns = {0: "Total net sales\nCost of sales\n28,262.9\n(13,770.0)\n"}
+
+    assert text_quality(rows, statements) == {"values_found": 1.0, "rows_intact": 1.0}
+    assert text_quality(columns, statements) == {"values_found": 1.0, "rows_intact": 0.0}
@@ -0,0 +1,94 @@
+import pytest
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import structure
+from structure import load_from_db, query_company_data
+
+@pytest.fixture(autouse=True)
+def stored_filings(temp_database):
+    for year, revenue in ((2022, "80"), (2023, "90"), (2024, "100")):
+        structure.save_to_db("TestCo", {
+            "ticker": "TCO",
+            "ir_url": "",
+            "year": year,
+            "data": {
+                "Income Statement": {"Revenue": revenue, "Net Income": "10", "Operating Income": "15"},
+                "Balance Sheet": {"Total Assets": "500"},
+                "Historical Data": {"Revenue": {str(year - 5): "50"}},
+            }
+        })
+
+def test_projection_is_filtered_in_sql():
+    page = query_company_data("TCO", ["Income Statement"], ["Revenue"], 2023, 2024)
+
+    assert page == {"results": {"Income Statement": {2024: {"Revenue": 100.0}, 2023: {"Revenue": 90.0}}},
+                    "next_cursor": None}
+    assert query_company_data("TCO", metrics=["Total Assets"])["results"] == {
+        "Balance Sheet": {2024: {"Total Assets": 500.0}, 2023: {"Total Assets": 500.0}, 2022: {"Total Assets": 500.0}}
+    }
+    assert "Historical" not in query_company_data("TCO", ["Income Statement", "Balance Sheet"])["results"]
+
+def test_cursor_pages_cover_every_row_once():
+    seen = []
+    after = None
+    while True:
+        page = query_company_data("TCO", limit=4, after=after)
+        seen.extend((st, year, metric) for st, years in page["results"].items()
+                    for year, values in years.items() for metric in values)
+        after = page["next_cursor"]
+        if after is None:
+            break
+
+    everything = [(st, year, metric) for st, years in load_from_db("TCO").items()
+                  for year, values in years.items() for metric in values]
+    assert len(seen) == len(set(seen)) == len(everything)
+    assert set(seen) == set(everything)
+
+def test_pages_are_newest_year_first():
+    first = query_company_data("TCO", limit=2)
+
+    assert list(first["results"]) == ["Balance Sheet", "Income Statement"]
+    assert [list(years) for years in first["results"].values()] == [[2024], [2024]]
+    assert query_company_data("TCO", limit=100)["next_cursor"] is None
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        query_company_data("TCO", after="not-a-cursor")
+
+def test_keyset_query_uses_the_ticker_index(temp_database):
+    conn = sqlite3.connect(temp_database)
+    plan = " ".join(row[-1] for row in conn.execute("""
+        EXPLAIN QUERY PLAN SELECT year, statement_type, metric, id, value FROM Company
+        WHERE ticker = ? ORDER BY year DESC, statement_type, metric, id LIMIT 5
+    """, ("TCO",)))
+    conn.close()
+
+    assert "idx_company_ticker_page" in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_reads_do_not_change_the_schema(tmp_path, monkeypatch):
+    empty_db = str(tmp_path / "empty.sqlite")
+    monkeypatch.setattr(structure, "DB_PATH", empty_db)
+
+    assert query_company_data("TCO") == {"results": {}, "next_cursor": None}
+    assert structure.find_missing_years("TCO", [2023, 2024])["missing"] == [2023, 2024]
+    conn = sqlite3.connect(empty_db)
+    assert conn.execute("SELECT name FROM sqlite_master").fetchall() == []
+    conn.close()
+
+def test_migration_replaces_the_old_ticker_index(temp_database):
+    conn = sqlite3.connect(temp_database)
+    conn.execute("CREATE INDEX idx_company_ticker_year ON Company (ticker, year)")
+    conn.commit()
+    conn.close()
+
+    structure.migrate()
+    conn = sqlite3.connect(temp_database)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert {"idx_company_ticker_page", "idx_company_metric_year"} <= indexes
+    assert "idx_company_ticker_year" not in indexes
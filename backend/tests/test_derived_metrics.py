@@ -0,0 +1,77 @@
+import pytest
+import math
+import os
+import sys
+from array import array
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import structure
+import derived_metrics
+from derived_metrics import resolve_roles, compute_ratios, growth_labels, load_derived
+
+@pytest.fixture(autouse=True)
+def no_reference_metrics(tmp_path, monkeypatch):
+    monkeypatch.setattr(derived_metrics, "REFERENCE_METRICS_PATH", str(tmp_path / "missing.json"))
+
+def test_resolve_roles_prefers_reference_metrics():
+    roles = resolve_roles(["Total net sales", "Revenue", "Net income"], ["Revenue"])
+    assert roles["revenue"] == "Revenue"
+    assert roles["net_income"] == "Net income"
+    assert "total_assets" not in roles
+
+def test_compute_ratios_margins_and_cagr():
+    series = {
+        "years": [2020, 2021, 2022, 2023],
+        "metrics": {
+            "Revenue": array("d", [100.0, 110.0, math.nan, 133.1]),
+            "Cost of Sales": array("d", [-60.0, 66.0, 70.0, 80.0]),
+            "Total Current Assets": array("d", [50.0, 60.0, 70.0, 80.0]),
+            "Total Current Liabilities": array("d", [25.0, 0.0, 35.0, 40.0]),
+        }
+    }
+    roles = resolve_roles(list(series["metrics"]), [])
+
+    derived = compute_ratios(series, roles)
+
+    assert derived["Gross Margin"][0] == pytest.approx(0.4)
+    assert math.isnan(derived["Gross Margin"][2])
+    assert list(derived["Current Ratio"])[0] == 2.0
+    assert math.isnan(derived["Current Ratio"][1])
+    assert derived["Revenue 3Y CAGR"][3] == pytest.approx(0.1)
+    assert "Net Margin" not in derived
+
+def test_save_to_db_persists_derived_metrics():
+    structure.save_to_db("TestCo", {
+        "ticker": "TCO",
+        "ir_url": "",
+        "data": {
+            "Income Statement": {"Revenue": "200", "Gross Profit": "80", "Net Income": "20"},
+            "Historical Data": {"Revenue": {"2023": "160"}}
+        }
+    })
+
+    derived = load_derived("TCO")
+
+    assert derived["Gross Margin"] == {2024: pytest.approx(0.4)}
+    assert derived["Net Margin"] == {2024: pytest.approx(0.1)}
+    assert derived["Revenue YoY Growth"] == {2024: pytest.approx(0.25)}
+
+def test_growth_is_named_after_the_canonical_metric():
+    labels = growth_labels(["Total net sales", "Research and development costs", "Other income"],
+                           ["Revenue", "Research and Development Costs"])
+    assert labels == {"Revenue": "Total net sales", "Research and Development Costs": "Research and development costs"}
+
+    structure.save_to_db("TestCo", {
+        "ticker": "TCO",
+        "ir_url": "",
+        "data": {
+            "Income Statement": {"Total net sales": "200", "Other income": "12"},
+            "Historical Data": {"Total net sales": {"2023": "160"}, "Other income": {"2023": "10"}}
+        }
+    })
+
+    derived = load_derived("TCO")
+
+    assert derived["Revenue YoY Growth"] == {2024: pytest.approx(0.25)}
+    assert "Total net sales YoY Growth" not in derived and "Other income YoY Growth" not in derived
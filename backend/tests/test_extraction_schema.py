@@ -0,0 +1,97 @@
+import pytest
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import extraction_schema
+from extraction_schema import EXTRACTION_RESPONSE_FORMAT, ExtractionParseError, StatementExtraction
+from llm_client import LLMClient, LLMResponse, request_key
+
+VALID = json.dumps({
+    "statement_type": "Income Statement",
+    "data": [{"line_item": "Net sales", "value": "27,559"}],
+    "historical_data": [
+        {"line_item": "Net sales", "year": 2022, "value": "21,173"},
+        {"line_item": "Net sales", "year": 2021, "value": "18,611"},
+    ],
+})
+
+class ScriptedBackend:
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.formats = []
+
+    def is_retryable(self, error):
+        return False
+
+    def complete(self, model, messages, temperature=None, max_tokens=None, timeout=None, on_token=None, label=None,
+                 response_format=None):
+        self.formats.append(response_format)
+        return LLMResponse(self.answers.pop(0), {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}, model)
+
+def test_parses_schema_response_into_per_year_history():
+    result = StatementExtraction.from_json(VALID)
+
+    assert result.statement_type == "Income Statement"
+    assert result.data == {"Net sales": "27,559"}
+    assert result.historical == {"Net sales": {"2022": "21,173", "2021": "18,611"}}
+
+def test_accepts_legacy_fenced_responses():
+    content = '```json\n{"Statement Type": "Balance Sheet", "Data": {"Total assets": 100}, "Historical Data": {"Total assets": "90"}}\n```'
+    result = StatementExtraction.from_json(content)
+
+    assert result.statement_type == "Balance Sheet"
+    assert result.data == {"Total assets": "100"}
+    assert result.historical == {}  # flat historical values carry no year
+
+@pytest.mark.parametrize("content", [
+    "not json",
+    '{"statement_type": "Notes", "data": [], "historical_data": []}',
+    '{"statement_type": "Balance Sheet", "data": {"a": "1"}, "historical_data": []}',
+    '{"statement_type": "Balance Sheet", "data": [], "historical_data": [{"line_item": "a", "year": "FY", "value": "1"}]}',
+])
+def test_rejects_invalid_responses(content):
+    with pytest.raises(ExtractionParseError):
+        StatementExtraction.from_json(content)
+
+def test_parse_failure_rate():
+    extraction_schema.reset_extraction_stats()
+    for outcome in ("ok", "ok", "repaired", "dropped"):
+        extraction_schema.record_parse(outcome)
+
+    stats = extraction_schema.extraction_stats()
+    assert stats["parse_failures"] == 2
+    assert stats["parse_failure_rate"] == 0.5
+    extraction_schema.reset_extraction_stats()
+
+def test_response_format_reaches_backend_and_cache_key():
+    backend = ScriptedBackend([VALID, "plain"])
+    client = LLMClient(backend, debug_log=None, backoff=0)
+
+    client.prompt("extract", response_format=EXTRACTION_RESPONSE_FORMAT)
+    client.prompt("chat")
+
+    assert backend.formats == [EXTRACTION_RESPONSE_FORMAT, None]
+    messages = [{"role": "user", "content": "x"}]
+    assert request_key("m", messages, 0, 10) != request_key("m", messages, 0, 10, EXTRACTION_RESPONSE_FORMAT)
+
+def test_invalid_extraction_gets_one_repair_call():
+    pytest.importorskip("fitz")
+    pytest.importorskip("pdfplumber")
+    import llm_client
+    import parser
+
+    backend = ScriptedBackend(['{"statement_type": "Income Statement", "data": [', VALID])
+    llm_client.set_client(LLMClient(backend, debug_log=None, backoff=0))
+    extraction_schema.reset_extraction_stats()
+    try:
+        result, usage = parser.ask_openai_batch("Net sales 27,559", [4], 2023)
+    finally:
+        llm_client.set_client(None)
+
+    assert result.data == {"Net sales": "27,559"}
+    assert usage["total_tokens"] == 30
+    assert extraction_schema.extraction_stats()["repaired"] == 1
+    extraction_schema.reset_extraction_stats()
@@ -0,0 +1,88 @@
+import pytest
+import gzip
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from data_version import load_version, migrate
+from http_cache import accepted_encodings, cache_headers, encode_body, etag_matches, http_date, make_etag, matched_etag, not_modified
+
+def test_save_to_db_bumps_the_data_version(save_filing):
+    assert load_version("TCO") is None
+    save_filing("TCO", 2024, {"Revenue": "100"})
+    first = load_version("TCO")
+    save_filing("TCO", 2023, {"Revenue": "90"})
+    second = load_version("TCO")
+
+    assert second[0] == first[0] + 1
+    assert make_etag("TCO", first[0], "/series/TCO?") != make_etag("TCO", second[0], "/series/TCO?")
+
+def test_if_none_match():
+    etag = make_etag("TCO", 3, "/scrape/TCO?")
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches(f'{etag[:-1]}-gzip"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(make_etag("TCO", 4, "/scrape/TCO?"), etag)
+    assert not etag_matches(make_etag("TCO", 3, "/derived/TCO?"), etag)
+
+def test_304_echoes_the_etag_of_the_representation_held():
+    etag = make_etag("TCO", 3, "/scrape/TCO?")
+    gzip_etag = cache_headers(etag, 1_700_000_000, "gzip")["ETag"]
+
+    assert matched_etag(f'"other", W/{gzip_etag}', etag) == gzip_etag
+    assert not_modified({"if-none-match": gzip_etag}, etag, 1_700_000_000) == gzip_etag
+    assert not_modified({"if-none-match": etag}, etag, 1_700_000_000) == etag
+    assert matched_etag("*", etag) == etag
+
+def test_if_modified_since_is_a_fallback():
+    etag = make_etag("TCO", 3)
+
+    assert not_modified({"if-modified-since": http_date(1_700_000_000)}, etag, 1_700_000_000.5)
+    assert not not_modified({"if-modified-since": http_date(1_600_000_000)}, etag, 1_700_000_000)
+    assert not not_modified({"if-none-match": '"stale"', "if-modified-since": http_date(1_700_000_000)}, etag, 1_600_000_000)
+
+def test_large_payloads_are_compressed():
+    payload = {"data": [{"metric": "Revenue", "year": y, "value": y * 1.5} for y in range(200)]}
+
+    body, encoding = encode_body(payload, "gzip, deflate")
+    assert encoding == "gzip" and json.loads(gzip.decompress(body)) == payload
+    assert encode_body({"ticker": "TCO"}, "gzip") == (b'{"ticker":"TCO"}', None)
+    assert encode_body(payload, None)[1] is None
+
+    headers = cache_headers(make_etag("TCO", 3), 1_700_000_000, "gzip")
+    assert headers["ETag"].endswith('-gzip"') and headers["Content-Encoding"] == "gzip"
+    assert "s-maxage=" in headers["Cache-Control"] and headers["Vary"] == "Accept-Encoding"
+
+def test_accept_encoding_honours_q_values():
+    assert accepted_encodings("gzip;q=0, deflate") == {"deflate"}
+    assert accepted_encodings("br;q=0, gzip;q=0.5") == {"gzip"}
+    assert accepted_encodings("*;q=0.1, br;q=0") == {"*", "gzip"}
+    assert accepted_encodings("gzip; q=1.0, identity; q=0") == {"gzip"}
+
+    payload = {"data": list(range(1000))}
+    assert encode_body(payload, "gzip;q=0")[1] is None
+    assert encode_body(payload, "br;q=0, gzip")[1] == "gzip"
+
+def test_migration_backfills_a_version_table_created_empty(temp_database, save_filing):
+    save_filing("TCO", 2024, {"Revenue": "100"})
+    conn = sqlite3.connect(temp_database)
+    conn.execute("DELETE FROM DataVersion")  # as created by the Node server's sequelize.sync()
+    conn.commit()
+    conn.close()
+    assert load_version("TCO") is None
+
+    migrate()
+    assert load_version("TCO")[0] == 1
+    migrate()
+    assert load_version("TCO")[0] == 1
+
+def test_reads_do_not_create_the_version_table(temp_database):
+    assert load_version("TCO") is None
+    conn = sqlite3.connect(temp_database)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'DataVersion'").fetchone() is None
+    conn.close()
@@ -0,0 +1,50 @@
+import pytest
+import json
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Modules only the scrape/parse pipeline needs; the API must not load them at import.
+HEAVY_MODULES = [
+    "playwright", "openai", "requests", "fitz", "pdfplumber", "dotenv",
+    "scripts.quick_scrape", "scripts.deep_scrape", "scripts.parser",
+]
+
+# Cumulative import time budget for scripts.main, in milliseconds. Most of it is FastAPI itself.
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+def import_in_subprocess(modules, extra_args=()):
+    code = (
+        "import json, sys\n"
+        + "".join(f"import {m}\n" for m in modules)
+        + f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    )
+    env = dict(os.environ, APP_MODE="serve")
+    return subprocess.run([sys.executable, *extra_args, "-c", code], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+
+def test_read_path_modules_stay_light():
+    result = import_in_subprocess([
+        "scripts.structure", "scripts.metrics_store", "scripts.derived_metrics", "scripts.screening",
+        "scripts.provenance", "scripts.llm_client", "scripts.extraction_schema", "scripts.fiscal_years",
+    ])
+
+    assert json.loads(result.stdout) == []
+
+def test_main_import_budget():
+    pytest.importorskip("fastapi")
+    result = import_in_subprocess(["scripts.main"], ["-X", "importtime"])
+
+    assert json.loads(result.stdout) == []
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    timings = [
+        (int(cumulative), name)
+        for cumulative, name in re.findall(r"import time:\s+\d+ \|\s+(\d+) \|(.*)", result.stderr)
+    ]
+    total_ms = sum(us for us, name in timings if not name.startswith("  ")) / 1000  # top-level imports only
+    slowest = sorted(timings, reverse=True)[:10]
+    assert total_ms <= IMPORT_BUDGET_MS, f"import took {total_ms:.0f} ms, slowest: {slowest}"
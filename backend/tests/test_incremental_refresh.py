@@ -0,0 +1,109 @@
+import pytest
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import structure
+import derived_metrics
+from structure import find_missing_years
+from metrics_store import load_series
+from fiscal_years import fiscal_year_window
+
+def test_fiscal_year_window_is_configurable(monkeypatch):
+    monkeypatch.setenv("FISCAL_YEAR_FROM", "2018")
+    monkeypatch.setenv("FISCAL_YEAR_TO", "2025")
+
+    assert fiscal_year_window() == list(range(2018, 2026))
+    assert fiscal_year_window(2023) == [2023, 2024, 2025]
+    with pytest.raises(ValueError):
+        fiscal_year_window(2026, 2025)
+
+def test_find_missing_and_stale_years(save_filing):
+    save_filing("TCO", 2024, {"Revenue": "100"}, {"Revenue": {"2023": "90", "2022": "80"}})
+    save_filing("TCO", 2022, {"Revenue": "80"}, {})
+
+    gaps = find_missing_years("TCO", range(2021, 2026))
+
+    assert gaps == {"missing": [2021, 2025], "stale": [2023]}
+
+def test_newest_filing_wins_regardless_of_save_order(save_filing):
+    save_filing("TCO", 2025, {"Revenue": "110"}, {"Revenue": {"2024": "101", "2023": "91"}})
+    save_filing("TCO", 2024, {"Revenue": "100"}, {"Revenue": {"2023": "90", "2022": "80"}})
+
+    series = load_series("TCO", metrics=["Revenue"])
+
+    assert series["years"] == [2022, 2023, 2024, 2025]
+    assert list(series["metrics"]["Revenue"]) == [80.0, 91.0, 101.0, 110.0]
+
+def test_incremental_append_updates_restated_history(temp_database, save_filing):
+    save_filing("TCO", 2024, {"Revenue": "100"}, {"Revenue": {"2023": "90"}})
+    save_filing("TCO", 2025, {"Revenue": "120"}, {"Revenue": {"2024": "100", "2023": "95"}})
+
+    conn = sqlite3.connect(temp_database)
+    rows = conn.execute("""
+        SELECT year, value, filing_year FROM Company
+        WHERE statement_type = 'Historical' ORDER BY year
+    """).fetchall()
+    conn.close()
+
+    assert rows == [(2023, 95.0, 2025), (2024, 100.0, 2025)]
+    assert derived_metrics.load_derived("TCO", ["Revenue YoY Growth"])["Revenue YoY Growth"][2025] == pytest.approx(0.2)
+
+def test_filing_year_column_is_backfilled(temp_database):
+    conn = sqlite3.connect(temp_database)
+    conn.execute("""
+        CREATE TABLE Company (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT, ticker TEXT, year INTEGER, statement_type TEXT, metric TEXT, value REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(name, ticker, year, statement_type, metric)
+        )
+    """)
+    conn.executemany("INSERT INTO Company (name, ticker, year, statement_type, metric, value) VALUES (?, ?, ?, ?, ?, ?)", [
+        ("TestCo", "TCO", 2024, "Income Statement", "Revenue", 100.0),
+        ("TestCo", "TCO", 2023, "Historical", "Revenue", 90.0),
+    ])
+    conn.commit()
+    conn.close()
+
+    structure.migrate()
+    assert find_missing_years("TCO", [2023, 2024]) == {"missing": [], "stale": [2023]}
+
+    conn = sqlite3.connect(temp_database)
+    assert conn.execute("SELECT year, filing_year FROM Company ORDER BY year").fetchall() == [(2023, 2024), (2024, 2024)]
+    conn.close()
+
+def test_legacy_rows_are_attributed_to_the_newest_filing(temp_database, save_filing):
+    conn = sqlite3.connect(temp_database)
+    conn.execute("""
+        CREATE TABLE Company (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT, ticker TEXT, year INTEGER, statement_type TEXT, metric TEXT, value REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(name, ticker, year, statement_type, metric)
+        )
+    """)
+    # Before filing_year, every row came from the newest (2024) filing, including its 2017-2023 history
+    conn.executemany("INSERT INTO Company (name, ticker, year, statement_type, metric, value) VALUES (?, ?, ?, ?, ?, ?)", [
+        ("TestCo", "TCO", 2024, "Income Statement", "Revenue", 100.0),
+        ("TestCo", "TCO", 2023, "Historical", "Revenue", 90.0),
+        ("TestCo", "TCO", 2017, "Historical", "Revenue", 40.0),
+    ])
+    conn.commit()
+    conn.close()
+
+    structure.migrate()
+    save_filing("TCO", 2018, {"Revenue": "45"}, {"Revenue": {"2017": "39"}})
+
+    conn = sqlite3.connect(temp_database)
+    rows = conn.execute("""
+        SELECT year, value, filing_year FROM Company
+        WHERE statement_type = 'Historical' ORDER BY year
+    """).fetchall()
+    conn.close()
+
+    assert rows == [(2017, 40.0, 2024), (2023, 90.0, 2024)]
@@ -0,0 +1,47 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from job_context import JobContext
+
+def test_jobs_keep_their_own_state_across_threads(tmp_path):
+    jobs = {ticker: JobContext(ticker, pdf_dir=str(tmp_path)) for ticker in ("asml", "adyen")}
+
+    def run(job, years):
+        for year in years:
+            job.record_download(f"{job.ticker}_{year}.pdf")
+            job.add_prompt_tokens(10)
+        job.record_download(f"{job.ticker}_{years[0]}.pdf")
+
+    threads = [threading.Thread(target=run, args=(jobs["asml"], [2024, 2023, 2022])),
+               threading.Thread(target=run, args=(jobs["adyen"], [2024]))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert jobs["asml"].downloaded_years() == [2022, 2023, 2024]
+    assert jobs["asml"].prompt_tokens == 30
+    assert jobs["adyen"].downloaded_pdfs == ["ADYEN_2024.pdf"]
+    assert jobs["adyen"].prompt_tokens == 10
+
+def test_scratch_dir_is_private_and_removed(tmp_path):
+    with JobContext("TCO", pdf_dir=str(tmp_path)) as first, JobContext("TCO", pdf_dir=str(tmp_path)) as second:
+        assert not os.path.exists(tmp_path / ".jobs")
+        assert first.scratch_dir != second.scratch_dir
+        assert os.path.dirname(first.scratch_dir) == str(tmp_path / ".jobs")
+        open(os.path.join(first.scratch_dir, "TCO_2024.pdf"), "wb").close()
+        scratch = first.scratch_dir
+
+    assert not os.path.exists(scratch)
+    assert os.listdir(tmp_path / ".jobs") == []
+
+def test_events_go_to_the_jobs_listener():
+    events = []
+    job = JobContext("TCO", events.append)
+    job.emit("pdf_downloaded", year=2024, file="TCO_2024.pdf", cached=False)
+    JobContext("TCO").emit("ir_url", url="https://example.com")
+
+    assert events == [{"event": "pdf_downloaded", "year": 2024, "file": "TCO_2024.pdf", "cached": False}]
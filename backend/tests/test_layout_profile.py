@@ -0,0 +1,87 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+pytest.importorskip("fitz")
+pytest.importorskip("pdfplumber")
+
+import parser
+from parser import (LAYOUT_PROBE_RADIUS, layout_profile_path, load_layout_profile, probe_pages, record_layout,
+                    save_layout_profile)
+
+INCOME_HEADING = "Consolidated Statement of Operations for the year ended December 31, 2023"
+
+class Pages:
+    """
+    Stands in for the page-text cache: {page: text} over a document of page_count pages.
+    """
+    def __init__(self, page_count, texts):
+        self.page_count = page_count
+        self.texts = texts
+
+    def __len__(self):
+        return self.page_count
+
+    def page(self, p):
+        return self.texts.get(p, "")
+
+@pytest.fixture
+def pages(tmp_path, monkeypatch):
+    documents = {}
+    monkeypatch.setattr(parser, "page_text_cache", lambda pdf_path: documents[pdf_path])
+    monkeypatch.setattr(parser, "PARSED_JSON_DIR", str(tmp_path / "parsed_json"))
+    return documents
+
+def profile_with(year, relative_offset, headings):
+    return {"ticker": "ASML", "filings": {str(year): {"page_count": 100, "statements": {
+        "Income Statement": {"pages": [50], "relative_offset": relative_offset, "headings": headings}}}}}
+
+def test_probe_takes_the_window_around_the_recorded_offset(pages):
+    pages["ASML_2023.pdf"] = Pages(100, {})
+    profile = profile_with(2024, 0.5, ["consolidated statements of operations"])
+
+    assert probe_pages(profile, 2023, "ASML_2023.pdf") == list(
+        range(50 - LAYOUT_PROBE_RADIUS, 50 + LAYOUT_PROBE_RADIUS + 1))
+
+def test_probe_window_is_clipped_to_the_document(pages):
+    pages["ASML_2023.pdf"] = Pages(4, {})
+
+    assert probe_pages(profile_with(2024, 0.0, []), 2023, "ASML_2023.pdf") == [0, 1, 2, 3]
+
+def test_probe_prefers_pages_with_the_recorded_heading(pages):
+    pages["ASML_2023.pdf"] = Pages(100, {53: INCOME_HEADING, 60: INCOME_HEADING})
+    profile = profile_with(2024, 0.5, ["consolidated statement of operations for the year ended december ,"])
+
+    # Page 60 carries the heading too, but lies outside the window
+    assert probe_pages(profile, 2023, "ASML_2023.pdf") == [53, 54]
+
+def test_probe_uses_the_closest_newer_filing(pages):
+    pages["ASML_2022.pdf"] = Pages(100, {})
+    profile = profile_with(2025, 0.9, [])
+    profile["filings"].update(profile_with(2023, 0.2, [])["filings"])
+
+    assert probe_pages(profile, 2022, "ASML_2022.pdf") == list(
+        range(20 - LAYOUT_PROBE_RADIUS, 20 + LAYOUT_PROBE_RADIUS + 1))
+    assert probe_pages(profile, 2025, "ASML_2022.pdf") == []
+
+def test_recorded_layout_is_saved_and_read_back(pages):
+    assert load_layout_profile("asml") == {"ticker": "ASML", "filings": {}}
+
+    pages["ASML_2024.pdf"] = Pages(200, {80: INCOME_HEADING, 81: "Net sales 28,263"})
+    profile = load_layout_profile("asml")
+    record_layout(profile, 2024, "ASML_2024.pdf", {"Income Statement": [81, 80], "Balance Sheet": []})
+    save_layout_profile("asml", profile)
+
+    assert layout_profile_path("asml").endswith("layout_profile_ASML.json")
+    assert os.path.exists(layout_profile_path("ASML"))
+    loaded = load_layout_profile("ASML")
+    assert loaded == profile
+    assert loaded["filings"]["2024"] == {"page_count": 200, "statements": {"Income Statement": {
+        "pages": [80, 81], "relative_offset": 0.4,
+        "headings": ["consolidated statement of operations for the year ended december ,"]}}}
+
+    # The next older filing is probed at the recorded heading
+    pages["ASML_2023.pdf"] = Pages(190, {77: INCOME_HEADING.replace("2023", "2022")})
+    assert probe_pages(loaded, 2023, "ASML_2023.pdf") == [77, 78]
@@ -0,0 +1,116 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from llm_client import LLMClient, LLMResponse, ReplayBackend, ReplayMiss
+
+class RateLimitError(Exception):
+    pass
+
+class FlakyBackend:
+    def __init__(self, failures, error=RateLimitError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def is_retryable(self, error):
+        return isinstance(error, RateLimitError)
+
+    def complete(self, model, messages, temperature=None, max_tokens=None, timeout=None, on_token=None, label=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("try again")
+        return LLMResponse(f"answer to {messages[-1]['content']}", {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}, model)
+
+def test_retries_transient_errors_with_backoff():
+    backend = FlakyBackend(failures=2)
+    client = LLMClient(backend, debug_log=None, max_retries=3, backoff=0)
+
+    assert client.prompt("hi").content == "answer to hi"
+    assert backend.calls == 3
+
+def test_gives_up_on_permanent_errors():
+    backend = FlakyBackend(failures=1, error=ValueError)
+    client = LLMClient(backend, debug_log=None, max_retries=3, backoff=0)
+
+    with pytest.raises(ValueError):
+        client.prompt("hi")
+    assert backend.calls == 1
+
+def test_recorded_responses_replay_without_the_backend(tmp_path):
+    cache = str(tmp_path / "llm_cache.jsonl")
+    recorder = LLMClient(FlakyBackend(failures=0), record_path=cache, debug_log=None)
+    recorder.prompt("hi", temperature=0)
+
+    replay = LLMClient(ReplayBackend(cache), debug_log=None)
+    response = replay.prompt("hi", temperature=0)
+
+    assert response.content == "answer to hi"
+    assert response.usage["total_tokens"] == 5
+    with pytest.raises(ReplayMiss):
+        replay.prompt("something else", temperature=0)
+
+def test_replays_debug_log_by_label_in_order(tmp_path):
+    log = tmp_path / "openai_responses_debug.txt"
+    recorder = LLMClient(FlakyBackend(failures=0), debug_log=str(log))
+    recorder.prompt("first", label="Pages [3, 4]")
+    recorder.prompt("second", label="Pages [3, 4]")
+    recorder.prompt("third", label="Pages [9, 10]")
+
+    replay = LLMClient(ReplayBackend(None, [str(log)]), debug_log=None)
+    streamed = []
+
+    assert replay.prompt("anything", label="Pages [3, 4]").content == "answer to first"
+    assert replay.prompt("anything", label="Pages [3, 4]", on_token=streamed.append).content == "answer to second"
+    assert replay.prompt("anything", label="Pages [9, 10]").content == "answer to third"
+    assert streamed == ["answer to second"]
+
+def test_replay_does_not_reuse_responses_across_documents(tmp_path):
+    log = tmp_path / "openai_responses_debug.txt"
+    recorder = LLMClient(FlakyBackend(failures=0), debug_log=str(log))
+    recorder.prompt("asml 2023", label="Pages [3, 4] of aaaa")
+
+    replay = LLMClient(ReplayBackend(None, [str(log)]), debug_log=None)
+    with pytest.raises(ReplayMiss):
+        replay.prompt("asml 2022", label="Pages [3, 4] of bbbb")
+    assert replay.prompt("asml 2023", label="Pages [3, 4] of aaaa").content == "answer to asml 2023"
+    # Each recorded response is served once; a second call for the same pages is a miss, not a repeat
+    with pytest.raises(ReplayMiss):
+        replay.prompt("asml 2023", label="Pages [3, 4] of aaaa")
+
+class ModelEcho:
+    def __init__(self, answers):
+        self.answers = answers
+        self.models = []
+
+    def is_retryable(self, error):
+        return False
+
+    def complete(self, model, messages, temperature=None, max_tokens=None, timeout=None, on_token=None, label=None):
+        self.models.append(model)
+        return LLMResponse(self.answers[model], {"prompt_tokens": 1000, "completion_tokens": 100, "total_tokens": 1100}, model)
+
+def test_routes_by_task_and_input_size():
+    backend = ModelEcho({"gpt-4o-mini": "small", "gpt-4o": "large"})
+    client = LLMClient(backend, debug_log=None, tiers={"small": "gpt-4o-mini", "large": "gpt-4o"})
+
+    assert client.prompt("pick a link", task="link_choice").content == "small"
+    assert client.prompt("extract", task="extraction").content == "large"
+    assert client.prompt("x" * 100000, task="link_choice").content == "large"
+    assert client.prompt("no task").content == "large"
+
+def test_escalates_low_confidence_answers_and_reports_per_tier():
+    backend = ModelEcho({"gpt-4o-mini": "not sure", "gpt-4o": "https://example.com/ir"})
+    client = LLMClient(backend, debug_log=None, tiers={"small": "gpt-4o-mini", "large": "gpt-4o"})
+
+    response = client.prompt("find the IR page", task="ir_url", accept=lambda answer: answer.startswith("http"))
+
+    assert response.content == "https://example.com/ir"
+    assert backend.models == ["gpt-4o-mini", "gpt-4o"]
+    stats = client.stats()
+    assert stats["small"]["calls"] == 1 and stats["small"]["escalations"] == 1
+    assert stats["large"]["calls"] == 1
+    assert stats["small"]["cost_usd"] == pytest.approx((1000 * 0.15 + 100 * 0.60) / 1e6, abs=1e-4)
+    assert stats["large"]["cost_usd"] == pytest.approx((1000 * 2.50 + 100 * 10.00) / 1e6, abs=1e-4)
@@ -0,0 +1,55 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from metric_matcher import MetricIndex, normalize_label
+
+@pytest.fixture
+def index():
+    return MetricIndex({
+        "Income Statement": ["Revenue", "Cost of Sales", "Gross Profit", "Operating Income", "Net Income",
+                             "Research and Development Expenses"],
+        "Balance Sheet": {"Total Non-current Liabilities": "1", "Total Current Liabilities": "2"},
+    })
+
+def test_normalize_label_applies_synonyms_and_stopwords():
+    assert normalize_label("Total net sales") == "revenue"
+    assert normalize_label("Income from operations") == "operating income"
+    assert normalize_label("Research and development (R&D) costs") == "research development expenses"
+
+def test_synonyms_for_single_words_only_apply_to_whole_labels():
+    assert normalize_label("Sales") == "revenue"
+    assert normalize_label("Cost of sales") == "cost sales"
+    assert normalize_label("Sales and marketing costs") == "sales marketing expenses"
+
+def test_match_ignores_sign_qualifiers(index):
+    available = {"Net income (loss)": "1", "Operating income (loss)": "2", "Gross profit on sales": "3"}
+
+    assert index.match("Income Statement", available) == {
+        "Net Income": "Net income (loss)",
+        "Operating Income": "Operating income (loss)",
+        "Gross Profit": "Gross profit on sales",
+    }
+
+def test_match_uses_synonyms(index):
+    available = {"Total net sales": "1", "Total cost of sales": "2", "Income from operations": "3", "Net income": "4"}
+
+    matches = index.match("Income Statement", available)
+
+    assert matches["Revenue"] == "Total net sales"
+    assert matches["Cost of Sales"] == "Total cost of sales"
+    assert matches["Operating Income"] == "Income from operations"
+    assert matches["Net Income"] == "Net income"
+
+def test_match_rejects_net_interest_income_for_net_income(index):
+    matches = index.match("Income Statement", {"Net interest income": "1"})
+    assert "Net Income" not in matches
+
+def test_match_is_one_to_one_and_respects_qualifiers(index):
+    matches = index.match("Balance Sheet", {"Total current liabilities": "1", "Other non-current liabilities": "2"})
+    assert matches == {"Total Current Liabilities": "Total current liabilities"}
+
+def test_match_handles_missing_statement(index):
+    assert index.match("Cash Flow Statement", {"Net cash": "1"}) == {}
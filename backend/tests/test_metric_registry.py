@@ -0,0 +1,49 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from metric_registry import MetricRegistry
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "data.sqlite")
+
+def test_canonicalize_batches_unseen_labels_and_persists(db_path):
+    calls = []
+
+    def fake_llm(unseen, known):
+        calls.append(unseen)
+        return {"Income Statement": {"Total net sales": "Revenue", "Net system sales": None, "Net income": "Net Income"}}
+
+    registry = MetricRegistry(db_path, ask_llm=fake_llm)
+    cleaned = registry.canonicalize({"Income Statement": {"Total net sales": "1", "Net system sales": "2", "Net income": "3"}})
+
+    assert cleaned == {"Income Statement": {"Revenue": "1", "Net Income": "3"}}
+    assert len(calls) == 1
+
+    # A fresh registry resolves everything locally
+    reloaded = MetricRegistry(db_path, ask_llm=lambda *_: pytest.fail("LLM should not be called"))
+    assert reloaded.canonicalize({"Income Statement": {"TOTAL NET SALES": "5"}}) == {"Income Statement": {"Revenue": "5"}}
+
+def test_canonicalize_only_sends_unseen_labels(db_path):
+    registry = MetricRegistry(db_path, ask_llm=lambda unseen, known: {"Balance Sheet": {"Total equity": "Total Equity"}})
+    registry.add_aliases({"Balance Sheet": {"Total assets": "Total Assets"}})
+
+    sent = []
+    def fake_llm(unseen, known):
+        sent.append(unseen)
+        assert known == {"Balance Sheet": ["Total Assets"]}
+        return {"Balance Sheet": {"Total equity": "Total Equity"}}
+    registry.ask_llm = fake_llm
+
+    cleaned = registry.canonicalize({"Balance Sheet": {"Total assets": "10", "Total equity": "4"}})
+
+    assert sent == [{"Balance Sheet": ["Total equity"]}]
+    assert cleaned == {"Balance Sheet": {"Total Assets": "10", "Total Equity": "4"}}
+
+def test_skipped_labels_are_not_cached(db_path):
+    registry = MetricRegistry(db_path, ask_llm=lambda unseen, known: {})
+    assert registry.canonicalize({"Income Statement": {"EBITDA": "1"}}) == {"Income Statement": {}}
+    assert registry.lookup("Income Statement", "EBITDA") == (False, None)
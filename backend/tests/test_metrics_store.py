@@ -0,0 +1,40 @@
+import pytest
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from metrics_store import load_series, load_metric_panel
+
+def test_save_to_db_builds_series(save_filing):
+    save_filing("AAA", 2024, {"Revenue": "100"}, {"Revenue": {"2023": "90", "2021": "70"}, "Net Income": {"2023": "(5)"}})
+
+    series = load_series("AAA")
+
+    assert series["years"] == [2021, 2022, 2023, 2024]
+    revenue = series["metrics"]["Revenue"]
+    assert list(revenue[:1]) + list(revenue[2:]) == [70.0, 90.0, 100.0]
+    assert math.isnan(revenue[1])
+    assert series["metrics"]["Net Income"][2] == -5.0
+
+def test_series_refresh_is_incremental(save_filing):
+    save_filing("AAA", 2024, {"Revenue": "100"}, {})
+    save_filing("AAA", 2024, {"Gross Profit": "40"}, {"Revenue": {"2023": "90"}})
+
+    series = load_series("AAA", metrics=["Revenue", "Gross Profit"])
+
+    assert series["years"] == [2023, 2024]
+    assert list(series["metrics"]["Revenue"]) == [90.0, 100.0]
+    assert math.isnan(series["metrics"]["Gross Profit"][0])
+
+def test_load_metric_panel_aligns_tickers(save_filing):
+    save_filing("AAA", 2024, {"Revenue": "100"}, {"Revenue": {"2023": "90"}})
+    save_filing("BBB", 2024, {"Revenue": "10"}, {"Revenue": {"2022": "8"}})
+
+    panel = load_metric_panel("Revenue", year_from=2023)
+
+    assert panel["years"] == [2023, 2024]
+    assert list(panel["tickers"]["AAA"]) == [90.0, 100.0]
+    assert math.isnan(panel["tickers"]["BBB"][0])
+    assert panel["tickers"]["BBB"][1] == 10.0
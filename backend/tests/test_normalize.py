@@ -0,0 +1,67 @@
+import pytest
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import structure
+from normalize import decimal_separator, parse_number, normalize_values
+
+@pytest.mark.parametrize("raw, expected", [
+    ("27,566.0", 27566.0),
+    ("(1,680.6)", -1680.6),
+    ("(-5)", -5.0),
+    ("(1,680.6) million", -1680.6),
+    ("(€ 2.5) bn", -2500.0),
+    ("-1,860.9", -1860.9),
+    ("1.234.567", 1234567.0),
+    ("1.234,5", 1234.5),
+    ("12,5", 12.5),
+    ("1,779,242", 1779242.0),
+    ("€ 6,846.8", 6846.8),
+    ("$19.25", 19.25),
+    ("US$ 1,200", 1200.0),
+    ("HK$3.5 bn", 3500.0),
+    ("18.5 billion", 18500.0),
+    ("9 million", 9.0),
+    (1115.3, 1115.3),
+])
+def test_parse_number_valid(raw, expected):
+    assert parse_number(raw) == pytest.approx(expected)
+
+@pytest.mark.parametrize("raw", ["Value not provided", "N/A", "-", "", None, "Not explicitly labeled", "12 apples", "(5", "() million"])
+def test_parse_number_rejects(raw):
+    assert parse_number(raw) is None
+
+def test_normalize_values_returns_typed_arrays_and_mask():
+    values, rejected = normalize_values(["(2,609.3)", "Not provided", "5.4", "(2,609.3)"])
+
+    assert values.typecode == "d"
+    assert list(rejected) == [0, 1, 0, 0]
+    assert values[0] == pytest.approx(-2609.3)
+    assert math.isnan(values[1])
+    assert values[2] == pytest.approx(5.4)
+    assert values[3] == values[0]
+
+def test_normalize_values_unit_scale():
+    values, rejected = normalize_values(["48.6 billion"], unit_scale=1e3)
+    assert list(rejected) == [0]
+    assert values[0] == pytest.approx(48600000.0)
+
+def test_decimal_separator_is_decided_per_table():
+    eu_table = ["1.234", "12.345,6", "(987)"]
+    assert decimal_separator(eu_table) == ","
+    assert decimal_separator(["1.234", "19.25"]) == "."
+    assert decimal_separator(["1.234", "987"]) is None
+
+    values, _ = normalize_values(eu_table)
+    assert list(values) == [1234.0, 12345.6, -987.0]
+    assert list(normalize_values(["1.234", "19.25"])[0]) == [pytest.approx(1.234), 19.25]
+    assert parse_number("1.234", decimal=",") == 1234.0
+    assert parse_number("1,234", decimal=",") == pytest.approx(1.234)
+
+def test_save_to_db_reads_a_filing_in_one_number_format(temp_database, save_filing):
+    save_filing("TCO", 2024, {"Revenue": "1.234"}, {"Revenue": {"2023": "1.100,5"}})
+
+    assert structure.load_from_db("TCO")["Income Statement"][2024]["Revenue"] == 1234.0
@@ -0,0 +1,78 @@
+import pytest
+import os
+import sys
+
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts'))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import ocr
+import page_text_cache
+from ocr import cached_ocr, needs_ocr, ocr_cache_kind, ocr_pages, run_ocr
+from page_text_cache import clear_open_caches, open_cache
+
+@pytest.fixture(autouse=True)
+def temp_ocr_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, "OCR_CACHE_DIR", str(tmp_path / "ocr"))
+    monkeypatch.setattr(page_text_cache, "CACHE_DIR", str(tmp_path / "text_cache"))
+    yield
+    clear_open_caches()
+
+class Page:
+    def __init__(self, images):
+        self.images = images
+
+    def get_images(self, full=False):
+        return self.images
+
+def test_needs_ocr_only_for_pages_with_images_and_no_text():
+    assert needs_ocr(Page([(7,)]), "  \n")
+    assert needs_ocr(Page([(7,)]), "12\n")
+    assert not needs_ocr(Page([]), "")
+    assert not needs_ocr(Page([(7,)]), "Consolidated statement of financial position\n")
+
+def test_ocr_results_are_cached_by_page_hash():
+    calls = []
+
+    def worker(pdf_path, page):
+        calls.append((pdf_path, page))
+        if page == 3:
+            raise RuntimeError("tesseract failed")
+        return f"Revenue {page}\n"
+
+    tasks = {"ab12": ("ASML_2016.pdf", 1), "cd34": ("ASML_2016.pdf", 3)}
+    assert run_ocr(tasks, worker, workers=1) == {"ab12": "Revenue 1\n"}
+    assert cached_ocr("ab12") == "Revenue 1\n"
+    assert cached_ocr("cd34") is None
+
+    # The same page in another file is not recognised again; the failed page is retried
+    calls.clear()
+    assert run_ocr({"ab12": ("ASML_2017.pdf", 5), "cd34": ("ASML_2016.pdf", 3)}, worker, workers=1) == {
+        "ab12": "Revenue 1\n"}
+    assert calls == [("ASML_2016.pdf", 3)]
+
+def test_pages_are_ocrd_in_a_process_pool():
+    tasks = {"ab12": ("ASML_2016.pdf", 1), "cd34": ("ASML_2016.pdf", 2)}
+    assert run_ocr(tasks, "{}#{}".format, workers=2) == {"ab12": "ASML_2016.pdf#1", "cd34": "ASML_2016.pdf#2"}
+    assert cached_ocr("cd34") == "ASML_2016.pdf#2"
+
+def test_disabled_ocr_returns_nothing(monkeypatch):
+    monkeypatch.setattr(ocr, "OCR_ENABLED", False)
+    assert ocr_pages("ASML_2016.pdf", None, [0, 1]) == {}
+    assert ocr_pages("ASML_2016.pdf", None, []) == {}
+
+def test_scanned_pages_cached_without_ocr_are_redone_once_it_is_available(tmp_path, monkeypatch):
+    pdf = tmp_path / "ASML_2016.pdf"
+    pdf.write_bytes(b"%PDF-1.7 scanned fixture")
+    monkeypatch.setattr(ocr, "ocr_available", lambda: False)
+
+    # Without OCR the scanned page is extracted (and cached) as ""
+    cache = open_cache(str(pdf), ocr_cache_kind("fitz"), [0], lambda pages: (1, {0: ""}))
+    assert cache.has_page(0) and cache.page(0) == ""
+
+    monkeypatch.setattr(ocr, "ocr_available", lambda: True)
+    assert ocr_cache_kind("fitz") == "fitz.ocr"
+    cache = open_cache(str(pdf), ocr_cache_kind("fitz"), [0], lambda pages: (1, {0: "Revenue 27,559\n"}))
+    assert cache.page(0) == "Revenue 27,559\n"
+
+    monkeypatch.setattr(ocr, "OCR_ENABLED", False)
+    assert ocr_cache_kind("fitz") == "fitz"
@@ -0,0 +1,79 @@
+import pytest
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts'))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import page_text_cache
+from page_text_cache import PageTextCache, cache_path, clear_open_caches, document_sha256, open_cache
+
+PAGES = {0: "Cover\n", 1: "Consolidated statement of profit or loss\nRevenue 27,559\n", 2: "Bilanz – €\n"}
+
+@pytest.fixture(autouse=True)
+def temp_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_text_cache, "CACHE_DIR", str(tmp_path / "text_cache"))
+    yield
+    clear_open_caches()
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "ASML_2024.pdf"
+    path.write_bytes(b"%PDF-1.7 fixture")
+    return str(path)
+
+def extractor(calls):
+    def extract(pages):
+        calls.append(pages)
+        wanted = range(len(PAGES)) if pages is None else pages
+        return len(PAGES), {p: PAGES[p] for p in wanted}
+    return extract
+
+def test_pages_are_extracted_once(pdf):
+    calls = []
+    cache = open_cache(pdf, "plumber", [1], extractor(calls))
+    assert cache.page(1) == PAGES[1]
+    assert not cache.has_page(0)
+
+    cache = open_cache(pdf, "plumber", [1, 2], extractor(calls))
+    assert [cache.page(p) for p in (1, 2)] == [PAGES[1], PAGES[2]]
+    open_cache(pdf, "plumber", [2, 1], extractor(calls))
+
+    assert calls == [[1], [2]]
+
+def test_whole_document_and_zero_copy_reads(pdf):
+    cache = open_cache(pdf, "text", None, extractor([]))
+
+    assert len(cache) == 3
+    assert cache.pages() == PAGES
+    view = cache.page_bytes(2)
+    assert isinstance(view, memoryview) and bytes(view).decode("utf-8") == PAGES[2]
+    view.release()
+
+def test_changed_pdf_gets_a_new_cache(pdf):
+    calls = []
+    open_cache(pdf, "text", None, extractor(calls))
+    with open(pdf, "ab") as f:
+        f.write(b" revised")
+    open_cache(pdf, "text", None, extractor(calls))
+
+    assert calls == [None, None]
+
+def test_other_processes_read_the_same_file(pdf):
+    open_cache(pdf, "text", None, extractor([]))
+    path = cache_path(document_sha256(pdf), "text")
+
+    out = subprocess.run(
+        [sys.executable, "-c", f"import sys; sys.path.insert(0, {SCRIPTS_DIR!r}); "
+                               f"from page_text_cache import PageTextCache; "
+                               f"print(PageTextCache({path!r}).page(1), end='')"],
+        capture_output=True, check=True, env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+    )
+    assert out.stdout.decode("utf-8") == PAGES[1]
+
+def test_unreadable_pages_are_not_cached(pdf):
+    cache = open_cache(pdf, "plumber", [0, 1], lambda pages: (3, {1: PAGES[1]}))
+
+    assert not cache.has_page(0)
+    assert PageTextCache(cache.path).has_page(1)
@@ -0,0 +1,89 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import pdf_store
+from pdf_store import (blob_path, compress_cold, file_sha256, gc_blobs, import_directory, link_known_url,
+                       lookup_pdf, materialize_pdf, revalidation_headers, store_pdf)
+
+@pytest.fixture
+def pdf_dir(tmp_path):
+    path = tmp_path / "pdfs"
+    path.mkdir()
+    return str(path)
+
+def download(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+def test_duplicate_documents_share_one_blob(tmp_path, pdf_dir):
+    first = store_pdf("asml", 2016, download(tmp_path, "a.pdf", b"%PDF-report-2016"), "https://x/2016.pdf", '"e1"', pdf_dir)
+    second = store_pdf("ASML", 2015, download(tmp_path, "b.pdf", b"%PDF-report-2016"), pdf_dir=pdf_dir)
+
+    assert first == second
+    assert os.path.samefile(os.path.join(pdf_dir, "ASML_2016.pdf"), os.path.join(pdf_dir, "ASML_2015.pdf"))
+    assert os.listdir(os.path.dirname(blob_path(first, pdf_dir))) == [f"{first}.pdf"]
+    assert lookup_pdf("asml", 2016) == {"sha256": first, "source_url": "https://x/2016.pdf", "etag": '"e1"',
+                                        "compressed": False}
+    assert lookup_pdf("ASML", 2014) is None
+
+def test_known_url_is_linked_without_downloading(tmp_path, pdf_dir):
+    sha = store_pdf("ASML", 2016, download(tmp_path, "a.pdf", b"%PDF-2016"), "https://x/2016.pdf", pdf_dir=pdf_dir)
+
+    assert link_known_url("ASMLX", 2016, "https://x/2016.pdf", pdf_dir)
+    assert not link_known_url("ASML", 2017, "https://x/2017.pdf", pdf_dir)
+    assert file_sha256(os.path.join(pdf_dir, "ASMLX_2016.pdf")) == sha
+    assert lookup_pdf("ASMLX", 2016)["sha256"] == sha
+
+def test_known_urls_are_revalidated_with_their_etag(tmp_path, pdf_dir):
+    sha = store_pdf("ASML", 2016, download(tmp_path, "a.pdf", b"%PDF-2016"), "https://x/2016.pdf", '"e1"', pdf_dir)
+    store_pdf("ASML", 2017, download(tmp_path, "b.pdf", b"%PDF-2017"), "https://x/2017.pdf", pdf_dir=pdf_dir)
+
+    assert revalidation_headers("https://x/2016.pdf", pdf_dir) == {"If-None-Match": '"e1"'}
+    assert revalidation_headers("https://x/2017.pdf", pdf_dir) == {}
+    assert revalidation_headers("https://x/2018.pdf", pdf_dir) is None
+
+    os.remove(blob_path(sha, pdf_dir))
+    assert revalidation_headers("https://x/2016.pdf", pdf_dir) is None
+
+def test_names_are_restored_from_the_store(tmp_path, pdf_dir):
+    store_pdf("ASML", 2016, download(tmp_path, "a.pdf", b"%PDF-2016"), pdf_dir=pdf_dir)
+    os.remove(os.path.join(pdf_dir, "ASML_2016.pdf"))
+
+    assert materialize_pdf("ASML", 2016, pdf_dir) == os.path.join(pdf_dir, "ASML_2016.pdf")
+    assert materialize_pdf("ASML", 2017, pdf_dir) is None
+
+def test_unreferenced_blobs_are_collected(tmp_path, pdf_dir):
+    old = store_pdf("ASML", 2016, download(tmp_path, "a.pdf", b"%PDF-v1"), pdf_dir=pdf_dir)
+    new = store_pdf("ASML", 2016, download(tmp_path, "b.pdf", b"%PDF-v2"), pdf_dir=pdf_dir)
+
+    assert gc_blobs(pdf_dir) == 1
+    assert not os.path.exists(blob_path(old, pdf_dir))
+    assert os.path.exists(blob_path(new, pdf_dir))
+
+def test_import_keeps_the_source_directory(tmp_path, pdf_dir):
+    src = tmp_path / "pdfsASML"
+    src.mkdir()
+    (src / "ASML_2015.pdf").write_bytes(b"%PDF-2015")
+    (src / "notes.txt").write_bytes(b"")
+
+    assert import_directory(str(src), pdf_dir) == 1
+    assert os.path.exists(src / "ASML_2015.pdf")
+    assert lookup_pdf("ASML", 2015)["sha256"] == file_sha256(str(src / "ASML_2015.pdf"))
+
+def test_cold_filings_are_compressed_and_restored(tmp_path, pdf_dir):
+    pytest.importorskip("zstandard")
+    sha = store_pdf("ASML", 2015, download(tmp_path, "a.pdf", b"%PDF-" + b"x" * 10000), pdf_dir=pdf_dir)
+    store_pdf("ASML", 2024, download(tmp_path, "b.pdf", b"%PDF-new"), pdf_dir=pdf_dir)
+
+    assert compress_cold(2020, pdf_dir) == 1
+    assert not os.path.exists(os.path.join(pdf_dir, "ASML_2015.pdf"))
+    assert os.path.exists(os.path.join(pdf_dir, "ASML_2024.pdf"))
+    assert lookup_pdf("ASML", 2015)["compressed"]
+
+    path = materialize_pdf("ASML", 2015, pdf_dir)
+    assert file_sha256(path) == sha
+    assert not lookup_pdf("ASML", 2015)["compressed"]
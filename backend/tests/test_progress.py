@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from progress import emit, format_ndjson, format_sse, run_with_events
+
+def test_events_stream_before_the_run_finishes():
+    release = threading.Event()
+
+    def run(on_event):
+        emit(on_event, "year_stored", year=2024, rows=3)
+        release.wait(5)
+        emit(on_event, "year_stored", year=2023, rows=2)
+        return {"company": "TCO", "results": {}}
+
+    events = run_with_events(run)
+    first = next(events)
+    release.set()
+
+    assert first == {"event": "year_stored", "year": 2024, "rows": 3}
+    assert [e["event"] for e in events] == ["year_stored", "done"]
+
+def test_errors_end_the_stream():
+    assert list(run_with_events(lambda on_event: {"error": "No pdfs"}))[-1] == {"event": "error", "error": "No pdfs"}
+
+    def crash(on_event):
+        raise RuntimeError("boom")
+
+    assert list(run_with_events(crash)) == [{"event": "error", "error": "boom"}]
+
+def test_heartbeats_while_idle():
+    release = threading.Event()
+
+    def run(on_event):
+        release.wait(5)
+        return {}
+
+    events = run_with_events(run, heartbeat=0.01)
+    assert next(events) == {"event": "heartbeat"}
+    release.set()
+    assert [e for e in events if e["event"] != "heartbeat"] == [{"event": "done", "result": {}}]
+
+def test_failing_listener_does_not_break_the_pipeline():
+    def listener(event):
+        raise ValueError("client went away")
+
+    emit(listener, "ir_url", url="https://example.com")
+    emit(None, "ir_url", url="https://example.com")
+
+def test_wire_formats():
+    event = {"event": "pdf_downloaded", "year": 2024, "file": "ASML_2024.pdf"}
+
+    assert format_sse(event) == f"event: pdf_downloaded\ndata: {json.dumps(event)}\n\n"
+    assert format_sse({"event": "heartbeat"}) == ": keepalive\n\n"
+    assert json.loads(format_ndjson(event)) == event
@@ -0,0 +1,60 @@
+import pytest
+import hashlib
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from pdf_store import file_sha256
+from provenance import load_provenance
+
+def provenance_of(sha, values):
+    return {"pdf_sha256": sha, "values": values}
+
+def entry(statement_type, metric, year, page, span=None, bbox=None):
+    return {"statement_type": statement_type, "metric": metric, "year": year, "pages": [page, page],
+            "page": page, "span": span, "bbox": bbox}
+
+def test_values_are_stored_with_their_source(save_filing):
+    save_filing("TCO", 2024, {"Revenue": "100"}, {"Revenue": {"2023": "90"}}, provenance_of("sha-2024", [
+        entry("Income Statement", "Revenue", 2024, 41, [12, 15], [310.5, 120.0, 340.2, 131.0]),
+        entry("Historical", "Revenue", 2023, 41, [17, 19]),
+        entry("Historical", "Revenue", 2024, 41),  # not a prior year, so not stored
+    ]))
+
+    rows = load_provenance("TCO")
+
+    assert [(r["year"], r["statement_type"]) for r in rows] == [(2024, "Income Statement"), (2023, "Historical")]
+    assert rows[0] == {
+        "year": 2024, "statement_type": "Income Statement", "metric": "Revenue", "filing_year": 2024,
+        "pdf_sha256": "sha-2024", "page": 41, "span": [12, 15], "bbox": [310.5, 120.0, 340.2, 131.0],
+    }
+    assert rows[1]["bbox"] is None
+
+def test_newer_filing_keeps_its_provenance(save_filing):
+    save_filing("TCO", 2024, {"Revenue": "100"}, {"Revenue": {"2023": "91"}}, provenance_of("sha-2024", [entry("Historical", "Revenue", 2023, 41)]))
+    save_filing("TCO", 2025, {"Revenue": "110"}, {"Revenue": {"2023": "92"}}, provenance_of("sha-2025", [entry("Historical", "Revenue", 2023, 55)]))
+    save_filing("TCO", 2024, {"Revenue": "100"}, {"Revenue": {"2023": "91"}}, provenance_of("sha-2024", [entry("Historical", "Revenue", 2023, 41)]))
+
+    row = load_provenance("TCO", 2023, "Revenue")[0]
+    assert (row["filing_year"], row["pdf_sha256"], row["page"]) == (2025, "sha-2025", 55)
+
+def test_file_sha256(tmp_path):
+    path = tmp_path / "ASML_2024.pdf"
+    path.write_bytes(b"%PDF-1.7" * 1000)
+
+    assert file_sha256(str(path)) == hashlib.sha256(b"%PDF-1.7" * 1000).hexdigest()
+
+def test_locate_value_prefers_the_metric_row():
+    pytest.importorskip("fitz")
+    pytest.importorskip("pdfplumber")
+    from parser import locate_value
+
+    class Page:
+        def search_for(self, text):
+            return []
+
+    texts = {3: "Income statement\nNet sales 27,559 21,173\n", 4: "Gross profit 14,131\n"}
+
+    assert locate_value({3: Page(), 4: Page()}, texts, [3, 4], "Net sales", "21,173") == {"page": 4, "span": [34, 40], "bbox": None}
+    assert locate_value({3: Page()}, texts, [3], "Net sales", "999") == {"page": 4, "span": None, "bbox": None}
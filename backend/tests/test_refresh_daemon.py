@@ -0,0 +1,102 @@
+import pytest
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import structure
+import refresh_daemon
+from refresh_daemon import report_links_hash, run_once
+
+PAGE = '<a href="/files/ar-2024.pdf">2024</a><a href="/about">About</a><a href="/files/ar-2023.pdf">2023</a>'
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+class FakeSession:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        if headers and headers.get("If-None-Match") == '"v1"' and self.pages[url][0] == '"v1"':
+            return FakeResponse(304)
+        etag, html = self.pages[url]
+        return FakeResponse(200, html, {"ETag": etag})
+
+@pytest.fixture(autouse=True)
+def tracked_tickers(temp_database):
+    conn = sqlite3.connect(temp_database)
+    cursor = conn.cursor()
+    structure.ensure_tables(cursor)
+    cursor.executemany("INSERT INTO CompanyMetadata (ticker, name, ir_url) VALUES (?, ?, ?)", [
+        ("AAA", "AAA", "https://aaa.example/ir"),
+        ("NOURL", "NOURL", ""),
+    ])
+    conn.commit()
+    conn.close()
+
+def make_due(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE RefreshState SET next_check = 0")
+    conn.commit()
+    conn.close()
+
+def test_report_hash_ignores_non_report_links():
+    other_layout = '<div><a href="/files/ar-2023.pdf">x</a><a href="/careers">Jobs</a><a href="/files/ar-2024.pdf">y</a></div>'
+    base = "https://aaa.example/ir"
+
+    assert report_links_hash(PAGE, base) == report_links_hash(other_layout, base)
+    assert report_links_hash(PAGE, base) != report_links_hash(PAGE + '<a href="/files/ar-2025.pdf">', base)
+
+def test_first_check_seeds_without_scraping(temp_database):
+    session = FakeSession({"https://aaa.example/ir": ('"v1"', PAGE)})
+    scraped = []
+
+    assert run_once(session, scraped.append) == {"AAA": "seeded"}
+    assert scraped == []
+    conn = sqlite3.connect(temp_database)
+    etag, report_hash = conn.execute("SELECT etag, report_hash FROM RefreshState WHERE ticker = 'AAA'").fetchone()
+    conn.close()
+    assert etag == '"v1"' and report_hash == report_links_hash(PAGE, "https://aaa.example/ir")
+
+def test_scrapes_only_when_report_list_changes(temp_database):
+    session = FakeSession({"https://aaa.example/ir": ('"v1"', PAGE)})
+    scraped = []
+
+    assert run_once(session, scraped.append) == {"AAA": "seeded"}
+    assert run_once(session, scraped.append) == {}  # not due yet
+
+    make_due(temp_database)
+    assert run_once(session, scraped.append) == {"AAA": "unchanged"}
+    assert session.requests[-1]["If-None-Match"] == '"v1"'
+
+    session.pages["https://aaa.example/ir"] = ('"v2"', PAGE + '<a href="/files/ar-2025.pdf">2025</a>')
+    make_due(temp_database)
+    assert run_once(session, scraped.append) == {"AAA": "refreshed"}
+    assert scraped == ["AAA"]
+
+def test_failed_scrape_is_retried(temp_database):
+    session = FakeSession({"https://aaa.example/ir": ('"v1"', PAGE)})
+    assert run_once(session, lambda ticker: None) == {"AAA": "seeded"}
+
+    def failing_scrape(ticker):
+        raise RuntimeError("no pdfs")
+
+    session.pages["https://aaa.example/ir"] = ('"v2"', PAGE + '<a href="/files/ar-2025.pdf">2025</a>')
+    make_due(temp_database)
+    assert run_once(session, failing_scrape) == {"AAA": "error"}
+
+    make_due(temp_database)
+    scraped = []
+    assert run_once(session, scraped.append) == {"AAA": "refreshed"}
+    assert scraped == ["AAA"]
@@ -0,0 +1,59 @@
+import pytest
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import structure
+import metrics_store
+import derived_metrics
+import provenance
+from screening import screen, rank
+
+def test_screen_growth_over_consecutive_years(save_filing):
+    save_filing("FAST", 2024, {"Revenue": "146.41"}, {"Revenue": {"2023": "133.1", "2022": "121", "2021": "110", "2020": "100"}})
+    save_filing("SLOW", 2024, {"Revenue": "103"}, {"Revenue": {"2023": "102", "2022": "101", "2021": "100"}})
+    save_filing("DIP", 2024, {"Revenue": "150"}, {"Revenue": {"2023": "100", "2022": "120", "2021": "100"}})
+
+    results = screen("Revenue YoY Growth", "gt", 0.09, years=3)
+
+    assert [r["ticker"] for r in results] == ["FAST"]
+    assert results[0]["min"] == pytest.approx(0.1)
+
+def test_screen_rejects_unknown_operator():
+    with pytest.raises(ValueError):
+        screen("Revenue", "between", 1)
+
+def test_rank_orders_tickers_and_limits(save_filing):
+    save_filing("AAA", 2024, {"Revenue": "10"}, {"Revenue": {"2023": "9"}})
+    save_filing("BBB", 2024, {"Revenue": "30"}, {"Revenue": {"2023": "8"}})
+    save_filing("CCC", 2024, {"Revenue": "20"}, {"Revenue": {"2023": "7"}})
+
+    assert [r["ticker"] for r in rank("Revenue", 2024, limit=2)] == ["BBB", "CCC"]
+    assert [r["ticker"] for r in rank("Revenue", 2023, descending=False)] == ["CCC", "BBB", "AAA"]
+
+def test_derived_metric_wins_over_a_raw_line_item_of_the_same_name():
+    for ticker, gross_margin in (("AAA", "45"), ("BBB", "0.1")):
+        structure.save_to_db(ticker, {
+            "ticker": ticker, "ir_url": "", "year": 2024,
+            "data": {"Income Statement": {"Revenue": "100", "Gross Profit": "30", "Gross Margin": gross_margin}}
+        })
+
+    results = rank("Gross Margin", 2024)
+    assert [(r["ticker"], r["value"]) for r in results] == [("AAA", pytest.approx(0.3)), ("BBB", pytest.approx(0.3))]
+
+def test_reads_do_not_create_tables(temp_database, save_filing):
+    assert screen("Revenue", "gt", 0) == [] and rank("Revenue", 2024) == []
+    assert metrics_store.load_series("TCO")["years"] == []
+    assert metrics_store.load_metric_panel("Revenue")["tickers"] == {}
+    assert derived_metrics.load_derived("TCO") == {}
+    assert provenance.load_provenance("TCO") == []
+
+    conn = sqlite3.connect(temp_database)
+    assert conn.execute("SELECT name FROM sqlite_master").fetchall() == []
+    conn.close()
+
+    structure.migrate()
+    save_filing("FAST", 2024, {"Revenue": "110"}, {"Revenue": {"2023": "100"}})
+    assert rank("Revenue", 2024) == [{"rank": 1, "ticker": "FAST", "value": 110.0}]
@@ -0,0 +1,53 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+pytest.importorskip("fitz")
+pytest.importorskip("pdfplumber")
+
+from parser import MAX_BLOCK_PAGES, merge_block, page_statement_type, segment_statements
+
+def test_page_statement_type_reads_the_heading():
+    assert page_statement_type("ASML Holding\nConsolidated Statements of Operations\nNet sales 27,559") == "Income Statement"
+    assert page_statement_type("Consolidated Balance Sheets\nAssets") == "Balance Sheet"
+    assert page_statement_type("Consolidated Statements of Cash Flows\nOperating activities") == "Cash Flow Statement"
+    assert page_statement_type("Total liabilities 20,000\nTotal equity 18,000") is None
+
+def test_segments_contiguous_statement_blocks():
+    page_types = [
+        (40, "Income Statement"),
+        (42, "Balance Sheet"), (43, None),
+        (44, "Cash Flow Statement"), (45, None),
+        (47, None),
+    ]
+
+    assert segment_statements(page_types) == [
+        ("Income Statement", [40]),
+        ("Balance Sheet", [42, 43]),
+        ("Cash Flow Statement", [44, 45]),
+        (None, [47]),
+    ]
+
+def test_blocks_are_capped():
+    page_types = [(p, "Balance Sheet" if p == 10 else None) for p in range(10, 10 + MAX_BLOCK_PAGES + 1)]
+
+    blocks = segment_statements(page_types)
+    assert [len(pages) for _, pages in blocks] == [MAX_BLOCK_PAGES, 1]
+    assert [st_type for st_type, _ in blocks] == ["Balance Sheet", "Balance Sheet"]
+
+def test_continuation_block_stops_at_the_next_heading():
+    page_types = [(p, "Balance Sheet" if p == 10 else None) for p in range(10, 10 + MAX_BLOCK_PAGES + 1)]
+    page_types.append((11 + MAX_BLOCK_PAGES, "Cash Flow Statement"))
+
+    assert [st_type for st_type, _ in segment_statements(page_types)] == [
+        "Balance Sheet", "Balance Sheet", "Cash Flow Statement"]
+
+def test_merge_block_keeps_earlier_values_and_their_pages():
+    target, sources = {}, {}
+    merge_block(target, {"Net sales": "27,559"}, sources, [41, 41])
+    merge_block(target, {"Net sales": "27,000", "Gross profit": "14,131"}, sources, [88, 89])
+
+    assert target == {"Net sales": "27,559", "Gross profit": "14,131"}
+    assert sources == {"Net sales": [41, 41], "Gross profit": [88, 89]}
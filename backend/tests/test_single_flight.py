@@ -0,0 +1,66 @@
+import pytest
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import single_flight
+from single_flight import SingleFlight, ticker_lock
+
+@pytest.fixture(autouse=True)
+def temp_lock_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(single_flight, "LOCK_DIR", str(tmp_path / "locks"))
+
+def test_concurrent_callers_share_one_run():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def run(on_event):
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        on_event({"event": "year_stored", "year": 2024})
+        return {"company": "TCO", "results": {}}
+
+    results, events = [], []
+    leader = threading.Thread(target=lambda: results.append(flight.do("TCO", run, events.append)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("TCO", run, events.append)))
+                 for _ in range(3)]
+    for t in followers:
+        t.start()
+    while len(flight._calls["TCO"].listeners) < 4:
+        time.sleep(0.01)
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+
+    assert len(runs) == 1
+    assert results == [{"company": "TCO", "results": {}}] * 4
+    assert events == [{"event": "year_stored", "year": 2024}] * 4
+    assert flight.in_flight() == []
+
+def test_followers_get_the_leaders_exception_and_the_key_is_freed():
+    flight = SingleFlight()
+
+    def crash(on_event):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        flight.do("TCO", crash)
+    assert flight.do("TCO", lambda on_event: {"ok": True}) == {"ok": True}
+
+def test_ticker_lock_is_exclusive():
+    with ticker_lock("tco"):
+        with pytest.raises(TimeoutError):
+            with ticker_lock("TCO", timeout=0.05, poll=0.01):
+                pass
+        with ticker_lock("OTHER", timeout=0.05):
+            pass
+    with ticker_lock("TCO", timeout=0.05):
+        pass
@@ -0,0 +1,55 @@
+import pytest
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from text_backends import extract_texts, layout_lines, layout_text, looks_garbled
+
+def word(x0, y0, text, block=0, width_per_char=5.0, height=10.0):
+    return (x0, y0, x0 + width_per_char * len(text), y0 + height, text, block, 0, 0)
+
+# A statement row whose label and figures sit in different PyMuPDF text blocks, plus a header row
+ROWS = [
+    word(300, 100, "2024", block=1), word(400, 100, "2023", block=2),
+    word(50, 120.5, "Total", block=0), word(80, 120.5, "net", block=0), word(100, 120.5, "sales", block=0),
+    word(300, 120, "28,262.9", block=1), word(400, 120, "27,558.5", block=2),
+    word(50, 140, "Cost", block=0), word(75, 140, "of", block=0), word(90, 140, "sales", block=0),
+    word(300, 140.8, "(13,770.0)", block=1), word(400, 140.8, "(13,420.6)", block=2),
+]
+
+def test_rows_are_rebuilt_across_blocks():
+    lines = [[w[4] for w in line] for line in layout_lines(ROWS)]
+
+    assert lines == [["2024", "2023"], ["Total", "net", "sales", "28,262.9", "27,558.5"],
+                     ["Cost", "of", "sales", "(13,770.0)", "(13,420.6)"]]
+
+def test_column_gaps_become_runs_of_spaces():
+    text = layout_text(ROWS)
+    second = text.split("\n")[1]
+
+    assert second.startswith("Total net sales ")
+    assert "sales" + " " * 12 + "28,262.9" in second  # gap capped at MAX_GAP_SPACES
+    assert text.endswith("\n")
+    assert layout_text([]) == ""
+
+def test_garbled_column_order_is_detected():
+    rows = "Total net sales 28,262.9 27,558.5\nCost of sales (13,770.0) (13,420.6)\n" * 3
+    columns = "Total net sales\nCost of sales\n" + "28,262.9\n27,558.5\n(13,770.0)\n(13,420.6)\n2024\n2023\n"
+
+    assert not looks_garbled(rows)
+    assert looks_garbled(columns)
+    assert not looks_garbled("2024\n2023\n")
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        extract_texts("ASML_2016.pdf", [0], backend="tesseract")
+
+def test_fixture_statement_rows_stay_together():
+    pytest.importorskip("fitz")
+    pdf = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "../pdfsASML/*.pdf")))[-1]
+
+    texts = extract_texts(pdf, list(range(40)), backend="fitz")
+    assert texts
+    assert not all(looks_garbled(text) for text in texts.values())